@@ -0,0 +1,54 @@
+#!/usr/bin/python
+#\file    cma_batch1.py
+#\brief   CMA-ES with batched evaluation of a population
+#         (sequential vs thread pool vs vectorized objective).
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+from multiprocessing.pool import ThreadPool
+
+#Objective that takes time (e.g. a simulation or a query to a device).
+def Fobj(x, t_wait=0.005):
+  time.sleep(t_wait)
+  return (x[0]-1.0)**2 + (x[1]+0.5)**2
+
+def FobjBatch(X):
+  X= np.array(X)
+  return ((X[:,0]-1.0)**2 + (X[:,1]+0.5)**2).tolist()
+
+def GetOpt():
+  opt= TContOptNoGrad()
+  options= {}
+  options['bounds']= [[-2.0]*2,[2.0]*2]
+  options['tolfun']= 1.0e-4
+  options['scale0']= 0.05
+  options['parameters0']= [0.0]*2
+  options['maxfevals']= 300
+  options['verb_disp']= False
+  opt.Init({'options':options})
+  return opt
+
+def Main():
+  pool= ThreadPool(8)
+
+  print '#TContOptNoGrad  time[s]  fevals  result'
+  opt= GetOpt()
+  t_start= time.time()
+  count= 0
+  while not opt.Stopped():
+    x= opt.Select()
+    opt.Update(-Fobj(x))
+    count+= 1
+  print 'sequential', time.time()-t_start, count, opt.Result()
+  for name,kwargs in (('thread_pool',{'executor':pool}), ('fobj_batch',{'fobj_batch':lambda X:[-f for f in FobjBatch(X)]})):
+    opt= GetOpt()
+    t_start= time.time()
+    count= opt.OptimizeBatch(lambda x:-Fobj(x), **kwargs)
+    print name, time.time()-t_start, count, opt.Result()
+
+  pool.close()
+
+if __name__=='__main__':
+  Main()
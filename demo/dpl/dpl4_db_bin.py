@@ -0,0 +1,49 @@
+#!/usr/bin/python
+#\file    dpl4_db_bin.py
+#\brief   Test of the binary log format of TGraphEpisodeDB (SaveBin/LoadBin)
+#         compared with the YAML format.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+def AddRandomEpisode(db):
+  db.NewEntry()
+  n0= db.AddToSeq(parent=None,name='n0',xs={'x1':SSA([Rand(),Rand()])})
+  n1= db.AddToSeq(parent=n0,name='n1',xs={'x2':SSA([Rand(),Rand(),Rand()])})
+  n2= db.AddToSeq(parent=n1,name='n2',xs={'y':SSA([Rand()])})
+  db.AddToSeq(parent=n2,name='n3',xs={REWARD_KEY:SSA([Rand()])})
+  db.UpdateR()
+
+def Main(logdir='/tmp/g1/', num_sessions=10, num_episodes=100):
+  if not os.path.exists(logdir):  os.makedirs(logdir)
+  file_yaml,file_bin= logdir+'database_test.yaml', logdir+'database_test.blog'
+  for f in (file_yaml,file_bin):
+    if os.path.exists(f):  os.remove(f)
+  db= TGraphEpisodeDB()
+  t_yaml,t_bin= 0.0,0.0
+  for s in range(num_sessions):
+    for i in range(num_episodes):  AddRandomEpisode(db)
+    t0= time.time()
+    SaveYAML(db.Save(), file_yaml, interactive=False)
+    t1= time.time()
+    db.SaveBin(file_bin)
+    t2= time.time()
+    t_yaml+= t1-t0
+    t_bin+= t2-t1
+    print('{0} episodes: save YAML {1:.4f}s, binary log {2:.4f}s'.format(db.NumEntries(), t1-t0, t2-t1))
+  print('Total save time: YAML {0:.4f}s, binary log {1:.4f}s'.format(t_yaml, t_bin))
+
+  t0= time.time()
+  db1= TGraphEpisodeDB()
+  db1.Load(LoadYAML(file_yaml))
+  t1= time.time()
+  db2= TGraphEpisodeDB()
+  db2.LoadBin(file_bin)
+  t2= time.time()
+  print('Load: YAML {0:.4f}s, binary log {1:.4f}s'.format(t1-t0, t2-t1))
+  print('Same contents: {0}'.format(db1.Save()==db2.Save()))
+
+if __name__=='__main__':
+  Main()
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+#\file    dpl4_pool1.py
+#\brief   Benchmark of TGraphDDPSolver4 with a persistent worker pool ('pool')
+#         vs a process per candidate ('spawn'); toy1 with learned LWR models.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+from toy1 import *
+
+def Main(num_trials=3):
+  domain= TGraphDynDomain()
+  SP= TCompSpaceDef
+  domain.SpaceDefs={
+    'x1': SP('action',2,min=[0.3,0.3],max=[0.7,0.7]),
+    'x2': SP('state',3),
+    'y':  SP('state',1),
+    REWARD_KEY:  SP('state',1),
+    }
+  models= {}
+  for key,f,bound in (('F1',F1,tsys.bound),('F2',F2,tsys.bound2)):
+    models[key]= TLWR()
+    models[key].Init()
+    for i in range(100):
+      x= [Rand(bound[0][d],bound[1][d]) for d in range(len(bound[0]))]
+      models[key].Update(x, ToList(f(x)))
+  domain.Models={
+    #key:[In,Out,F],
+    'F1': [['x1'],['x2'],models['F1']],
+    'F2': [['x2'],['y'],models['F2']],
+    'R':  [['y'],[REWARD_KEY],TLocalQuad(1,lambda x:x[0])],
+    'P1': [[],[PROB_KEY], TLocalLinear(0,1,lambda x:[1.0],lambda x:[0.0])],
+    }
+  domain.Graph={
+    'n0': TDynNode(None,'P1',('F1','n1')),
+    'n1': TDynNode('n0','P1',('F2','n2')),
+    'n2': TDynNode('n1','P1',('R','n3')),
+    'n3': TDynNode('n2'),
+    }
+
+  print '#proc_mode  time[s]  x1  value'
+  for proc_mode in ('spawn','pool'):
+    for i in range(num_trials):
+      t_start= time.time()
+      ddp_sol= TGraphDDPSolver4()
+      ddp_sol.Load({'options':{'proc_mode':proc_mode, 'num_proc':4, 'grad_max_iter':3, 'max_total_iter':300}})
+      ddp_sol.Init(domain, TGraphDDPSolver4.THelper())
+      res= ddp_sol.Plan('n0', {})
+      ddp_sol.Close()
+      print proc_mode, time.time()-t_start, res.PTree.StartNode.XS['x1'].X.T, ddp_sol.Value(res.PTree)
+
+if __name__=='__main__':
+  Main()
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+#\file    dpl4_ptree_cache1.py
+#\brief   Benchmark of the planning-tree cache of TGraphDynUtil.GetPTree
+#         on a graph with a loop (unrolled with max_visits).
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+def Main(num_calls=1000, max_visits=8):
+  domain= TGraphDynDomain()
+  SP= TCompSpaceDef
+  domain.SpaceDefs={
+    'a': SP('action',1,min=[-1.0],max=[1.0]),
+    's': SP('select',num=2),
+    'x': SP('state',1),
+    REWARD_KEY:  SP('state',1),
+    }
+  domain.Models={
+    #key:[In,Out,F],
+    'Fmv': [['x','a'],['x'], None],
+    'R':  [['x'],[REWARD_KEY], None],
+    'Ps': [['s'],[PROB_KEY], None],
+    'P1': [[],[PROB_KEY], None],
+    }
+  domain.Graph={
+    'n0': TDynNode(None,'P1',('Fmv','n1')),
+    'n1': TDynNode('n0','Ps',('Fmv','n0'),('R','n2')),
+    'n2': TDynNode('n1'),
+    }
+
+  util= TGraphDynUtil()
+  util.Init(domain)
+  print '#cache_ptree  time[s] ({num_calls} calls)  num_nodes'.format(num_calls=num_calls)
+  for cache in (False,True):
+    util.Options['cache_ptree']= cache
+    t_start= time.time()
+    for i in range(num_calls):
+      ptree= util.GetPTree('n0', {'x':SSA([0.0])}, max_visits=max_visits)
+    print cache, time.time()-t_start, len(ptree.Tree)
+
+  #The cache is invalidated when the graph is modified.
+  domain.Graph['n2']= TDynNode('n1','P1',('R','n3'))
+  domain.Graph['n3']= TDynNode('n2')
+  ptree= util.GetPTree('n0', {'x':SSA([0.0])}, max_visits=max_visits)
+  print 'After modifying the graph:', len(ptree.Tree), 'nodes', ('OK' if len(ptree.Tree)==len(GraphToPTree(domain.Graph,'n0',max_visits).Tree) else 'NG')
+  #In-place modifications are also detected.
+  domain.Graph['n4']= TDynNode('n3')
+  ptree= util.GetPTree('n0', {'x':SSA([0.0])}, max_visits=max_visits)
+  domain.Graph['n3'].Fp= 'P1'
+  domain.Graph['n3'].Next.append('n4')
+  domain.Graph['n3'].Fd.append('R')
+  ptree= util.GetPTree('n0', {'x':SSA([0.0])}, max_visits=max_visits)
+  print 'After modifying a node in place:', len(ptree.Tree), 'nodes', ('OK' if len(ptree.Tree)==len(GraphToPTree(domain.Graph,'n0',max_visits).Tree) else 'NG')
+
+if __name__=='__main__':
+  Main()
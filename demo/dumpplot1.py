@@ -0,0 +1,53 @@
+#!/usr/bin/python
+#\file    dumpplot1.py
+#\brief   Benchmark of DumpPlot (batched grid evaluation) with TLWR.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+#Reference: per-point evaluation of the grid (2D only).
+def DumpPlotRef(fa, f_reduce, f_repair, file_prefix, x_var, n_div, bounds):
+  xamin0,xamax0= bounds
+  xamin,xamax= f_reduce(xamin0),f_reduce(xamax0)
+  xmed= [Median([x[d] for x in fa.DataX]) for d in range(fa.Dx)]
+  fp= open('%s_est.dat'%(file_prefix),'w')
+  for xa1_1 in FRange1(xamin[0],xamax[0],n_div):
+    for xa1_2 in FRange1(xamin[1],xamax[1],n_div):
+      xa1r= [xa1_1,xa1_2]
+      xa1= f_repair(xa1r, xamin0, xamax0, xmed)
+      fp.write('%s\n' % ToStr(xa1r,xa1,ToList(fa.Predict(xa1,x_var).Y)))
+    fp.write('\n')
+  fp.close()
+
+def LoadEst(file_name):
+  return np.array([map(float,line.split()) for line in open(file_name) if line.strip()!=''])
+
+if __name__=='__main__':
+  n_div= int(sys.argv[1]) if len(sys.argv)>1 else 50
+  options= {'kernel':'maxg', 'c_min':0.01, 'f_reg':0.0001}
+  model= TLWR()
+  model.Load({'options':options})
+  model.Init()
+  for line in open(demo_dir+'data/ode_f3_smp.dat'):
+    data= map(float,line.split())
+    if len(data)>=5:  model.Update(data[0:3], data[3:5])
+
+  mi= [min([x[d] for x in model.DataX]) for d in range(3)]
+  ma= [max([x[d] for x in model.DataX]) for d in range(3)]
+  f_reduce=lambda xa:[xa[0],xa[2]]
+  f_repair=lambda xa,mi,ma,me:[xa[0],me[1],xa[1]]
+  x_var= [0.,0.,0.]
+
+  t0= time.time()
+  DumpPlotRef(model, f_reduce, f_repair, '/tmp/dumpplot_ref', x_var, n_div, [mi,ma])
+  t1= time.time()
+  DumpPlot(model, f_reduce=f_reduce, f_repair=f_repair, file_prefix='/tmp/dumpplot_new', x_var=x_var, n_div=n_div, bounds=[mi,ma])
+  t2= time.time()
+  DumpPlot(model, f_reduce=f_reduce, f_repair=f_repair, file_prefix='/tmp/dumpplot_new', x_var=x_var, n_div=n_div, bounds=[mi,ma], binary=True)
+  t3= time.time()
+  ref,new,binary= LoadEst('/tmp/dumpplot_ref_est.dat'), LoadEst('/tmp/dumpplot_new_est.dat'), np.load('/tmp/dumpplot_new_est.npy')
+  print('{0} samples, {1} grid points'.format(len(model.DataX), (n_div+1)**2))
+  print('per-point: {0:.3f}s, batch (text): {1:.3f}s, batch (binary): {2:.3f}s'.format(t1-t0, t2-t1, t3-t2))
+  print('max difference: text {0}, binary {1}'.format(np.abs(ref-new).max(), np.abs(ref-binary.reshape(ref.shape)).max()))
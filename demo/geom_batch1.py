@@ -0,0 +1,40 @@
+#!/usr/bin/python
+#\file    geom_batch1.py
+#\brief   Compare the batch pose algebra (geom_batch) with the single-element versions (geom).
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+def RandX():
+  q= np.random.randn(4)
+  return list(np.random.randn(3))+list(q/la.norm(q))
+
+def Main(N=1000):
+  X1= np.array([RandX() for i in range(N)])
+  X2= np.array([RandX() for i in range(N)])
+  #Identity and 180-degree rotations (singularities of InvRodrigues).
+  X1[:4,3:]= [[0,0,0,1],[1,0,0,0],[0,1,0,0],[0,0,1,0]]
+
+  print '#function  max error  time(loop)[s]  time(batch)[s]'
+  tests= [
+    ('QToRot', lambda i:QToRot(X1[i,3:]), lambda:QToRotBatch(X1[:,3:])),
+    ('RotToQ', lambda i:RotToQ(QToRot(X1[i,3:])), lambda:RotToQBatch(QToRotBatch(X1[:,3:]))),
+    ('Transform', lambda i:Transform(X1[i],X2[i]), lambda:TransformBatch(X1,X2)),
+    ('TransformList', lambda i:Transform(X1[0],X2[i]), lambda:TransformList(X1[0],X2)),
+    ('TransformLeftInvList', lambda i:TransformLeftInv(X1[0],X2[i]), lambda:TransformLeftInvList(X1[0],X2)),
+    ('DiffX', lambda i:DiffX(X1[i],X2[i]), lambda:DiffXBatch(X1,X2)),
+    ('AddDiffX', lambda i:AddDiffX(X1[i],X2[i,:6]), lambda:AddDiffXBatch(X1,X2[:,:6])),
+    ('AverageX', lambda i:AverageX(X1[i],X2[i],0.3), lambda:AverageXBatch(X1,X2,0.3)),
+    ]
+  for name,f_loop,f_batch in tests:
+    t0= time.time()
+    res_loop= np.array([f_loop(i) for i in range(N)],dtype=float)
+    t1= time.time()
+    res_batch= f_batch()
+    t2= time.time()
+    print name, np.abs(res_loop-res_batch).max(), t1-t0, t2-t1
+
+if __name__=='__main__':
+  Main()
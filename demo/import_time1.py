@@ -0,0 +1,30 @@
+#!/usr/bin/python
+#\file    import_time1.py
+#\brief   Benchmark of the import time of ay_py.core (lazy loading of the submodules).
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+import sys, os, time, subprocess
+
+#Each case is run in a new process; the time includes the interpreter startup.
+CASES= [
+  ('startup', 'pass'),
+  ('import ay_py.core', 'import ay_py.core'),
+  ('TRate only', 'from ay_py.core import TRate; TRate(100)'),
+  ('geometry helper', 'from ay_py.core import Transform; Transform([0,0,0, 0,0,0,1],[1,2,3])'),
+  ('TLWR', 'from ay_py.core import TLWR'),
+  ('import * (full)', 'from ay_py.core import *'),
+  ]
+
+if __name__=='__main__':
+  num= int(sys.argv[1]) if len(sys.argv)>1 else 5
+  src_dir= os.path.join(os.path.dirname(os.path.abspath(__file__)),'../src')
+  for name,code in CASES:
+    code= 'import sys; sys.path.insert(0,{0}); {1}'.format(repr(src_dir),code)
+    times= []
+    for i in range(num):
+      t0= time.time()
+      subprocess.check_call([sys.executable,'-c',code], stdout=open(os.devnull,'w'), stderr=subprocess.STDOUT)
+      times.append(time.time()-t0)
+    times.sort()
+    print('{0:20s}: median {1:.3f}s, min {2:.3f}s'.format(name, times[len(times)//2], times[0]))
@@ -0,0 +1,40 @@
+#!/usr/bin/python
+#\file    lwr_batch1.py
+#\brief   Test of TLWR.PredictBatch; compare with TLWR.Predict in accuracy and speed.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+def Main():
+  f_true= lambda x: [math.sin(3.0*x[0])+x[1]**2, x[0]*x[1]]
+  num_queries= 1000
+  random.seed(0)
+  print '#kernel  diff_query_x  t_single[ms]  t_batch[ms]  max_diff'
+  for kernel in ('l2g','maxg'):
+    for diff_query_x in (False,True):
+      model= TLWR()
+      model.Load({'options':{'kernel':kernel, 'diff_query_x':diff_query_x}})
+      model.Init()
+      for n in range(300):
+        x= [Rand(-1.0,1.0), Rand(-1.0,1.0)]
+        model.Update(x, f_true(x))
+      queries= [[Rand(-1.0,1.0), Rand(-1.0,1.0)] for i in range(num_queries)]
+      x_var= 0.01
+
+      model.Predict(queries[0])  #Build the internal matrices.
+      t0= time.time()
+      y_single= [model.Predict(q,x_var,with_var=True,with_grad=True) for q in queries]
+      t_single= time.time()-t0
+
+      t0= time.time()
+      y_batch= model.PredictBatch(queries,x_var,with_var=True,with_grad=True)
+      t_batch= time.time()-t0
+
+      diff= max(max(abs(r1.Y-r2.Y).max(), abs(r1.Var-r2.Var).max(), abs(r1.Grad-r2.Grad).max())
+                for r1,r2 in zip(y_single,y_batch))
+      print kernel, diff_query_x, 1000.0*t_single, 1000.0*t_batch, diff
+
+if __name__=='__main__':
+  Main()
@@ -0,0 +1,42 @@
+#!/usr/bin/python
+#\file    lwr_sparse1.py
+#\brief   Benchmark of TLWR.PredictSparse (truncated kernel) vs dense TLWR.Predict;
+#         per-query latency versus the number of samples.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+def Main():
+  f_true= lambda x: [math.sin(3.0*x[0])+x[1]**2]
+  num_queries= 50
+  random.seed(0)
+  print '#N  t_dense[ms]  t_sparse[ms]  max_diff(Y,Grad)  max_diff(Var)'
+  for N in (100, 300, 1000, 3000):
+    model= TLWR()
+    model.Load({'options':{'kernel':'l2g', 'kernel_cutoff':5.0}})
+    model.Init()
+    for n in range(N):
+      x= [Rand(-1.0,1.0), Rand(-1.0,1.0)]
+      model.Update(x, f_true(x))
+    queries= [[Rand(-1.0,1.0), Rand(-1.0,1.0)] for i in range(num_queries)]
+
+    model.Options['kernel_cutoff']= None
+    model.Predict(queries[0])  #Build the internal matrices.
+    t0= time.time()
+    y_dense= [model.Predict(q,with_var=True,with_grad=True) for q in queries]
+    t_dense= (time.time()-t0)/num_queries
+
+    model.Options['kernel_cutoff']= 5.0
+    model.Predict(queries[0])
+    t0= time.time()
+    y_sparse= [model.Predict(q,with_var=True,with_grad=True) for q in queries]
+    t_sparse= (time.time()-t0)/num_queries
+
+    diff= max(max(abs(r1.Y-r2.Y).max(), abs(r1.Grad-r2.Grad).max()) for r1,r2 in zip(y_dense,y_sparse))
+    diff_var= max(abs(r1.Var-r2.Var).max() for r1,r2 in zip(y_dense,y_sparse))
+    print N, 1000.0*t_dense, 1000.0*t_sparse, diff, diff_var
+
+if __name__=='__main__':
+  Main()
@@ -0,0 +1,35 @@
+#!/usr/bin/python
+#\file    nn_incremental1.py
+#\brief   Incremental training mode of TNNRegression (Options['train_mode']='incremental')
+#         with the default options; the error model should be trained as well as the mean model.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from __future__ import print_function
+from _path import *
+from ay_py.core import *
+
+def Main(num_samples=80):
+  np.random.seed(0)
+  options={
+    'base_dir': '/tmp/dnn_inc1/',
+    'n_units': [1,100,100,1],
+    'train_mode': 'incremental',
+    'verbose': False,
+    }
+  nn= TNNRegression()
+  nn.Load(data={'options':options})
+  nn.Init()
+  t_start= time.time()
+  for i in range(num_samples):
+    x= np.random.uniform(-1.0,1.0)
+    nn.Update([x], [np.sin(3.0*x)+0.05*np.random.randn()])
+  print('Training time: {0:.2f}s for {1} samples'.format(time.time()-t_start, num_samples))
+  print('Number of trainings: mean model {0}, error model {1}'.format(nn.Params['num_train'], nn.Params['num_train_err']))
+  assert nn.Params['num_train_err']>0, 'The error model is not trained.'
+  for x in (-0.5,0.0,0.5):
+    pred= nn.Predict([x], with_var=True)
+    print('x={0}: y={1} (true {2}), std-dev={3}'.format(x, ToList(pred.Y), np.sin(3.0*x), np.sqrt(np.diag(pred.Var))))
+
+if __name__=='__main__':
+  Main()
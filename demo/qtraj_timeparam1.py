@@ -0,0 +1,97 @@
+#!/usr/bin/python
+#\file    qtraj_timeparam1.py
+#\brief   Test of QTrajTimeParam (time-optimal time parameterization of a joint angle trajectory).
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from __future__ import print_function
+from _path import *
+from ay_py.core import *
+import time
+
+#Reference implementation with explicit forward/backward loops on the path speed u.
+def QTrajTimeParamLoop(q_start, q_traj, qvel_limits, qacc_limits):
+  q= [q_start]+list(q_traj)
+  D= len(q_start)
+  L,E= [],[]  #Segment lengths, joint velocities at u=1.
+  for q0,q1 in zip(q[:-1],q[1:]):
+    dq= [AngleMod1(a1-a0) for a0,a1 in zip(q0,q1)]
+    l= max(abs(d)/v for d,v in zip(dq,qvel_limits))
+    L.append(l)
+    E.append([d/l if l>0.0 else 0.0 for d in dq])
+  N= len(L)
+  c= [1.0]*(N+1)  #Speed limits at the via-points from the joint velocity jumps.
+  acc_via= [[0.0]*D for i in range(N+1)]  #Acceleration used by the velocity jump at each via-point.
+  for i in range(1,N):
+    if L[i-1]==0.0 or L[i]==0.0:  continue
+    ds= (L[i-1]+L[i])/2.0
+    for d in range(D):
+      de= abs(E[i][d]-E[i-1][d])
+      if de>0.0:  c[i]= min(c[i], math.sqrt(0.5*qacc_limits[d]*ds/de))
+    acc_via[i]= [abs(E[i][d]-E[i-1][d])*c[i]**2/ds for d in range(D)]
+  u_seg= [min(c[i],c[i+1]) for i in range(N)]  #Max speed in each segment.
+  u= [0.0]+[min(u_seg[i-1],u_seg[i]) for i in range(1,N)]+[0.0]
+  for i in range(1,N):
+    if L[i-1]==0.0 or L[i]==0.0:  u[i]= 0.0  #Stop at repeated waypoints.
+  alpha= [min((qacc_limits[d]-max(acc_via[i][d],acc_via[i+1][d]))/abs(E[i][d]) for d in range(D) if E[i][d]!=0.0)
+          if L[i]>0.0 else None for i in range(N)]
+  for i in range(N):
+    if alpha[i] is not None:  u[i+1]= min(u[i+1], math.sqrt(u[i]**2+2.0*alpha[i]*L[i]))
+  for i in reversed(range(N)):
+    if alpha[i] is not None:  u[i]= min(u[i], math.sqrt(u[i+1]**2+2.0*alpha[i]*L[i]))
+  t= [0.0]
+  for i in range(N):
+    if L[i]==0.0:  t.append(t[-1]);  continue
+    u0,u1,a,um= u[i],u[i+1],alpha[i],u_seg[i]
+    up= math.sqrt((u0**2+u1**2)/2.0+a*L[i])
+    if up<=um:  dt= (2.0*up-u0-u1)/a
+    else:       dt= (um-u0)/a+(um-u1)/a+(L[i]-(um**2-u0**2)/(2.0*a)-(um**2-u1**2)/(2.0*a))/um
+    t.append(t[-1]+dt)
+  return t[1:]
+
+#Check the velocity and acceleration limits with the segment velocities.
+def MaxRatios(q_start, q_traj, t_traj, qvel_limits, qacc_limits):
+  q= np.vstack(([q_start],q_traj))
+  t= np.concatenate(([0.0],t_traj))
+  dt= np.diff(t)
+  m= dt>0.0
+  v= np.zeros((len(dt),q.shape[1]))
+  v[m]= np.diff(q,axis=0)[m]/dt[m].reshape(-1,1)
+  v= np.vstack((np.zeros((1,q.shape[1])),v,np.zeros((1,q.shape[1]))))  #Zero velocity at start and end.
+  dt2= np.concatenate(([dt[0]],(dt[:-1]+dt[1:]),[dt[-1]]))/2.0  #Time between segment centers.
+  acc= np.diff(v,axis=0)/np.maximum(dt2,1e-9).reshape(-1,1)
+  return np.max(np.abs(v)/qvel_limits), np.max(np.abs(acc)/qacc_limits)
+
+if __name__=='__main__':
+  np.random.seed(1)
+  D= 7
+  qvel_limits= np.array([0.5,0.5,0.8,0.8,1.0,1.0,1.2])
+  qacc_limits= np.array([1.0,1.0,1.5,1.5,2.0,2.0,2.0])
+  q_start= np.random.uniform(-1,1,D)
+  amp,freq= np.random.uniform(0.2,1.0,D),np.random.uniform(0.5,1.5,D)
+  #The acceleration ratio is estimated with the average velocities of the segments.
+  for N in (5,30,300,2000):
+    #Smooth path (the accelerations at via-points are meaningful only for densely sampled smooth paths).
+    s= np.linspace(0.0,1.0,N+1)[1:].reshape(-1,1)
+    q_traj= q_start + amp*np.sin(np.pi*freq*s)
+    t0= time.time(); t_loop= QTrajTimeParamLoop(q_start, q_traj, qvel_limits, qacc_limits)
+    t1= time.time(); t_vec= QTrajTimeParam(q_start, q_traj, qvel_limits, qacc_limits)
+    t2= time.time()
+    t_lim= TimeTraj(1.0,N)
+    q_lim= q_traj.tolist()
+    LimitQTrajVel(q_start, q_lim, t_lim, qvel_limits)
+    t3= time.time()
+    vr,ar= MaxRatios(q_start, q_traj, t_vec, qvel_limits, qacc_limits)
+    print('N={0}: T={1:.3f}s (err to loop: {2:.1e}); max vel ratio={3:.3f}, max acc ratio(approx)={4:.3f}; LimitQTrajVel T={5:.3f}s'.format(
+      N, t_vec[-1], np.max(np.abs(t_vec-t_loop)), vr, ar, t_lim[-1]))
+    assert vr<=1.0+1e-6 and ar<=1.0+1e-6, (vr,ar)
+    print('  time: loop {0:.2f}ms, QTrajTimeParam {1:.2f}ms, LimitQTrajVel {2:.2f}ms'.format((t1-t0)*1e3,(t2-t1)*1e3,(t3-t2)*1e3))
+  #Minimum duration and velocity-only cases.
+  q_traj= q_start + np.cumsum(np.random.uniform(-0.01,0.01,(30,D)),axis=0)
+  print('Min duration 10s:', QTrajTimeParam(q_start, q_traj, qvel_limits, qacc_limits, t_traj=TimeTraj(10.0,30))[-1])
+  print('Velocity limits only:', QTrajTimeParam(q_start, q_traj, qvel_limits)[-1])
+  print('Stationary:', QTrajTimeParam(q_start, [q_start]*3, qvel_limits, qacc_limits, t_traj=[1.0,2.0,3.0]))
+  #Reversal through a repeated waypoint: the robot should stop there (not reverse at full speed).
+  t_rep= QTrajTimeParam([0.],[[1.],[1.],[0.]],[1.],[1.])
+  print('Repeated waypoint:', t_rep, 'loop:', QTrajTimeParamLoop([0.],[[1.],[1.],[0.]],[1.],[1.]),
+        'without the repeat:', QTrajTimeParam([0.],[[1.],[0.]],[1.],[1.]))
@@ -0,0 +1,18 @@
+#!/usr/bin/python
+#\file    rate_stats1.py
+#\brief   Test of TRate with the busy-wait tail and the loop statistics.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+if __name__=='__main__':
+  hz= float(sys.argv[1]) if len(sys.argv)>1 else 500.0
+  duration= float(sys.argv[2]) if len(sys.argv)>2 else 2.0
+  for spin in (0.0, 0.001):
+    rate= TRate(hz, spin=spin)
+    t_end= MonotonicTime()+duration
+    while MonotonicTime()<t_end:
+      rate.sleep()
+    rate.PrintStats('spin={0}'.format(spin))
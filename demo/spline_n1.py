@@ -0,0 +1,38 @@
+#!/usr/bin/python
+#\file    spline_n1.py
+#\brief   Compare TCubicHermiteSpline (one per joint) with TCubicHermiteSplineN.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+def Main(dof=7, num_keys=20, num_ticks=2000):
+  t_traj= np.cumsum([0.0]+[Rand(0.1,0.5) for i in range(num_keys-1)]).tolist()
+  q_traj= [[Rand(-1.0,1.0) for d in range(dof)] for i in range(num_keys)]
+  t_ticks= np.linspace(0.0,t_traj[-1],num_ticks)
+
+  t_start= time.time()
+  splines= [TCubicHermiteSpline() for d in range(dof)]
+  for d in range(dof):
+    data_d= [[t,q[d]] for q,t in zip(q_traj,t_traj)]
+    splines[d].Initialize(data_d, tan_method=splines[d].CARDINAL, c=0.0, m=0.0)
+  q_dq1= [[splines[d].Evaluate(t,with_tan=True) for d in range(dof)] for t in t_ticks]
+  print 'TCubicHermiteSpline x{dof}, per tick:'.format(dof=dof), time.time()-t_start
+
+  t_start= time.time()
+  spline= TCubicHermiteSplineN()
+  spline.Initialize(zip(t_traj,q_traj), tan_method=spline.CARDINAL, c=0.0, m=0.0)
+  q_dq2= [spline.Evaluate(t,with_tan=True) for t in t_ticks]
+  print 'TCubicHermiteSplineN, per tick:', time.time()-t_start
+
+  t_start= time.time()
+  Q,DQ= spline.Evaluate(t_ticks,with_tan=True)
+  print 'TCubicHermiteSplineN, all ticks at once:', time.time()-t_start
+
+  print 'max error (q,dq):', max(np.abs(np.array([[q for q,dq in q_dq] for q_dq in q_dq1])-Q).max(),
+                                 np.abs(np.array([[dq for q,dq in q_dq] for q_dq in q_dq1])-DQ).max(),
+                                 np.abs(np.array([q for q,dq in q_dq2])-Q).max())
+
+if __name__=='__main__':
+  Main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+#\file    xinterp_batch1.py
+#\brief   Compare the array-based XInterpolation/QInterpolation/CheckXQTrajValidity
+#         with the loop-based versions.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from __future__ import print_function
+from _path import *
+from ay_py.core import *
+import time
+
+#Loop-based versions (previous implementation).
+def XInterpolationLoop(x1,x2,N):
+  p1,R1= XToPosRot(x1)
+  p2,R2= XToPosRot(x2)
+  dp= (p2-p1)/float(N)
+  w= InvRodrigues(np.dot(R2,R1.T))
+  traj=[]
+  for t in range(N):
+    R= np.dot(Rodrigues(float(t+1)/float(N)*w),R1)
+    p1= p1+dp
+    traj.append(PosRotToX(p1,R))
+  return traj
+
+def QInterpolationLoop(q1,q2,N):
+  R1= QToRot(q1)
+  w= InvRodrigues(np.dot(QToRot(q2),R1.T))
+  return [RotToQ(np.dot(Rodrigues(float(t+1)/float(N)*w),R1)) for t in range(N)]
+
+def CheckXQTrajValidityLoop(q_traj, x_traj, f_fk, dp_lim=np.inf, dq_lim=0.1, N_int=5):
+  if len(q_traj)<=1:  return True
+  x_traj_int= [list(x_traj[0])] + sum([XInterpolationLoop(x1,x2,N_int) for x1,x2 in zip(x_traj[:-1],x_traj[1:])], [])
+  q_traj_int= [q_traj[0]] + sum([(q1+(np.array(q2)-q1)*np.linspace(0,1,N_int+1)[1:].reshape(-1,1)).tolist() for q1,q2 in zip(q_traj[:-1],q_traj[1:])], [])
+  x_traj_est= [f_fk(q) for q in q_traj_int]
+  for x1,x2 in zip(x_traj_int,x_traj_est):
+    dx= DiffX(x1,x2)
+    if la.norm(dx[:3])>=dp_lim or la.norm(dx[3:])>=dq_lim:  return False
+  return True
+
+#Toy 2-joint planar "robot" whose end-effector pose is a function of q.
+def FK(q):
+  p= [np.cos(q[0])+np.cos(q[0]+q[1]), np.sin(q[0])+np.sin(q[0]+q[1]), 0.0]
+  return p+list(QFromAxisAngle([0,0,1],q[0]+q[1]))
+def FKBatch(q):
+  q= np.asarray(q)
+  th= q[:,0]+q[:,1]
+  x= np.zeros((len(q),7))
+  x[:,0]= np.cos(q[:,0])+np.cos(th)
+  x[:,1]= np.sin(q[:,0])+np.sin(th)
+  x[:,5]= np.sin(th/2.0)
+  x[:,6]= np.cos(th/2.0)
+  return x
+
+if __name__=='__main__':
+  np.random.seed(0)
+  def RandX():  return list(np.random.uniform(-1,1,3))+list(QFromAxisAngle(np.random.uniform(-1,1,3),np.random.uniform(-np.pi,np.pi)))
+  err_x,err_q= 0.0,0.0
+  for i in range(200):
+    x1,x2= RandX(),RandX()
+    err_x= max(err_x, la.norm(DiffXBatch(XInterpolationLoop(x1,x2,10),XInterpolation(x1,x2,10))))
+    err_q= max(err_q, la.norm(DiffXBatch([[0,0,0]+list(q) for q in QInterpolationLoop(x1[3:],x2[3:],10)],
+                                         [[0,0,0]+list(q) for q in QInterpolation(x1[3:],x2[3:],10)])))
+  print('Max error (XInterpolation, QInterpolation):',err_x,err_q)
+
+  x1,x2= RandX(),RandX()
+  for N in (30,300):
+    t0= time.time(); XInterpolationLoop(x1,x2,N); t1= time.time(); XInterpolation(x1,x2,N); t2= time.time()
+    print('XInterpolation N={0}: loop {1:.2f}ms, array {2:.2f}ms'.format(N,(t1-t0)*1e3,(t2-t1)*1e3))
+
+  q_traj= np.cumsum(np.random.uniform(-0.05,0.05,(200,2)),axis=0)
+  x_traj= [FK(q) for q in q_traj]
+  for dp_lim in (np.inf,1e-5):
+    t0= time.time(); r0= CheckXQTrajValidityLoop(q_traj, x_traj, FK, dp_lim=dp_lim)
+    t1= time.time(); r1= CheckXQTrajValidity(q_traj, x_traj, FK, dp_lim=dp_lim)
+    t2= time.time(); r2= CheckXQTrajValidity(q_traj, x_traj, None, dp_lim=dp_lim, f_fk_batch=FKBatch)
+    t3= time.time()
+    print('CheckXQTrajValidity dp_lim={0}: results {1} {2} {3}; loop {4:.1f}ms, f_fk {5:.1f}ms, f_fk_batch {6:.1f}ms'.format(
+      dp_lim,r0,r1,r2,(t1-t0)*1e3,(t2-t1)*1e3,(t3-t2)*1e3))
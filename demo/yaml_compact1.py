@@ -0,0 +1,52 @@
+#!/usr/bin/python
+#\file    yaml_compact1.py
+#\brief   Benchmark of ToStdType and DumpYAML/LoadYAML with compact encodings of arrays.
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+from _path import *
+from ay_py.core import *
+
+#Reference: element-by-element version of ToStdType.
+def ToStdTypeRef(x, except_cnv=lambda y:y):
+  if isinstance(x, Types.npbool):   return bool(x)
+  if isinstance(x, Types.npint):    return int(x)
+  if isinstance(x, Types.npuint):   return int(x)
+  if isinstance(x, Types.npfloat):  return float(x)
+  if isinstance(x, Types.stdprim):  return x
+  if isinstance(x, np.ndarray):  return x.tolist()
+  if isinstance(x, (list,tuple,set)):  return map(lambda x2:ToStdTypeRef(x2,except_cnv), x)
+  if isinstance(x, dict):  return {ToStdTypeRef(k,except_cnv):ToStdTypeRef(v,except_cnv) for k,v in x.iteritems()}
+  try:
+    return {ToStdTypeRef(k,except_cnv):ToStdTypeRef(v,except_cnv) for k,v in x.__dict__.iteritems()}
+  except AttributeError:
+    return except_cnv(x)
+
+if __name__=='__main__':
+  N= int(sys.argv[1]) if len(sys.argv)>1 else 5000
+  #Data like a saved LWR model: samples as lists of lists, parameters as arrays.
+  data= {'DataX':[[Rand(),Rand(),Rand()] for i in range(N)],
+         'DataY':[[Rand()] for i in range(N)],
+         'C':[np.float64(Rand()) for i in range(N)],
+         'W':np.random.rand(200,50),
+         'options':{'kernel':'l2g', 'c_min':0.01}}
+
+  t0= time.time()
+  d_ref= ToStdTypeRef(data)
+  t1= time.time()
+  d_new= ToStdType(data)
+  t2= time.time()
+  print('ToStdType: element-wise {0:.4f}s, bulk {1:.4f}s, same: {2}'.format(t1-t0, t2-t1, d_ref==d_new))
+
+  #Lists mixing ints and floats are kept element-wise (ints stay ints).
+  mixed= {'m':[1,2.5]*50, 'mm':[[1,2.5]]*50}
+  print('Mixed int/float lists kept: {0}'.format(LoadYAMLStr(DumpYAML(mixed, compact='binary'))==mixed))
+
+  for compact in (None, 'binary'):
+    t0= time.time()
+    s= DumpYAML(data, compact=compact)
+    t1= time.time()
+    d2= LoadYAMLStr(s)
+    t2= time.time()
+    print('DumpYAML(compact={0}): {1} bytes, dump {2:.4f}s, load {3:.4f}s, same: {4}'.format(
+      compact, len(s), t1-t0, t2-t1, d2==d_ref))
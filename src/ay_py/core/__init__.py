@@ -1,7 +1,14 @@
 from __future__ import absolute_import
+import os
+import re
+import sys
+import types
+import importlib
+
 __PACKAGES__= [
   'dpl4',
   'geom',
+  'geom_batch',
   'geom_ex',
   'ml',
   'ml_dnn',
@@ -14,19 +21,87 @@ __PACKAGES__= [
   'util',
   ]
 
-from .util      import *
-
-try:  from .dpl4      import *
-except ImportError as e:  CPrint(4,str(e))
-from .geom      import *
-try:  from .geom_ex   import *
-except ImportError as e:  CPrint(str(e))
-from .ml        import *
-try:  from .ml_dnn    import *
-except ImportError as e:  CPrint(str(e))
-from .ml_lwr    import *
-from .opt       import *
-from .sm        import *
-from .sm2       import *
-from .system    import *
-from .traj      import *
+#Submodules are imported lazily: a public name (e.g. TRate, Transform) is resolved
+#from __PACKAGES__ on its first access, and only the submodule defining it is imported.
+#"from ay_py.core import *" imports all the submodules (same as the eager imports).
+
+#Order to import the submodules (the order of the former eager star-imports).
+__IMPORT_ORDER__= ['util']+[p for p in __PACKAGES__ if p!='util']
+#Submodules that may fail to import due to missing dependencies (e.g. Chainer, SciPy).
+__OPTIONAL__= ('dpl4','geom_ex','ml_dnn')
+
+#Regular expressions to find the top-level definitions in the source of a submodule.
+_RE_DEF= re.compile(r'^(?:def|class)\s+([A-Za-z]\w*)|^([A-Za-z]\w*)\s*=(?!=)', re.M)
+
+class TLazyPackage(types.ModuleType):
+  def __init__(self, module):
+    super(TLazyPackage,self).__init__(module.__name__)
+    self.__dict__.update((k,v) for k,v in module.__dict__.items() if k.startswith('__'))
+    self.__dict__['_module']= module  #Keep the original module alive (its globals are cleared when deleted on Python 2).
+    self.__dict__['_loaded']= {}  #{submodule name: module or None (failed)}
+    self.__dict__['_index']= None  #{public name: submodule name}
+
+  #Import a submodule; return None if an optional one is not available.
+  def _Load(self, pkg):
+    loaded= self.__dict__['_loaded']
+    if pkg not in loaded:
+      try:
+        loaded[pkg]= importlib.import_module('.'+pkg, self.__name__)
+      except ImportError as e:
+        if pkg not in __OPTIONAL__:  raise
+        loaded[pkg]= None
+        self._Load('util').CPrint(4,str(e))
+    return loaded[pkg]
+
+  #Index of the names defined at the top level of each submodule (made from the sources without importing).
+  def _Index(self):
+    if self.__dict__['_index'] is None:
+      index= {}
+      dir_path= os.path.dirname(os.path.abspath(self.__file__))
+      for pkg in __IMPORT_ORDER__:
+        try:
+          with open(os.path.join(dir_path,pkg+'.py')) as fp:  src= fp.read()
+        except IOError:
+          continue
+        for m in _RE_DEF.finditer(src):
+          index.setdefault(m.group(1) or m.group(2), pkg)
+      self.__dict__['_index']= index
+    return self.__dict__['_index']
+
+  #Called when name is not in the namespace yet.
+  #The submodule defining name is imported first; otherwise (e.g. np, math that are imported in submodules)
+  #the submodules are searched in the import order with the already-imported ones first.
+  def __getattr__(self, name):
+    if name.startswith('_'):  raise AttributeError(name)
+    loaded= self.__dict__['_loaded']
+    pkg= self._Index().get(name)
+    candidates= ([pkg] if pkg is not None else []) \
+              + [p for p in __IMPORT_ORDER__ if p in loaded] \
+              + [p for p in __IMPORT_ORDER__ if p not in loaded]
+    for pkg in candidates:
+      mod= self._Load(pkg)
+      if mod is not None and name in mod.__dict__:
+        value= mod.__dict__[name]
+        setattr(self, name, value)
+        return value
+    raise AttributeError('module {0} has no attribute {1}'.format(self.__name__,name))
+
+  #Names including the ones not imported yet (for completion in interactive shells).
+  def __dir__(self):
+    return sorted(set(self.__dict__)|set(self._Index()))
+
+  #Import all the submodules and return the public names (used by "from ay_py.core import *").
+  @property
+  def __all__(self):
+    self.LoadAll()
+    return [name for name in self.__dict__ if not name.startswith('_')]
+
+  #Import all the submodules (equivalent to the former eager import).
+  def LoadAll(self):
+    for pkg in __IMPORT_ORDER__:
+      mod= self._Load(pkg)
+      if mod is None:  continue
+      for name,value in mod.__dict__.items():
+        if not name.startswith('_'):  self.__dict__.setdefault(name, value)
+
+sys.modules[__name__]= TLazyPackage(sys.modules[__name__])
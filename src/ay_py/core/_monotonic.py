@@ -0,0 +1,32 @@
+#!/usr/bin/python
+#\file    _monotonic.py
+#\brief   Monotonic clock (no dependency other than the standard library).
+#         NOTE: Internal use only (by util and misc/dxl_util).
+#\author  Akihiko Yamaguchi, info@akihikoy.net
+#\version 0.1
+#\date    Oct.16, 2026
+import time
+
+#Monotonic clock (seconds) that is not affected by system time changes.
+#Python 3: time.monotonic.  Python 2 (Linux): clock_gettime(CLOCK_MONOTONIC) via ctypes.
+#Falls back to time.time when neither is available.
+def _monotonic_clock():
+  if hasattr(time,'monotonic'):  return time.monotonic
+  try:
+    import ctypes, ctypes.util
+    class timespec(ctypes.Structure):
+      _fields_= [('tv_sec',ctypes.c_long),('tv_nsec',ctypes.c_long)]
+    librt= ctypes.CDLL(ctypes.util.find_library('rt') or 'librt.so.1', use_errno=True)
+    clock_gettime= librt.clock_gettime
+    clock_gettime.argtypes= [ctypes.c_int, ctypes.POINTER(timespec)]
+    CLOCK_MONOTONIC= 1
+    def monotonic():
+      ts= timespec()  #Allocated for each call as this is called from multiple threads.
+      if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(ts))!=0:
+        raise OSError(ctypes.get_errno(), 'clock_gettime failed')
+      return ts.tv_sec + ts.tv_nsec*1.0e-9
+    monotonic()
+    return monotonic
+  except Exception:
+    return time.time
+MonotonicTime= _monotonic_clock()
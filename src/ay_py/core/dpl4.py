@@ -348,44 +348,317 @@ class TGraphEpisode(object):
     return line
 
 
-'''Database of episodes where each episode is an instance of TGraphEpisode.'''
+'''Read-only view of an episode stored in TGraphEpisodeDB (columnar storage).
+It has the interface of TGraphEpisode; Seq (TGraphEpisode.TNode objects) is built
+from the columns on the first access, while R, Len, and NumVisits do not build Seq.
+ToStdType of a view gives the same dictionary as a TGraphEpisode (TGraphEpisodeDB.EpisodeToStdType).
+NOTE: Modifying Seq of a view does not change the database; only R can be assigned (TGraphEpisodeDB.SetR).'''
+class TGraphEpisodeView(TGraphEpisode):
+  def __init__(self, db, index):
+    self.DB= db
+    self.Index= index
+    self.seq= None
+
+  @property
+  def R(self):
+    return self.DB.rewards[self.Index]
+
+  @R.setter
+  def R(self, value):
+    self.DB.SetR(self.Index, value)
+
+  @property
+  def Seq(self):
+    if self.seq is None:  self.seq= self.DB.MakeSeq(self.Index)
+    return self.seq
+
+  @property
+  def Len(self):
+    return len(self.DB.seqs[self.Index])
+
+  def NumVisits(self,name):
+    return sum(1 for parent,name2,rows in self.DB.seqs[self.Index] if name2==name)
+
+RegisterStdTypeCnv(TGraphEpisodeView, lambda eps: eps.DB.EpisodeToStdType(eps.Index))
+
+'''Database of episodes where each episode is an instance of TGraphEpisode.
+Storage:
+  The finished episodes are stored in columns; for each (node name, XSSA key),
+  a column (TGraphEpisodeDB.TColumn) holds X and Cov of all nodes of the episodes
+  with the episode index, the index in Seq, and the number of visits of each row.
+  The rewards R of the finished episodes are stored as a vector,
+  and a node-name index gives the rows (episode, index in Seq, visits) of each node name.
+  The current (last) episode is kept as a TGraphEpisode object (referring to the added XSSA)
+  until NewEntry is called (or Commit is called explicitly).
+  Entry is a list-like object of the episodes; the finished episodes are given as
+  TGraphEpisodeView (lazy, read-only view) and the current one is the TGraphEpisode object.
+Queries:
+  SearchIf, SearchTopN: accept a function of an episode (compatible interface),
+    or an array of booleans/scores of the episodes (vectorized queries) made with
+    RVector, NodeValues, etc.  e.g.
+      db.SearchIf(db.RVector(-np.inf)>R_min)
+      db.SearchTopN(None, num)  #Top-num episodes w.r.t. R.
+      idx,X= db.NodeValues('n0','x1')  #X of 'x1' at the first visits of 'n0'.
+Persistence:
+  Save/Load: a dictionary of standard types (for YAML); the whole database is converted.
+  SaveBin/LoadBin: an append-only binary log; SaveBin appends only the new episodes.
+  ConvertEpisodeDBYAMLToBin and ConvertEpisodeDBBinToYAML convert the files.
+'''
 class TGraphEpisodeDB(object):
+  '''Column of values over the finished episodes.
+    Each row has: episode index (Eps), index in TGraphEpisode.Seq (Seq), number of visits (Visit),
+    X (flat ndarray, or None), and Cov (as it is). '''
+  class TColumn(object):
+    def __init__(self):
+      self.Eps= []
+      self.Seq= []
+      self.Visit= []
+      self.X= []
+      self.Cov= []
+      self.arrays= None  #Cache of Arrays().
+
+    def __len__(self):
+      return len(self.Eps)
+
+    def Append(self, eps, seq, visit, x=None, cov=None):
+      self.Eps.append(eps)
+      self.Seq.append(seq)
+      self.Visit.append(visit)
+      self.X.append(x)
+      self.Cov.append(cov)
+      return len(self.Eps)-1
+
+    #Remove rows from the index row.
+    def Truncate(self, row):
+      for l in (self.Eps,self.Seq,self.Visit,self.X,self.Cov):  del l[row:]
+      self.arrays= None
+
+    #Return X of a row as a column vector (same as StdDictToXSSA).
+    #It is a copy as X may be a read-only view of a file (cf. LoadBin).
+    def XVec(self, row):
+      x= self.X[row]
+      return MCVec(np.array(x) if x is not None else None)
+
+    '''Return arrays (Eps,Seq,Visit,X) of all rows; X is a (rows,D) float array where
+      D is the dimension of the first valid row; rows of None or different dimensions are NaN.
+      The arrays are cached and extended incrementally. '''
+    def Arrays(self):
+      n= 0 if self.arrays is None else len(self.arrays[0])
+      if n<len(self.Eps):
+        if self.arrays is not None:  D= self.arrays[3].shape[1]
+        else:  D= next((len(x) for x in self.X if x is not None), 0)
+        X= np.full((len(self.Eps)-n,D), np.nan)
+        for i,x in enumerate(self.X[n:]):
+          if x is not None and len(x)==D:  X[i]= x
+        new= (np.array(self.Eps[n:],dtype=int), np.array(self.Seq[n:],dtype=int),
+              np.array(self.Visit[n:],dtype=int), X)
+        if self.arrays is None:  self.arrays= new
+        else:  self.arrays= tuple(np.concatenate((a,b)) for a,b in zip(self.arrays,new))
+      elif self.arrays is None:
+        self.arrays= (np.zeros(0,dtype=int),np.zeros(0,dtype=int),np.zeros(0,dtype=int),np.zeros((0,0)))
+      return self.arrays
+
+  '''List-like object of the episodes (TGraphEpisodeDB.Entry).'''
+  class TEntry(object):
+    def __init__(self, db):
+      self.db= db
+    def __len__(self):
+      return self.db.NumEntries()
+    def __iter__(self):
+      for i in range(len(self.db.seqs)):  yield self.db.view(i)
+      if self.db.current is not None:  yield self.db.current
+    def __getitem__(self, index):
+      if isinstance(index,slice):
+        return [self[i] for i in range(*index.indices(len(self)))]
+      N= len(self)
+      if index<0:  index+= N
+      if index<0 or index>=N:  raise IndexError('TGraphEpisodeDB.Entry: index out of range')
+      if index==len(self.db.seqs):  return self.db.current
+      return self.db.view(index)
+
   def __init__(self):
-    self.Entry= []  #List of episodes.
+    self.seqs= []      #Nodes of the finished episodes; seqs[i][n]= (parent,name,{key:row of the column (name,key)}).
+    self.rewards= []   #R of the finished episodes (None is allowed).
+    self.columns= {}   #{(name,key):TColumn}
+    self.nodes= {}     #Node-name index; {name:TColumn (without X and Cov)}
+    self.current= None  #Current (last) episode (TGraphEpisode) or None.
+    self.r_vector= None  #Cache of the reward vector of the finished episodes.
+    self.views= []  #Cache of TGraphEpisodeView of the finished episodes.
+    self.bin_saved= {}  #{file_name:number of episodes saved by SaveBin}
+    self.Entry= self.TEntry(self)  #List-like object of episodes.
+
+  def NumEntries(self):
+    return len(self.seqs)+(1 if self.current is not None else 0)
+
+  #Return the view of the index-th finished episode.
+  def view(self, index):
+    while len(self.views)<len(self.seqs):  self.views.append(TGraphEpisodeView(self, len(self.views)))
+    return self.views[index]
+
+  #Convert the index-th episode to a standard dictionary (same as ToStdType(TGraphEpisode)).
+  def EpisodeToStdType(self, index):
+    index= index if index>=0 else self.NumEntries()+index
+    if index==len(self.seqs):  return ToStdType(self.current)
+    seq= []
+    for parent,name,rows in self.seqs[index]:
+      xs= {}
+      for key,row in rows.iteritems():
+        col= self.columns[(name,key)]
+        x= col.X[row]
+        xs[key]= {'X':x.reshape(-1,1).tolist() if x is not None else None, 'Cov':ToStdType(col.Cov[row])}
+      seq.append({'Parent':parent, 'Name':name, 'XS':xs})
+    return {'Seq':seq, 'R':ToStdType(self.rewards[index])}
 
   #Save into data (dict).
   def Save(self):
-    ST= ToStdType
     data= {}
-    data['Entry']= ST(self.Entry)
+    data['Entry']= [self.EpisodeToStdType(i) for i in range(self.NumEntries())]
     return data
 
   #Load from data (dict).
   def Load(self, data):
     if data is None:  return
     if 'Entry' in data:
-      self.Entry= [None]*len(data['Entry'])
-      for i,eps in enumerate(data['Entry']):
-        self.Entry[i]= TGraphEpisode()
-        self.Entry[i].Seq= [None]*len(eps['Seq'])
-        for n,node in enumerate(eps['Seq']):
-          self.Entry[i].Seq[n]= TGraphEpisode.TNode(parent=node['Parent'],name=node['Name'],xs=StdDictToXSSA(node['XS']))
-        self.Entry[i].R= eps['R']
+      self.__init__()
+      for eps in data['Entry']:
+        seq= [(node['Parent'],node['Name'],
+               {key:(np.array(value['X']).ravel() if value['X'] is not None else None, value['Cov'])
+                for key,value in node['XS'].iteritems()})
+              for node in eps['Seq']]
+        self.addEpisode(seq, eps['R'])
+
+  #Add an episode to the columns; seq= [(parent,name,{key:(x,cov)}),...].
+  def addEpisode(self, seq, R):
+    i_eps= len(self.seqs)
+    visits= {}
+    nodes= []
+    for n,(parent,name,xs) in enumerate(seq):
+      visit= visits.get(name,0)
+      visits[name]= visit+1
+      if name not in self.nodes:  self.nodes[name]= self.TColumn()
+      self.nodes[name].Append(i_eps, n, visit)
+      rows= {}
+      for key,(x,cov) in xs.iteritems():
+        col= self.columns.get((name,key))
+        if col is None:  col= self.columns[(name,key)]= self.TColumn()
+        rows[key]= col.Append(i_eps, n, visit, x, cov)
+      nodes.append((parent,name,rows))
+    self.seqs.append(nodes)
+    self.rewards.append(R)
+    self.r_vector= None
+
+  '''Save the finished episodes into a binary log file (cf. AppendBinLog) incrementally;
+    only the episodes added after the last SaveBin/LoadBin of file_name are appended.
+    Each episode is a record whose X are stored as raw float64 arrays.
+    commit: if True, the current episode is committed (moved to the columns) before saving. '''
+  def SaveBin(self, file_name, commit=True, interactive=True):
+    if commit:  self.Commit()
+    n_saved= self.bin_saved.get(file_name)
+    rewrite= n_saved is None or not IsBinLog(file_name)
+    if rewrite:  n_saved= 0
+    records= []
+    for i in range(n_saved,len(self.seqs)):
+      arrays= []
+      seq= []
+      for parent,name,rows in self.seqs[i]:
+        xs= {}
+        for key,row in rows.iteritems():
+          col= self.columns[(name,key)]
+          x= col.X[row]
+          if x is not None:
+            xs[key]= (len(arrays), ToStdType(col.Cov[row]))
+            arrays.append(x)
+          else:
+            xs[key]= (None, ToStdType(col.Cov[row]))
+        seq.append((parent,name,xs))
+      records.append(({'Seq':seq, 'R':ToStdType(self.rewards[i])}, arrays))
+    if rewrite:
+      #The file may be memory-mapped by LoadBin (X of the episodes refer to it),
+      #so a new file is written and renamed instead of truncating the file.
+      OpenWCheck(file_name,'wb',interactive)
+      file_tmp= file_name+'.tmp'
+      if os.path.exists(file_tmp):  os.remove(file_tmp)
+      AppendBinLog(file_tmp, records, interactive=False)
+      os.rename(file_tmp, file_name)
+    else:
+      AppendBinLog(file_name, records, interactive=interactive)
+    self.bin_saved[file_name]= len(self.seqs)
+
+  #Load from a binary log file saved by SaveBin.
+  #X of the columns refer to the memory-mapped file (no copy); episodes made by MakeSeq have writable copies.
+  def LoadBin(self, file_name):
+    self.__init__()
+    for meta,arrays in LoadBinLog(file_name):
+      seq= [(parent,name,{key:(arrays[i_x] if i_x is not None else None, cov)
+                          for key,(i_x,cov) in xs.iteritems()})
+            for parent,name,xs in meta['Seq']]
+      self.addEpisode(seq, meta['R'])
+    self.bin_saved[file_name]= len(self.seqs)
+
+  #Set R of the index-th episode (finished or current).
+  def SetR(self, index, R):
+    index= index if index>=0 else self.NumEntries()+index
+    if index==len(self.seqs):
+      self.current.R= R
+      return
+    self.rewards[index]= R
+    self.r_vector= None
+    #Binary logs including the episode will be rewritten.
+    self.bin_saved= {file_name:n for file_name,n in self.bin_saved.iteritems() if n<=index}
+
+  #Move the current episode to the columns.
+  def Commit(self):
+    if self.current is None:  return
+    eps,self.current= self.current,None
+    seq= [(node.Parent,node.Name,
+           {key:(np.array(ssa.X).ravel() if ssa.X is not None else None, ssa.Cov)
+            for key,ssa in node.XS.iteritems()})
+          for node in eps.Seq]
+    self.addEpisode(seq, eps.R)
+
+  #Move the last finished episode back to the current episode (to modify it).
+  def reopen(self):
+    if self.current is not None or len(self.seqs)==0:  return
+    eps= TGraphEpisode()
+    eps.Seq= self.MakeSeq(-1)
+    eps.R= self.rewards[-1]
+    #The rows of the last episode are at the end of the columns.
+    i_eps= len(self.seqs)-1
+    columns= set(self.nodes[name] for parent,name,rows in self.seqs[-1])
+    columns.update(self.columns[(name,key)] for parent,name,rows in self.seqs[-1] for key in rows)
+    for col in columns:
+      col.Truncate(col.Eps.index(i_eps))
+    self.seqs.pop()
+    self.rewards.pop()
+    del self.views[len(self.seqs):]
+    #Binary logs including the reopened episode will be rewritten.
+    self.bin_saved= {file_name:n for file_name,n in self.bin_saved.iteritems() if n<=len(self.seqs)}
+    self.r_vector= None
+    self.current= eps
+
+  #Make a list of TGraphEpisode.TNode of the index-th finished episode.
+  def MakeSeq(self, index):
+    return [TGraphEpisode.TNode(parent=parent,name=name,
+              xs={key:TSSA(x=self.columns[(name,key)].XVec(row),cov=self.columns[(name,key)].Cov[row])
+                  for key,row in rows.iteritems()})
+            for parent,name,rows in self.seqs[index]]
 
   @property
   def CurrId(self):
-    return Len(self.Entry)-1
+    return self.NumEntries()-1
 
   #Add a new entry.
   def NewEntry(self):
-    self.Entry.append(TGraphEpisode())
+    self.Commit()
+    self.current= TGraphEpisode()
 
   #Update total rewards R of the current entry.
   #Actually we sum all REWARD_KEY of XSSA in Seq.
   def UpdateR(self):
     assert(self.CurrId>=0)
-    if len(self.Entry[-1].Seq)>0:
-      self.Entry[-1].R= sum([node.XS[REWARD_KEY].X[0,0] for node in self.Entry[-1].Seq if REWARD_KEY in node.XS])
+    self.reopen()
+    if len(self.current.Seq)>0:
+      self.current.R= sum([node.XS[REWARD_KEY].X[0,0] for node in self.current.Seq if REWARD_KEY in node.XS])
 
   '''Add an node (TGraphEpisode.TNode) to the sequence of the last entry.
     parent: Index of previous stage (an index of TGraphEpisode.Seq of the same entry).
@@ -393,23 +666,65 @@ class TGraphEpisodeDB(object):
     xs:     XSSA.  '''
   def AddToSeq(self,parent,name,xs):
     assert(self.CurrId>=0)
-    self.Entry[-1].Seq.append(TGraphEpisode.TNode(parent=parent,name=name,xs=xs))
-    return len(self.Entry[-1].Seq)-1
-
-  #Return an episode specified by index.
+    self.reopen()
+    self.current.Seq.append(TGraphEpisode.TNode(parent=parent,name=name,xs=xs))
+    return len(self.current.Seq)-1
+
+  '''Return an episode specified by index.
+    A finished episode is a TGraphEpisodeView (read-only; modifying its Seq does not change the database,
+    while assigning R does), and the current one is the TGraphEpisode object (modifiable).
+    Use AddToSeq and UpdateR to modify the last episode. '''
   def GetEpisode(self, index):
     return self.Entry[index]
 
-  #Return indexes of episodes that satisfy condition(episode)={True,False}.
+  #Return the vector of R of all episodes; None is replaced by none_value.
+  def RVector(self, none_value=np.nan):
+    if self.r_vector is None:
+      self.r_vector= np.array([R if R is not None else np.nan for R in self.rewards], dtype=float)
+    R= self.r_vector
+    if self.current is not None:
+      R= np.append(R, self.current.R if self.current.R is not None else np.nan)
+    if not np.isnan(none_value):  R= np.where(np.isnan(R), none_value, R)
+    return R
+
+  '''Return the rows of a node name over the finished episodes as arrays (eps,seq,visit):
+    eps: episode indexes, seq: indexes in TGraphEpisode.Seq, visit: number of visits. '''
+  def NodeIndex(self, name):
+    if name not in self.nodes:  return np.zeros(0,dtype=int),np.zeros(0,dtype=int),np.zeros(0,dtype=int)
+    return self.nodes[name].Arrays()[:3]
+
+  '''Return X of (node name, XSSA key) over the finished episodes as (eps,X):
+    eps: episode indexes (M), X: (M,D) array (NaN for None).
+    num_visits: number of visits (start from 0) to be extracted; None for all visits. '''
+  def NodeValues(self, name, key, num_visits=0):
+    col= self.columns.get((name,key))
+    if col is None:  return np.zeros(0,dtype=int),np.zeros((0,0))
+    eps,seq,visit,X= col.Arrays()
+    if num_visits is None:  return eps,X
+    sel= visit==num_visits
+    return eps[sel],X[sel]
+
+  '''Return indexes of episodes that satisfy condition;
+    condition: a function condition(episode)={True,False},
+      or a boolean array of the episodes (e.g. db.RVector(-np.inf)>R_min). '''
   def SearchIf(self, condition):
-    return [i for i,eps in enumerate(self.Entry) if condition(eps)]
-
-  #Return indexes of episodes that have biggest key(episode);
-  #find num episodes and sort them in descending order w.r.t. key.
+    if callable(condition):
+      return [i for i,eps in enumerate(self.Entry) if condition(eps)]
+    return np.flatnonzero(condition).tolist()
+
+  '''Return indexes of episodes that have biggest key;
+    find num episodes and sort them in descending order w.r.t. key.
+    key: a function key(episode) (may return None),
+      an array of scores of the episodes (NaN is ignored),
+      or None (R of the episodes is used). '''
   def SearchTopN(self, key, num):
-    keys= [key(eps) for eps in self.Entry]  #may include None
-    topn= np.argsort(keys)[::-1][:num].tolist()
-    return [i for i in topn if keys[i] is not None]
+    if callable(key):
+      keys= [key(eps) for eps in self.Entry]  #may include None
+      topn= np.argsort(keys)[::-1][:num].tolist()
+      return [i for i in topn if keys[i] is not None]
+    scores= self.RVector() if key is None else np.asarray(key, dtype=float)
+    valid= np.flatnonzero(~np.isnan(scores))
+    return valid[np.argsort(scores[valid], kind='mergesort')[::-1][:num]].tolist()
 
   #Dump to a file pointer fp (e.g. sys.stdout).
   def Dump(self, fp):
@@ -432,10 +747,31 @@ class TGraphEpisodeDB(object):
     return self.Entry[index].Dump()
 
   def DumpOneYAML(self, index=-1):
-    if len(self.Entry)==0:  return ''
-    index= index if index>=0 else len(self.Entry)+index
-    if index==0:  return yamldump({'Entry':[ToStdType(self.Entry[index])]}, Dumper=YDumper)
-    else:         return yamldump([ToStdType(self.Entry[index])], Dumper=YDumper)
+    if self.NumEntries()==0:  return ''
+    index= index if index>=0 else self.NumEntries()+index
+    if index==0:  return yamldump({'Entry':[self.EpisodeToStdType(index)]}, Dumper=YDumper)
+    else:         return yamldump([self.EpisodeToStdType(index)], Dumper=YDumper)
+
+#Convert an episode database in YAML (saved with TGraphEpisodeDB.Save) to a binary log file.
+def ConvertEpisodeDBYAMLToBin(yaml_file, bin_file):
+  db= TGraphEpisodeDB()
+  db.Load(LoadYAML(yaml_file))
+  if os.path.exists(bin_file):  os.remove(bin_file)
+  db.SaveBin(bin_file)
+
+#Convert an episode database in a binary log file (saved with TGraphEpisodeDB.SaveBin) to YAML.
+def ConvertEpisodeDBBinToYAML(bin_file, yaml_file):
+  db= TGraphEpisodeDB()
+  db.LoadBin(bin_file)
+  SaveYAML(db.Save(), yaml_file)
+
+'''Return indexes of episodes in database whose R is greater than R_min.
+The query is vectorized if database provides RVector (e.g. TGraphEpisodeDB);
+otherwise database.SearchIf is used with a condition function. '''
+def SearchEpisodesByR(database, R_min):
+  if hasattr(database,'RVector'):
+    return database.SearchIf(database.RVector(-np.inf)>R_min)
+  return database.SearchIf(lambda eps: eps.R is not None and eps.R>R_min)
 
 
 '''Implementations for a graph-dynamical system.  This class defines the domain.
@@ -676,6 +1012,7 @@ class TGraphDynUtil(object):
   def DefaultOptions():
     Options= {}
     Options['f_reward_ucb']= 0.0  #Scale factor of UCB (Upper Confidence Bound; to compute a value J, instead of reward, we use reward+f*std_dev).
+    Options['cache_ptree']= True  #Cache the structure of planning trees in GetPTree (invalidated when Graph or Models change).
     #Options['use_prob_in_pred']= True  #Using a covariance of states/actions in prediction with forward models.
     return Options
   #@staticmethod
@@ -715,6 +1052,8 @@ class TGraphDynUtil(object):
     assert(isinstance(domain,TGraphDynDomain))
     assert(domain.Check())
     self.d= domain
+    self.ptree_cache= {}  #{(n_start,max_visits):ptree}, planning trees without XSSA made by GetPTree.
+    self.ptree_signature= None  #Signature of the domain structure for which ptree_cache is valid.
 
 
   #Randomly generate actions, return as XSSA.
@@ -878,11 +1217,38 @@ class TGraphDynUtil(object):
           tnode.dJ[key_x]= dJ_dx
     ptree.FlagBwd= 1
 
+  #Signature of the structure of the domain (graph, model inputs/outputs, and space types/dimensions).
+  #The cache of GetPTree is invalidated when this changes.
+  #It is computed from the contents at every call, so in-place modifications are also detected.
+  #The dictionaries are not sorted (a different order only invalidates the cache).
+  def DomainSignature(self):
+    d= self.d
+    return (tuple((key,node.Fp,tuple(node.Next),tuple(node.Fd)) for key,node in d.Graph.iteritems()),
+            tuple((key,tuple(In),tuple(Out)) for key,(In,Out,F) in d.Models.iteritems()),
+            tuple((key,sd.Type,sd.D) for key,sd in d.SpaceDefs.iteritems()))
+
   #Get a planning tree at a node n_start, with XSSA xs_start if given.
+  #If Options['cache_ptree'], the structure is unrolled once per (n_start,max_visits),
+  #and a blank copy (TPlanningTree.Blank) is returned.
   def GetPTree(self, n_start, xs_start=None, max_visits=3):
+    if not self.Options['cache_ptree']:
+      ptree= self.UnrollPTree(n_start, max_visits)
+      ptree.Tree[ptree.Start].XS= xs_start
+      return ptree
+    signature= self.DomainSignature()
+    if signature!=self.ptree_signature:
+      self.ptree_cache= {}
+      self.ptree_signature= signature
+    if (n_start,max_visits) not in self.ptree_cache:
+      self.ptree_cache[(n_start,max_visits)]= self.UnrollPTree(n_start, max_visits)
+    ptree= self.ptree_cache[(n_start,max_visits)].Blank()
+    ptree.Tree[ptree.Start].XS= xs_start
+    return ptree
+
+  #Unroll the graph at a node n_start and get a planning tree without XSSA.
+  def UnrollPTree(self, n_start, max_visits):
     #Unroll the dynamical graph, obtain a planning tree TPlanningTree.
     ptree= GraphToPTree(self.d.Graph, n_start, max_visits=max_visits)
-    ptree.Tree[ptree.Start].XS= xs_start
     #Get actions and selections to be planned:
     models= set()  #Models used in ptree.
     for key,t_node in ptree.Tree.iteritems():
@@ -1023,7 +1389,7 @@ class TGraphDDPSolver1(TGraphDynUtil):
     if self.Options['initguess_using_db'] and self.h.Database is not None:
       #Initial guess from database (past log)
       R_min= self.Options['initguess_R_min']
-      randidx= self.h.Database.SearchIf(lambda eps: eps.R is not None and eps.R>R_min)
+      randidx= SearchEpisodesByR(self.h.Database, R_min)
       random.shuffle(randidx)
       for i in randidx[:num]:
         eps= self.h.Database.GetEpisode(i)
@@ -1205,7 +1571,7 @@ class TGraphDDPSolver2(TGraphDynUtil):
       else:
         num_db= 1 if random.random()<self.Options['db_init_ratio'] else 0  #Probabilistic decision
       R_min= self.Options['db_init_R_min']
-      randidx= self.h.Database.SearchIf(lambda eps: eps.R is not None and eps.R>R_min)
+      randidx= SearchEpisodesByR(self.h.Database, R_min)
       random.shuffle(randidx)
       for i in randidx[:num_db]:
         eps= self.h.Database.GetEpisode(i)
@@ -1437,7 +1803,7 @@ class TGraphDDPSolver3(TGraphDynUtil):
       else:
         num_db= 1 if random.random()<self.Options['db_init_ratio'] else 0  #Probabilistic decision
       R_min= self.Options['db_init_R_min']
-      randidx= self.h.Database.SearchIf(lambda eps: eps.R is not None and eps.R>R_min)
+      randidx= SearchEpisodesByR(self.h.Database, R_min)
       random.shuffle(randidx)
       for i in randidx[:num_db]:
         eps= self.h.Database.GetEpisode(i)
@@ -1655,6 +2021,12 @@ class TGraphDDPSolver4(TGraphDynUtil):
 
     Options['num_finished']= 20  #Stop optimization when the number of optimized points reaches this value.
     Options['num_proc']= 12  #Number of optimization processes.
+    '''How optimization processes are run.
+      'pool': Persistent worker pool started at Init (stopped by Close).
+        Workers are forked at Init, i.e. they use the domain and models at that time.
+        Useful when Plan is called many times with the same solver (Init once, Plan many times, then Close).
+      'spawn': A new process is created for each optimization. '''
+    Options['proc_mode']= 'spawn'
     Options['max_total_iter']= 2000  #Max total-iterations.
 
     Options['prob_update_best']= 0.4  #In multi-point search, probability to update a best sample in trainee.
@@ -1685,13 +2057,52 @@ class TGraphDDPSolver4(TGraphDynUtil):
 
   def __init__(self):
     TGraphDynUtil.__init__(self)
+    self.pool= None
 
   #Initialize the planner.  We set a domain which should be an instance of TGraphDynDomain.
+  #If Options['proc_mode']=='pool', the worker pool is started; call Close after planning.
   def Init(self,domain,helper):
     TGraphDynUtil.Init(self,domain)
     assert(isinstance(helper,self.THelper))
     assert(helper.Check(domain))
     self.h= helper
+    if self.Options['proc_mode']=='pool':
+      self.StartPool()
+    elif self.Options['proc_mode']!='spawn':
+      raise Exception('Undefined proc_mode:',self.Options['proc_mode'])
+
+  #Stop the worker pool if running.
+  def Close(self):
+    if self.pool is None:  return
+    for proc in self.pool:  self.pool_jobs.put(None)
+    for proc in self.pool:
+      proc.join(1.0)
+      if proc.is_alive():  proc.terminate()
+    self.pool= None
+
+  #Start the worker pool of Options['num_proc'] processes.
+  #Jobs are (job ID, start node, start XSSA, with_log) put into self.pool_jobs,
+  #results are (job ID, optimized planning tree, result type, count, log lines) from self.pool_out.
+  def StartPool(self):
+    self.Close()
+    self.pool_jobs= mp.Queue()
+    self.pool_out= mp.Queue()
+    self.pool_stop= mp.Event()  #Set to stop the running optimizations.
+    self.pool= [mp.Process(target=self.PoolWorker) for i in range(self.Options['num_proc'])]
+    for proc in self.pool:
+      proc.daemon= True
+      proc.start()
+
+  #Main loop of a worker process of the pool.
+  def PoolWorker(self):
+    while True:
+      job= self.pool_jobs.get()
+      if job is None:  break
+      jid,n_start,xs_start,with_log= job
+      ptree= self.GetPTree(n_start, xs_start, max_visits=self.Options['max_visits'])
+      log= self.LogPTree if with_log else (lambda ptree: None)
+      ptree,res_type,count,log_lines= self.OptPTreeMain(ptree, log, self.pool_stop.is_set)
+      self.pool_out.put((jid, ptree, res_type, count, log_lines))
 
   def GetPTreeNum(self, ptree):
     num= self.Options['ptree_num']
@@ -1715,7 +2126,7 @@ class TGraphDDPSolver4(TGraphDynUtil):
       else:
         num_db= 1 if random.random()<self.Options['db_init_ratio'] else 0  #Probabilistic decision
       R_min= self.Options['db_init_R_min']
-      randidx= self.h.Database.SearchIf(lambda eps: eps.R is not None and eps.R>R_min)
+      randidx= SearchEpisodesByR(self.h.Database, R_min)
       random.shuffle(randidx)
       for i in randidx[:num_db]:
         eps= self.h.Database.GetEpisode(i)
@@ -1737,6 +2148,8 @@ class TGraphDDPSolver4(TGraphDynUtil):
       xs is not modified.
     return: TGraphDDPRes. '''
   def Plan(self, n_start, xs):
+    if self.Options['proc_mode']=='pool' and self.pool is None:
+      raise Exception('TGraphDDPSolver4.Plan: The worker pool is not running (call Init after Close).')
     diff_value= lambda ptree1,ptree2: self.Value(ptree1) - self.Value(ptree2)
     ptree= self.GetPTree(n_start, xs, max_visits=self.Options['max_visits'])
     actions_in_xs= [key for key in ptree.Actions if key in xs]
@@ -1762,11 +2175,7 @@ class TGraphDDPSolver4(TGraphDynUtil):
 
 
     if self.h.LogFP is not None:
-      log= lambda ptree: '%f # %s # %s\n'%(
-            self.Value(ptree),
-            ExtractXSSA(ptree.StartNode.XS, ptree.Actions+ptree.Selections),  #Actions
-            {key:ToList(ptree.StartNode.dJ[key]) for key in ptree.Actions}  #Gradients; [key_x]= dJ/dx
-            )
+      log= self.LogPTree
     else:
       log= lambda ptree: None
 
@@ -1794,13 +2203,20 @@ class TGraphDDPSolver4(TGraphDynUtil):
           a_noise= self.ActionNoise(ptree2.Actions,var=self.Options['grad_act_noise'])
           actions= {key:TSSA(ConstrainN(self.d.SpaceDefs[key].Bounds, ptree2.StartNode.XS[key].X + a_noise[key].X)) for key in ptree2.Actions}
           ptree2= ptree2.Blank(xs_start=PartialCopyXSSA(actions, CopyXSSA(ptree2.StartNode.XS)))
-        new_proc= mp.Process(target=self.OptPTree, args=(pid,queue_cmd,queue_out,ptree2,log))
-        processes[pid]= new_proc
-        processes[pid].start()
+        if self.pool is not None:
+          self.pool_jobs.put((pid, n_start, CopyXSSA(ptree2.StartNode.XS), self.h.LogFP is not None))
+          processes[pid]= None
+        else:
+          new_proc= mp.Process(target=self.OptPTree, args=(pid,queue_cmd,queue_out,ptree2,log))
+          processes[pid]= new_proc
+          processes[pid].start()
         pid+= 1
 
-      pid_out,ptree2,res_type,count_sub,log_lines= queue_out.get()
-      processes[pid_out].join()
+      if self.pool is not None:
+        pid_out,ptree2,res_type,count_sub,log_lines= self.pool_out.get()
+      else:
+        pid_out,ptree2,res_type,count_sub,log_lines= queue_out.get()
+        processes[pid_out].join()
       del processes[pid_out]
 
       last_value= self.Value(ptree2)
@@ -1826,19 +2242,44 @@ class TGraphDDPSolver4(TGraphDynUtil):
       print('DDP:', count, len(ptree_finished), len(ptree_set), max(ptree_finished,key=lambda x:x[1])[1] if len(ptree_finished)>0 else None, last_value, res_type, end=' ')
       CPrint(0,{key:ToList(ptree2.StartNode.XS[key].X) for key in ptree.Actions+ptree.Selections})
 
-    for i in xrange(len(processes)):  queue_cmd.put('stop')
-    for i in xrange(len(processes)):  queue_out.get()
-    for pid2,proc in processes.iteritems():  proc.join()
+    if self.pool is not None:
+      self.pool_stop.set()
+      for i in xrange(len(processes)):  self.pool_out.get()
+      self.pool_stop.clear()
+    else:
+      for i in xrange(len(processes)):  queue_cmd.put('stop')
+      for i in xrange(len(processes)):  queue_out.get()
+      for pid2,proc in processes.iteritems():  proc.join()
 
     if len(ptree_finished)>0:
       return TGraphDDPRes(max(ptree_finished,key=lambda x:x[1])[0], TGraphDDPRes.OK)
     else:
       return TGraphDDPRes(max(ptree_set,key=lambda x:x[1])[0], TGraphDDPRes.BAD_QUALITY)
 
+  #Log line of an optimization step.
+  def LogPTree(self, ptree):
+    return '%f # %s # %s\n'%(
+            self.Value(ptree),
+            ExtractXSSA(ptree.StartNode.XS, ptree.Actions+ptree.Selections),  #Actions
+            {key:ToList(ptree.StartNode.dJ[key]) for key in ptree.Actions}  #Gradients; [key_x]= dJ/dx
+            )
+
   #Optimize Actions (not Selections) in start node of TPlanningTree ptree.StartNode.
   #Initial guess of Actions and Selections should be done.
-  #This is a single optimization process such as gradient descent.
+  #This is a single optimization process such as gradient descent (run with mp.Process).
   def OptPTree(self, pid, queue_cmd, queue_out, ptree, log=lambda ptree: None):
+    def is_stopped():
+      try:
+        cmd= queue_cmd.get(block=False)
+        return cmd=='stop'
+      except MPQueue.Empty:
+        return False
+    ptree,res_type,count,log_lines= self.OptPTreeMain(ptree, log, is_stopped)
+    queue_out.put((pid, ptree, res_type, count, log_lines))
+
+  #Main part of OptPTree.  Optimization is stopped when is_stopped() returns True.
+  #Return (ptree, res_type, count, log_lines).
+  def OptPTreeMain(self, ptree, log, is_stopped):
     tol= self.Options['grad_tol']
     if self.Options['optimizer']=='gd':
       opt= TGradientAscent(alpha=self.Options['gd_alpha'], normalize_grad=self.Options['gd_nz_grad'])
@@ -1864,15 +2305,11 @@ class TGraphDDPSolver4(TGraphDynUtil):
         ptree= ptree_new
         res_type= 'good'
         break
-      try:
-        cmd= queue_cmd.get(block=False)
-        if cmd=='stop':  break
-      except MPQueue.Empty:
-        pass
+      if is_stopped():  break
       ptree= ptree_new
       value= value_new
     log_lines.append(log(ptree))
-    queue_out.put((pid, ptree, res_type, count, log_lines))
+    return ptree, res_type, count, log_lines
 
   #Initialize an optimizer for actions in start node of TPlanningTree ptree.StartNode.
   #Internal state of optimizer is also initialized and stored in ptree.StartNode.
@@ -2154,6 +2591,7 @@ class TGraphDynPlanLearn(TGraphDynUtil):
     t_start= time.time()
     res= ddp_sol.Plan(n_start, xs)
     plan_time= time.time() - t_start  #TODO:Save plan_time into a database.
+    ddp_sol.Close()
     if logfp is not None:  logfp.close()
     if res.ResCode>0 or res.ResCode in (res.MODEL_MISSING,res.BAD_QUALITY):
       if res.ResCode<=0:
@@ -2434,6 +2872,7 @@ class TGraphDynPlanLearn2(TGraphDynUtil):
     t_start= time.time()
     res= ddp_sol.Plan(n_start, xs)
     plan_time= time.time() - t_start  #TODO:Save plan_time into a database.
+    ddp_sol.Close()
     if logfp is not None:  logfp.close()
     if res.ResCode>0 or res.ResCode in (res.MODEL_MISSING,res.BAD_QUALITY):
       if res.ResCode<=0:
@@ -5,6 +5,7 @@ import numpy as np
 import numpy.linalg as la
 import math
 from .util import *
+from .geom_batch import *
 from ._rostf import (
   identity_matrix         as _rostf_identity_matrix        ,
   quaternion_matrix       as _rostf_quaternion_matrix      ,
@@ -275,7 +276,7 @@ def TransformLeftInvList(x_l,x_r_list):
     p_list= np.dot((np.array(x_r_list)-pl), Rl)
     return p_list
   elif len(x_r_list[0])==7:
-    raise Exception('Not Implemented Yet')
+    return TransformLeftInvBatch(x_l, x_r_list)
 
 #This solves for trans_x in "x_l = trans_x * x_r", i.e. return "x_l*inv(x_r)"
 #For example, get a transformation, x_r to x_l
@@ -341,11 +342,11 @@ def TransformList(x2, x1_list):
     R2= QToRot(x2)
 
   if len(x1_list[0])==7:
-    raise Exception('Not Implemented Yet')
+    return TransformBatch(x2, x1_list)
   if len(x1_list[0])==3:  #i.e. [x,y,z]
     return np.dot(x1_list,R2.T)+p2
   if len(x1_list[0])==4:  #i.e. [quaternion]
-    raise Exception('Not Implemented Yet')
+    return TransformBatch(x2, x1_list)
 
 #Get weighted average of two rotation matrices (intuitively, (1-w2)*R1 + w2*R2)
 def AverageRot(R1, R2, w2):
@@ -0,0 +1,179 @@
+#! /usr/bin/env python
+#Basic tools (geometry, batch version).
+#Functions in this module process N poses/points/quaternions/rotation matrices at once;
+#inputs are arrays of (N,7) poses [x,y,z,quaternion(qx,qy,qz,qw)], (N,3) points, (N,4) quaternions,
+#(N,3,3) rotation matrices, or (N,3) rotation vectors (=angle*axis).
+#A single element (e.g. a 7-dim pose) is also accepted and broadcast against the others,
+#while the outputs always have the leading axis N.
+#The results are the same as the single-element versions in geom.py (e.g. QToRot, RotToQ).
+from __future__ import absolute_import
+import numpy as np
+
+def _as2d(x, dim):
+  x= np.asarray(x,dtype=float)
+  return x.reshape(-1,dim) if x.ndim<=2 else x
+
+#Quaternions (N,4) to rotation matrices (N,3,3).
+def QToRotBatch(q):
+  q= _as2d(q,4)
+  qx,qy,qz,qw= q[:,0],q[:,1],q[:,2],q[:,3]
+  sqx,sqy,sqz,sqw= qx*qx,qy*qy,qz*qz,qw*qw
+  invs= 1.0/(sqx+sqy+sqz+sqw)
+  R= np.empty((len(q),3,3))
+  R[:,0,0]= ( sqx - sqy - sqz + sqw)*invs
+  R[:,1,1]= (-sqx + sqy - sqz + sqw)*invs
+  R[:,2,2]= (-sqx - sqy + sqz + sqw)*invs
+  R[:,1,0]= 2.0*(qx*qy + qz*qw)*invs
+  R[:,0,1]= 2.0*(qx*qy - qz*qw)*invs
+  R[:,2,0]= 2.0*(qx*qz - qy*qw)*invs
+  R[:,0,2]= 2.0*(qx*qz + qy*qw)*invs
+  R[:,2,1]= 2.0*(qy*qz + qx*qw)*invs
+  R[:,1,2]= 2.0*(qy*qz - qx*qw)*invs
+  return R
+
+#Rotation matrices (N,3,3) to quaternions (N,4).
+#Same algorithm as _rostf.quaternion_from_matrix.
+def RotToQBatch(R):
+  R= np.asarray(R,dtype=float).reshape(-1,3,3)
+  q= np.empty((len(R),4))
+  tr= R[:,0,0]+R[:,1,1]+R[:,2,2]
+  t= tr+1.0
+  a= tr>0.0
+  q[a,3]= t[a]
+  q[a,2]= R[a,1,0]-R[a,0,1]
+  q[a,1]= R[a,0,2]-R[a,2,0]
+  q[a,0]= R[a,2,1]-R[a,1,2]
+  diag= R[:,[0,1,2],[0,1,2]]
+  i_max= np.where(diag[:,1]>diag[:,0], 1, 0)
+  i_max= np.where(diag[:,2]>diag[np.arange(len(R)),i_max], 2, i_max)
+  for i in range(3):
+    b= ~a & (i_max==i)
+    if not b.any():  continue
+    j,k= (i+1)%3,(i+2)%3
+    t[b]= R[b,i,i]-(R[b,j,j]+R[b,k,k])+1.0
+    q[b,i]= t[b]
+    q[b,j]= R[b,i,j]+R[b,j,i]
+    q[b,k]= R[b,k,i]+R[b,i,k]
+    q[b,3]= R[b,k,j]-R[b,j,k]
+  q*= (0.5/np.sqrt(t))[:,None]
+  return q
+
+#Poses (N,7) to positions (N,3) and rotation matrices (N,3,3).
+def XToPosRotBatch(x):
+  x= _as2d(x,7)
+  return x[:,:3].copy(), QToRotBatch(x[:,3:])
+
+#Positions (N,3) and rotation matrices (N,3,3) to poses (N,7).
+def PosRotToXBatch(p, R):
+  R= np.asarray(R,dtype=float).reshape(-1,3,3)
+  p= np.broadcast_to(_as2d(p,3), (len(R),3))
+  return np.hstack((p, RotToQBatch(R)))
+
+#Rotation vectors w=angle*axis (N,3) to rotation matrices (N,3,3) (Rodrigues formula).
+def RodriguesBatch(w, epsilon=1.0e-6):
+  w= _as2d(w,3)
+  th= np.sqrt((w*w).sum(axis=1))
+  small= th<epsilon
+  ax= w/np.where(small,1.0,th)[:,None]
+  K= np.zeros((len(w),3,3))
+  K[:,0,1],K[:,0,2]= -ax[:,2], ax[:,1]
+  K[:,1,0],K[:,1,2]=  ax[:,2],-ax[:,0]
+  K[:,2,0],K[:,2,1]= -ax[:,1], ax[:,0]
+  R= np.eye(3) + np.sin(th)[:,None,None]*K + (1.0-np.cos(th))[:,None,None]*np.matmul(K,K)
+  R[small]= np.eye(3)
+  return R
+
+#Rotation matrices (N,3,3) to rotation vectors w=angle*axis (N,3) (inverse of Rodrigues).
+#The singularities (angle=0, pi) are handled in the same way as InvRodrigues.
+def InvRodriguesBatch(R, epsilon=1.0e-6):
+  R= np.asarray(R,dtype=float).reshape(-1,3,3)
+  a01,a02,a12= R[:,0,1]-R[:,1,0], R[:,0,2]-R[:,2,0], R[:,1,2]-R[:,2,1]
+  s01,s02,s12= R[:,0,1]+R[:,1,0], R[:,0,2]+R[:,2,0], R[:,1,2]+R[:,2,1]
+  tr= R[:,0,0]+R[:,1,1]+R[:,2,2]
+  singular= (np.abs(a01)<epsilon) & (np.abs(a02)<epsilon) & (np.abs(a12)<epsilon)
+  identity= singular & (np.abs(s01)<epsilon) & (np.abs(s02)<epsilon) & (np.abs(s12)<epsilon) & (np.abs(tr-3.0)<epsilon)
+  w= np.zeros((len(R),3))
+  #Regular case:
+  reg= ~singular
+  if reg.any():
+    s= np.sqrt(a12[reg]**2+a02[reg]**2+a01[reg]**2)
+    s[np.abs(s)<epsilon]= 1.0
+    angle= np.arccos((tr[reg]-1.0)/2.0)
+    w[reg]= (angle/s)[:,None]*np.stack((-a12[reg],a02[reg],-a01[reg]),axis=1)
+  #Singularity of angle=pi:
+  flip= singular & ~identity
+  if flip.any():
+    xx,yy,zz= (R[flip,0,0]+1.0)/2.0, (R[flip,1,1]+1.0)/2.0, (R[flip,2,2]+1.0)/2.0
+    xy,xz,yz= s01[flip]/4.0, s02[flip]/4.0, s12[flip]/4.0
+    c= np.cos(np.pi/4.0)
+    v= np.zeros((len(xx),3))
+    cx= (xx>yy) & (xx>zz)
+    cy= ~cx & (yy>zz)
+    cz= ~cx & ~cy
+    for case,d,dd,o1,o2,fault in ((cx,0,xx,xy,xz,(0.0,c,c)), (cy,1,yy,xy,yz,(c,0.0,c)), (cz,2,zz,xz,yz,(c,c,0.0))):
+      f= case & (dd<epsilon)
+      v[f]= fault
+      g= case & ~(dd<epsilon)
+      r= np.sqrt(dd[g])
+      others= [e for e in range(3) if e!=d]
+      v[g,d]= r
+      v[g,others[0]]= o1[g]/r
+      v[g,others[1]]= o2[g]/r
+    w[flip]= np.pi*v
+  return w
+
+#Transform by poses; compute "x2 * x1".
+#x2: (N,7) poses, (N,4) quaternions, or (N,3) points (translations).
+#x1: (N,7) poses, (N,4) quaternions, or (N,3) points.
+#The output has the same type as x1 (same as Transform).
+def TransformBatch(x2, x1):
+  d2,d1= np.shape(x2)[-1],np.shape(x1)[-1]
+  if d2==3:
+    if d1==4:  raise Exception('invalid Transform: point * quaternion')
+    x1= _as2d(x1,d1)
+    x2= _as2d(x2,3)
+    N= max(len(x1),len(x2))
+    x3= np.array(np.broadcast_to(x1,(N,d1)))
+    x3[:,:3]+= x2
+    return x3
+  if d2==7:  p2,R2= XToPosRotBatch(x2)
+  else:      p2,R2= np.zeros((1,3)), QToRotBatch(x2)
+  if d1==7:
+    p1,R1= XToPosRotBatch(x1)
+    return PosRotToXBatch(np.einsum('...ij,...j->...i',R2,p1)+p2, np.matmul(R2,R1))
+  if d1==3:
+    return np.einsum('...ij,...j->...i',R2,_as2d(x1,3))+p2
+  if d1==4:
+    return RotToQBatch(np.matmul(R2,QToRotBatch(x1)))
+
+#Solve x in "x_r = x_l * x", i.e. return "inv(x_l)*x_r".
+#x_l: (N,7) poses.
+#x_r: (N,7) poses or (N,3) points.
+def TransformLeftInvBatch(x_l, x_r):
+  pl,Rl= XToPosRotBatch(x_l)
+  RlT= np.swapaxes(Rl,1,2)
+  if np.shape(x_r)[-1]==3:
+    return np.einsum('...ij,...j->...i',RlT,_as2d(x_r,3)-pl)
+  pr,Rr= XToPosRotBatch(x_r)
+  return PosRotToXBatch(np.einsum('...ij,...j->...i',RlT,pr-pl), np.matmul(RlT,Rr))
+
+#Differences of poses [dx,dy,dz, dwx,dwy,dwz] (N,6) (intuitively, x2-x1).
+def DiffXBatch(x1, x2):
+  p1,R1= XToPosRotBatch(x1)
+  p2,R2= XToPosRotBatch(x2)
+  return np.hstack((p2-p1, InvRodriguesBatch(np.matmul(R2,np.swapaxes(R1,1,2)))))
+
+#Add differences of poses dx (N,6) (like results of DiffXBatch) to poses x1 (N,7).
+def AddDiffXBatch(x1, dx):
+  p1,R1= XToPosRotBatch(x1)
+  dx= _as2d(dx,6)
+  return PosRotToXBatch(p1+dx[:,:3], np.matmul(RodriguesBatch(dx[:,3:]),R1))
+
+#Weighted averages of poses (intuitively, (1-w2)*x1 + w2*x2).
+#w2: a weight or a vector of weights (N).
+def AverageXBatch(x1, x2, w2):
+  p1,R1= XToPosRotBatch(x1)
+  p2,R2= XToPosRotBatch(x2)
+  w2= np.reshape(np.asarray(w2,dtype=float),(-1,1))
+  w= InvRodriguesBatch(np.matmul(R2,np.swapaxes(R1,1,2)))
+  return PosRotToXBatch((1.0-w2)*p1+w2*p2, np.matmul(RodriguesBatch(w2*w),R1))
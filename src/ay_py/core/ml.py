@@ -280,9 +280,26 @@ class TFunctionApprox(object):
   def Predict(self, x, x_var=0.0, with_var=False, with_grad=False):
     raise Exception('FIXME: Implement')
 
+  '''
+  Do prediction for many queries at once.
+    Return a list of TPredRes instances (one for each row of X).
+    X: List (or array) of query points.
+    x_var: Covariance of x (common for all queries).
+    Subclasses may override this with a vectorized implementation;
+    this default calls Predict for each query.
+  '''
+  def PredictBatch(self, X, x_var=0.0, with_var=False, with_grad=False):
+    return [self.Predict(x, x_var, with_var=with_var, with_grad=with_grad) for x in X]
+
 
 #Dump function approximator (subclass of TFunctionApprox) to file for plot.
-def DumpPlot(fa, f_reduce=lambda xa:xa, f_repair=lambda xa,mi,ma,me:xa, file_prefix='/tmp/f', x_var=0.0, n_div=50, bounds=None):
+#  {file_prefix}_est.dat: Estimation over a 1D or 2D grid; each row is [xa1r, xa1, y]
+#    where xa1r is a grid point (reduced by f_reduce), xa1 is its repaired input (f_repair), y is the prediction.
+#    2D grids are separated by blank lines (gnuplot's splot format).
+#  {file_prefix}_smp.dat: Samples; each row is [f_reduce(x), x, y].
+#The whole grid is evaluated with fa.PredictBatch at once (a vectorized implementation of the model is used if exists).
+#binary: If True, {file_prefix}_est.npy (array of shape (n_div+1,n_div+1,cols) or (n_div+1,cols)) is saved instead of _est.dat.
+def DumpPlot(fa, f_reduce=lambda xa:xa, f_repair=lambda xa,mi,ma,me:xa, file_prefix='/tmp/f', x_var=0.0, n_div=50, bounds=None, binary=False):
   #if len(fa.DataX)==0:  print 'DumpPlot: No data'; return
   if not fa.IsPredictable():  print('DumpPlot: Not predictable'); return
   if bounds!=None:
@@ -300,20 +317,27 @@ def DumpPlot(fa, f_reduce=lambda xa:xa, f_repair=lambda xa,mi,ma,me:xa, file_pre
     print('DumpPlot: Invalid f_reduce function')
     return
 
-  fp= open('%s_est.dat'%(file_prefix),'w')
+  #Grid points (reduced) and their repaired inputs:
+  axes= [FRange1(xamin[d],xamax[d],n_div) for d in range(len(xamin))]
   if len(xamin)==2:
-    for xa1_1 in FRange1(xamin[0],xamax[0],n_div):
-      for xa1_2 in FRange1(xamin[1],xamax[1],n_div):
-        xa1r= [xa1_1,xa1_2]
-        xa1= f_repair(xa1r, xamin0, xamax0, xmed)
-        fp.write('%s\n' % ToStr(xa1r,xa1,ToList(fa.Predict(xa1,x_var).Y)))
-      fp.write('\n')
+    XR= [[xa1_1,xa1_2] for xa1_1 in axes[0] for xa1_2 in axes[1]]
   else:  #len(xamin)==1:
-    for xa1_1 in FRange1(xamin[0],xamax[0],n_div):
-      xa1r= [xa1_1]
-      xa1= f_repair(xa1r, xamin0, xamax0, xmed)
-      fp.write('%s\n' % ToStr(xa1r,xa1,ToList(fa.Predict(xa1,x_var).Y)))
-  fp.close()
+    XR= [[xa1_1] for xa1_1 in axes[0]]
+  XA= [f_repair(xa1r, xamin0, xamax0, xmed) for xa1r in XR]
+  Y= [np.ravel(pred.Y) for pred in fa.PredictBatch(XA, x_var)]
+  data= np.hstack((np.array(XR,dtype=float), np.array(XA,dtype=float).reshape(len(XA),-1), np.array(Y,dtype=float).reshape(len(Y),-1)))
+
+  shape= [len(axis) for axis in axes]+[data.shape[1]]
+  if binary:
+    np.save('%s_est.npy'%(file_prefix), data.reshape(shape))
+  else:
+    #Format all the rows at once with 12 significant digits (enough for plotting; same as str(float) of Python 2,
+    #while ToStr on Python 3 writes up to 17 digits).
+    row_fmt= ' '.join(['%.12g']*data.shape[1])+'\n'
+    fmt= (row_fmt*shape[1]+'\n')*shape[0] if len(xamin)==2 else row_fmt*shape[0]
+    fp= open('%s_est.dat'%(file_prefix),'w')
+    fp.write(fmt % tuple(data.ravel()))
+    fp.close()
   if fa.DataX is not None and fa.DataY is not None:
     fp= open('%s_smp.dat'%(file_prefix),'w')
     for xa1,x2 in zip(fa.DataX, fa.DataY):
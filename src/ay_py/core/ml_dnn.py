@@ -58,6 +58,126 @@ def ReLUGaussGrad(mu, var, epsilon=1.0e-6, cut_sd=4.0):
 
 ReLUGaussGradV= np.vectorize(ReLUGaussGrad)  #Vector version
 
+'''
+Growable array of samples (rows) to append samples in amortized O(1).
+- The capacity is doubled when it is full; the stored rows are contiguous.
+- View() returns a zero-copy view of the stored rows (e.g. for training).
+- Save/Load use np.save/np.load (the loaded array is copied into the buffer) instead of pickle.
+- Save(binlog=True) appends only new rows to a binary log (cf. SaveRowsBinLog).
+'''
+class TSampleBuffer(object):
+  def __init__(self, dtype=np.float32, capacity=16):
+    self.DType= dtype
+    self.MinCapacity= capacity
+    self.Clear()
+
+  def Clear(self):
+    self.Data= None  #Allocated array (capacity x row shape).
+    self.N= 0  #Number of stored rows.
+    self.binlog_saved= {}  #Number of rows saved in binary logs {file_name:rows}.
+
+  def __len__(self):
+    return self.N
+
+  #Return a zero-copy view of the stored rows.
+  def View(self):
+    if self.Data is None:  return np.array([],self.DType)
+    return self.Data[:self.N]
+
+  #Add a single row x.
+  def Append(self, x):
+    x= np.asarray(x, self.DType)
+    self.reserve(self.N+1, x.shape)
+    self.Data[self.N]= x
+    self.N+= 1
+
+  #Add rows X.
+  def Extend(self, X):
+    X= np.asarray(X, self.DType)
+    if X.size==0:  return
+    self.reserve(self.N+X.shape[0], X.shape[1:])
+    self.Data[self.N:self.N+X.shape[0]]= X
+    self.N+= X.shape[0]
+
+  #Save rows into file_name; if binlog, only the rows added after the last Save/Load are appended.
+  def Save(self, file_name, binlog=False):
+    if binlog:
+      SaveRowsBinLog(file_name, self.View(), self.binlog_saved)
+      return
+    fp= OpenW(file_name, 'wb')
+    np.save(fp, self.View())
+    fp.close()
+
+  #Load rows from file_name saved by Save (a pickled list of the older versions is also accepted).
+  def Load(self, file_name):
+    self.Clear()
+    if IsBinLog(file_name):
+      self.Extend(LoadRowsBinLog(file_name, self.binlog_saved))
+      return
+    with open(file_name, 'rb') as fp:
+      is_npy= (fp.read(6)==b'\x93NUMPY')
+    if is_npy:
+      self.Extend(np.load(file_name))
+    else:
+      with open(file_name, 'rb') as fp:
+        self.Extend(pickle.load(fp))
+
+  #Allocate the capacity for n rows of shape.
+  def reserve(self, n, shape):
+    if self.Data is None:
+      self.Data= np.empty((max(n,self.MinCapacity),)+shape, self.DType)
+    elif n>self.Data.shape[0]:
+      data= np.empty((max(n,2*self.Data.shape[0]),)+self.Data.shape[1:], self.DType)
+      data[:self.N]= self.Data[:self.N]
+      self.Data= data
+
+ErfV= np.vectorize(math.erf)  #Vector version of math.erf
+
+#Array version of ReLUGauss; mu and var are arrays of the same shape.
+#  Equivalent to ReLUGaussV, but only the entries in abs(mu)<=cut_sd*sigma are computed with erf.
+def ReLUGaussBatch(mu, var, epsilon=1.0e-6, cut_sd=4.0):
+  dtype= mu.dtype
+  mu= mu.astype(np.float64)
+  sigma= np.sqrt(np.maximum(var,0.0))
+  mu_out= np.maximum(0.0,mu)
+  var_out= np.zeros_like(mu)
+  is_gauss= sigma>=epsilon
+  if cut_sd!=None:
+    is_pos= is_gauss & (mu>cut_sd*sigma)
+    mu_out[is_pos]= mu[is_pos]
+    var_out[is_pos]= var[is_pos]
+    is_gauss&= (mu>=-cut_sd*sigma) & (mu<=cut_sd*sigma)
+  if is_gauss.any():
+    m,v,sg= mu[is_gauss], var[is_gauss].astype(np.float64), sigma[is_gauss]
+    sqrt2= math.sqrt(2.0)
+    sqrt2pi= math.sqrt(2.0*math.pi)
+    z= m/(sqrt2*sg)
+    E= ErfV(z)
+    X= np.exp(-z*z)
+    mo= sg/sqrt2pi*X + m/2.0*(1.0+E)
+    vo= (1.0+E)/4.0*(m*m*(1.0-E)+2.0*v) - sg*X/sqrt2pi*(sg*X/sqrt2pi+m*E)
+    if (vo<=-epsilon).any():
+      i= np.argmin(vo)
+      msg= 'ERROR in ReLUGaussBatch: %f, %f, %f, %f'%(m[i], sg[i], mo[i], vo[i])
+      print(msg)
+      raise Exception(msg)
+    mu_out[is_gauss]= mo
+    var_out[is_gauss]= np.maximum(vo,0.0)
+  return mu_out.astype(dtype), var_out.astype(dtype)
+
+#Array version of ReLUGaussGrad; mu and var are arrays of the same shape.
+def ReLUGaussGradBatch(mu, var, epsilon=1.0e-6, cut_sd=4.0):
+  dtype= mu.dtype
+  sigma= np.sqrt(np.maximum(var,0.0))
+  grad= (mu>0.0).astype(np.float64)
+  is_gauss= sigma>=epsilon
+  if cut_sd!=None:
+    is_gauss&= (mu>=-cut_sd*sigma) & (mu<=cut_sd*sigma)
+  if is_gauss.any():
+    z= mu[is_gauss].astype(np.float64)/(math.sqrt(2.0)*sigma[is_gauss])
+    grad[is_gauss]= 0.5*(1.0+ErfV(z))
+  return grad.astype(dtype)
+
 
 
 '''
@@ -109,12 +229,26 @@ class TNNRegression(TFunctionApprox):
     Options['loss_stddev_stop']= 1.0e-3  #If std-dev of loss is smaller than this value, iteration stops.
     Options['loss_stddev_stop_err']= None  #If std-dev of loss is smaller than this value, iteration stops (for error model).
 
+    '''Training policy executed in UpdateMain.
+      'full': Train the models with the entire dataset every time.
+      'incremental': Continue training the current models (warm start) with a replay set of
+        the recent samples plus samples drawn from the past ones by reservoir sampling.
+        The number of updates with mini-batch is limited by a budget per new sample. '''
+    Options['train_mode']= 'full'
+    Options['inc_num_recent']= 100  #Number of the most recent samples in the replay set.
+    Options['inc_num_reservoir']= 200  #Number of the past samples (reservoir) in the replay set.
+    Options['inc_update_per_sample']= 100  #Budget: number of updates with mini-batch per new sample.
+    '''Do not train the error model until the mean model converges (checked over the trainings),
+      or the mean model is updated num_max_update times in total (the error model is trained at least this often). '''
+    Options['inc_defer_err']= True
+
     Options['base_dir']= '/tmp/dnn/'  #Base directory.  Last '/' is matter.
     '''Some data (model.parameters, model_err.parameters, DataX, DataY)
         are saved into this file name when Save() is executed.
         label: 'model_mean', 'model_err', 'data_x', or 'data_y'.
         base: Options['base_dir'] or base_dir argument of Save method.'''
     Options['data_file_name']= '{base}nn_{label}.dat'
+    Options['data_binlog']= False  #If True, DataX and DataY are saved into append-only binary logs.
     '''Template of filename to store the training log.
         name: Options['name'].
         n: number of training executions.
@@ -133,6 +267,11 @@ class TNNRegression(TFunctionApprox):
     Params['nn_data_x']= None
     Params['nn_data_y']= None
     Params['num_train']= 0  #Number of training executions.
+    Params['num_train_err']= 0  #Number of training executions of the error model.
+    Params['inc_num_trained']= 0  #Number of samples when the models are trained last time (incremental mode).
+    Params['inc_num_offered']= 0  #Number of past samples offered to the reservoir (incremental mode).
+    Params['inc_reservoir']= []  #Indexes of the past samples in the replay set (incremental mode).
+    Params['inc_num_update_defer']= 0  #Number of updates of the mean model since the error model was trained (incremental mode).
     return Params
 
   @staticmethod
@@ -173,27 +312,27 @@ class TNNRegression(TFunctionApprox):
       #for x in self.DataX:
         #fp.write('%s\n'%(' '.join(map(str,x))))
       #fp.close()
-      pickle.dump(ToStdType(self.DataX), OpenW(L(self.Params['nn_data_x']), 'wb'), -1)
+      self.BufX.Save(L(self.Params['nn_data_x']), binlog=self.Options['data_binlog'])
 
       self.Params['nn_data_y']= self.Options['data_file_name'].format(label='data_y',base='{base}')
       #fp= OpenW(L(self.Params['nn_data_y']), 'w')
       #for y in self.DataY:
         #fp.write('%s\n'%(' '.join(map(str,y))))
       #fp.close()
-      pickle.dump(ToStdType(self.DataY), OpenW(L(self.Params['nn_data_y']), 'wb'), -1)
+      self.BufY.Save(L(self.Params['nn_data_y']), binlog=self.Options['data_binlog'])
 
   #Initialize approximator.  Should be executed before Update/UpdateBatch.
   def Init(self):
     TFunctionApprox.Init(self)
     L= self.Locate
+    self.BufX= TSampleBuffer(np.float32)
+    self.BufY= TSampleBuffer(np.float32)
     if self.Params['nn_data_x'] != None:
-      self.DataX= np.array(pickle.load(open(L(self.Params['nn_data_x']), 'rb')), np.float32)
-    else:
-      self.DataX= np.array([],np.float32)
+      self.BufX.Load(L(self.Params['nn_data_x']))
     if self.Params['nn_data_y'] != None:
-      self.DataY= np.array(pickle.load(open(L(self.Params['nn_data_y']), 'rb')), np.float32)
-    else:
-      self.DataY= np.array([],np.float32)
+      self.BufY.Load(L(self.Params['nn_data_y']))
+    self.DataX,self.DataY= self.BufX.View(),self.BufY.View()
+    self.loss_maf_mean= None  #Moving average of the loss of the mean model over the trainings (incremental mode).
 
     self.CreateNNs()
 
@@ -292,76 +431,101 @@ class TNNRegression(TFunctionApprox):
 
 
   #Forward computation of neural net considering input distribution.
+  #  Return y (Dy x 1), y_var (Dy x Dy), g (Dx x Dy); see ForwardXBatch.
   def ForwardX(self, x, x_var=None, with_var=False, with_grad=False):
+    x= np.array(x,np.float32).reshape(1,-1)
+    y, y_var, g= self.ForwardXBatch(x, x_var, with_var, with_grad)
+    return y[0].reshape(-1,1), (y_var[0] if y_var is not None else None), (g[0] if g is not None else None)
+
+  '''
+  Batch version of ForwardX.
+    X: Inputs (M x Dx).
+    X_var: Covariance of inputs; None, a scalar, a matrix (Dx x Dx) common for all inputs,
+      or an array (M x Dx x Dx) of covariances of each input.
+    Return Y (M x Dy), Y_var (M x Dy x Dy), G (M x Dx x Dy),
+      where Y_var is None if with_var is False and X_var is zero,
+      and G is None if with_grad is False.
+    The ReLU masks and the variances of hidden units are handled as element-wise vectors.
+  '''
+  def ForwardXBatch(self, X, X_var=None, with_var=False, with_grad=False):
     zero= np.float32(0)
-    x= np.array(x,np.float32); x= x.reshape(x.size,1)
+    X= np.array(X,np.float32)
+    M,Dx= X.shape
 
     #Error model:
     if with_var:
-      h0= x
+      h0= X
       for ln in self.f_names_err[:-1]:
         l= getattr(self.model_err,ln)
-        hl1= l.W.dot(h0) + l.b.reshape(l.b.size,1)  #W h0 + b
-        h1= np.maximum(zero, hl1)  #ReLU(hl1)
-        h0= h1
+        h0= np.maximum(zero, h0.dot(l.W.T) + l.b)  #ReLU(W h0 + b)
       l= getattr(self.model_err,self.f_names_err[-1])
-      y_err0= l.W.dot(h0) + l.b.reshape(l.b.size,1)
-      y_var0= np.diag((y_err0*y_err0).ravel())
+      y_err0= h0.dot(l.W.T) + l.b
+      Y_var0= np.einsum('mi,ij->mij', y_err0*y_err0, np.eye(y_err0.shape[1],dtype=np.float32))
     else:
-      y_var0= None
+      Y_var0= None
+
+    if isinstance(X_var,np.ndarray) and X_var.ndim==3:
+      X_var= X_var.astype(np.float32)
+      var_is_zero= (X_var==0.0).all()
+    else:
+      x_var, var_is_zero= RegularizeCov(X_var, Dx, np.float32)
+      X_var= np.broadcast_to(x_var, (M,Dx,Dx))
 
-    x_var, var_is_zero= RegularizeCov(x_var, x.size, np.float32)
     if var_is_zero:
-      g= None  #Gradient
-      h0= x
+      G= None  #Gradient
+      h0= X
       for ln in self.f_names[:-1]:
         l= getattr(self.model,ln)
-        hl1= l.W.dot(h0) + l.b.reshape(l.b.size,1)  #W h0 + b
-        h1= np.maximum(zero, hl1)  #ReLU(hl1)
+        hl1= h0.dot(l.W.T) + l.b  #W h0 + b
+        h0= np.maximum(zero, hl1)  #ReLU(hl1)
         if with_grad:
-          g2= l.W.T.dot(np.diag((hl1>0.0).ravel().astype(np.float32)))  #W diag(step(hl1))
-          g= g2 if g is None else g.dot(g2)
-        h0= h1
+          step= (hl1>0.0).astype(np.float32)
+          G= (l.W.T if G is None else G.dot(l.W.T)) * step[:,None,:]  #G W^T diag(step(hl1))
       l= getattr(self.model,self.f_names[-1])
-      y= l.W.dot(h0) + l.b.reshape(l.b.size,1)
+      Y= h0.dot(l.W.T) + l.b
       if with_grad:
-        g= g2 if g is None else g.dot(l.W.T)
-      return y, y_var0, g
+        G= np.broadcast_to(l.W.T, (M,)+l.W.T.shape).copy() if G is None else G.dot(l.W.T)
+      return Y, Y_var0, G
 
     else:
-      g= None  #Gradient
-      h0= x
-      h0_var= x_var
+      G= None  #Gradient
+      h0= X
+      h0_var= X_var  #Full covariance (M x D x D) for the input layer.
+      h0_dvar= None  #Diagonal variance (M x D) for hidden layers.
       for ln in self.f_names[:-1]:
         l= getattr(self.model,ln)
-        hl1= l.W.dot(h0) + l.b.reshape(l.b.size,1)  #W h0 + b
-        hl1_dvar= np.diag( l.W.dot(h0_var.dot(l.W.T)) ).reshape(hl1.size,1)  #diag(W h0_var W^T)
-        h1,h1_dvar= ReLUGaussV(hl1,hl1_dvar)  #ReLU_gauss(hl1,hl1_dvar)
-        h1_var= np.diag(h1_dvar.ravel())  #To a full matrix
+        hl1= h0.dot(l.W.T) + l.b  #W h0 + b
+        if h0_dvar is None:  hl1_dvar= np.einsum('ij,mjk,ik->mi', l.W, h0_var, l.W)  #diag(W h0_var W^T)
+        else:                hl1_dvar= h0_dvar.dot((l.W*l.W).T)
+        h0,h0_dvar= ReLUGaussBatch(hl1,hl1_dvar)  #ReLU_gauss(hl1,hl1_dvar)
         if with_grad:
-          g2= l.W.T.dot(np.diag(ReLUGaussGradV(hl1,hl1_dvar).ravel()))
-          g= g2 if g is None else g.dot(g2)
-        h0= h1
-        h0_var= h1_var
+          G= (l.W.T if G is None else G.dot(l.W.T)) * ReLUGaussGradBatch(hl1,hl1_dvar)[:,None,:]
       l= getattr(self.model,self.f_names[-1])
-      y= l.W.dot(h0) + l.b.reshape(l.b.size,1)
-      y_var= None
+      Y= h0.dot(l.W.T) + l.b
+      Y_var= None
       if with_var:
-        y_var= l.W.dot(h0_var.dot(l.W.T)) + y_var0
+        if h0_dvar is None:  Y_var= np.einsum('ij,mjk,lk->mil', l.W, h0_var, l.W) + Y_var0
+        else:                Y_var= np.einsum('ij,mj,lj->mil', l.W, h0_dvar, l.W) + Y_var0
       if with_grad:
-        g= g2 if g is None else g.dot(l.W.T)
-      return y, y_var, g
+        G= np.broadcast_to(l.W.T, (M,)+l.W.T.shape).copy() if G is None else G.dot(l.W.T)
+      return Y, Y_var, G
 
   #Training code common for mean model and error model.
+  #If opt['loss_maf'] (TExpMovingAverage1) is given, the moving average of the loss is continued from it.
+  #Return (converged, n_update): converged is True if the loss converged (False if stopped by num_max_update),
+  #  n_update is the number of updates with mini-batch.
   @staticmethod
   def TrainNN(**opt):
     N= len(opt['x_train'])
-    loss_maf= TExpMovingAverage1(init_sd=opt['loss_stddev_init']*opt['loss_stddev_stop'],
-                                 alpha=opt['loss_maf_alpha'])
+    loss_maf= opt.get('loss_maf')
+    if loss_maf is None:
+      loss_maf= TExpMovingAverage1(init_sd=opt['loss_stddev_init']*opt['loss_stddev_stop'],
+                                   alpha=opt['loss_maf_alpha'])
     batchsize= min(opt['batchsize'], N)  #Adjust mini-batch size for too small N
     num_max_update= opt['num_max_update']
     n_epoch= num_max_update/(N/batchsize)+1
     is_updating= True
+    converged= False
     n_update= 0
     sum_loss= 0.0
     fp= OpenW(opt['log_filename'],'w')
@@ -390,17 +554,33 @@ class TNNRegression(TFunctionApprox):
           fp.write('%d %d %f %f\n' % (epoch, n_update, loss_maf.Mean, loss_maf.StdDev))
           if loss_maf.StdDev < opt['loss_stddev_stop']:
             is_updating= False
+            converged= True
             break
         if n_update >= num_max_update:
           is_updating= False
           break
       if not is_updating:  break
     fp.close()
+    return converged, n_update
 
   #Main update code in which we train the mean model, generate y-error data, train the error model.
   def UpdateMain(self):
     if self.NSamples < self.Options['num_min_predictable']:  return
 
+    if self.Options['train_mode']=='full':
+      x_train,y_train= self.DataX,self.DataY
+      num_max_update= self.Options['num_max_update']
+      num_max_update_err= IfNone(self.Options['num_max_update_err'], self.Options['num_max_update'])
+    elif self.Options['train_mode']=='incremental':
+      idx= self.ReplayIndexes()
+      x_train,y_train= self.DataX[idx],self.DataY[idx]
+      budget= self.Options['inc_update_per_sample']*max(1,self.NSamples-self.Params['inc_num_trained'])
+      num_max_update= min(budget, self.Options['num_max_update'])
+      num_max_update_err= min(budget, IfNone(self.Options['num_max_update_err'], self.Options['num_max_update']))
+      self.Params['inc_num_trained']= self.NSamples
+    else:
+      raise Exception('Undefined train_mode:',self.Options['train_mode'])
+
     #Train mean model
     opt={
       'code': '{code}-{n:05d}'.format(n=self.Params['num_train'], code=self.Options['name']+'mean'),
@@ -409,25 +589,39 @@ class TNNRegression(TFunctionApprox):
       'gpu': self.Options['gpu'],
       'fwd_loss': self.FwdLoss,
       'optimizer': self.optimizer,
-      'x_train': self.DataX,
-      'y_train': self.DataY,
+      'x_train': x_train,
+      'y_train': y_train,
       'batchsize': self.Options['batchsize'],
-      'num_max_update': self.Options['num_max_update'],
+      'num_max_update': num_max_update,
       'num_check_stop': self.Options['num_check_stop'],
       'loss_maf_alpha': self.Options['loss_maf_alpha'],
       'loss_stddev_init': self.Options['loss_stddev_init'],
       'loss_stddev_stop': self.Options['loss_stddev_stop'],
       }
-    self.TrainNN(**opt)
+    if self.Options['train_mode']=='incremental':
+      #The loss of the mean model is averaged over the trainings as each training is short.
+      if self.loss_maf_mean is None:
+        self.loss_maf_mean= TExpMovingAverage1(init_sd=opt['loss_stddev_init']*opt['loss_stddev_stop'],
+                                               alpha=opt['loss_maf_alpha'])
+      opt['loss_maf']= self.loss_maf_mean
+    mean_converged,n_update= self.TrainNN(**opt)
+
+    if self.Options['train_mode']=='incremental' and self.Options['inc_defer_err']:
+      self.Params['inc_num_update_defer']+= n_update
+      if not mean_converged and self.Params['inc_num_update_defer']<self.Options['num_max_update']:
+        self.Params['num_train']+= 1
+        self.is_predictable= True
+        return
+      self.Params['inc_num_update_defer']= 0
 
     # Generate training data for error model
     preds= []
-    x_batch= self.DataX[:]
+    x_batch= x_train[:]
     if self.Options['gpu'] >= 0:
       x_batch= cuda.to_gpu(x_batch)
     pred= self.Forward(x_batch, train=False)
-    D= self.DataY.shape[1]
-    self.DataYErr= np.abs(cuda.to_cpu(pred.data) - self.DataY)
+    D= y_train.shape[1]
+    self.DataYErr= np.abs(cuda.to_cpu(pred.data) - y_train)
 
     #Train error model
     opt={
@@ -437,10 +631,10 @@ class TNNRegression(TFunctionApprox):
       'gpu': self.Options['gpu'],
       'fwd_loss': self.FwdLossErr,
       'optimizer': self.optimizer_err,
-      'x_train': self.DataX,
+      'x_train': x_train,
       'y_train': self.DataYErr,
       'batchsize': IfNone(self.Options['batchsize_err'], self.Options['batchsize']),
-      'num_max_update': IfNone(self.Options['num_max_update_err'], self.Options['num_max_update']),
+      'num_max_update': num_max_update_err,
       'num_check_stop': IfNone(self.Options['num_check_stop_err'], self.Options['num_check_stop']),
       'loss_maf_alpha': IfNone(self.Options['loss_maf_alpha_err'], self.Options['loss_maf_alpha']),
       'loss_stddev_init': IfNone(self.Options['loss_stddev_init_err'], self.Options['loss_stddev_init']),
@@ -449,22 +643,36 @@ class TNNRegression(TFunctionApprox):
     self.TrainNN(**opt)
 
     self.Params['num_train']+= 1
+    self.Params['num_train_err']+= 1
 
     #End of training NNs
     self.is_predictable= True
 
 
+  #Return the indexes of the replay set for the incremental training:
+  #  the recent samples plus the reservoir of the past samples (updated here).
+  def ReplayIndexes(self):
+    N= self.NSamples
+    n_past= max(0, N-self.Options['inc_num_recent'])
+    reservoir= self.Params['inc_reservoir']
+    size= self.Options['inc_num_reservoir']
+    #Offer the samples that leave the recent window to the reservoir (reservoir sampling).
+    for n in range(self.Params['inc_num_offered'], n_past):
+      if len(reservoir)<size:  reservoir.append(n)
+      else:
+        k= random.randint(0, n)
+        if k<size:  reservoir[k]= n
+    self.Params['inc_num_offered']= max(self.Params['inc_num_offered'], n_past)
+    return np.array(sorted(reservoir[:size]) + list(range(n_past,N)), dtype=int)
+
   #Incrementally update the internal parameters with a single I/O pair (x,y).
   #If x and/or y are None, only updating internal parameters is done.
   def Update(self, x=None, y=None, not_learn=False):
     #TFunctionApprox.Update(self, x, y, not_learn)
     if x!=None or y!=None:
-      if len(self.DataX)==0:
-        self.DataX= np.array([self.ToVec(x)],np.float32)
-        self.DataY= np.array([self.ToVec(y)],np.float32)
-      else:
-        self.DataX= np.vstack((self.DataX, self.ToVec(x)))
-        self.DataY= np.vstack((self.DataY, self.ToVec(y)))
+      self.BufX.Append(self.ToVec(x))
+      self.BufY.Append(self.ToVec(y))
+      self.DataX,self.DataY= self.BufX.View(),self.BufY.View()
     if not_learn:  return
     self.UpdateMain()
 
@@ -473,12 +681,9 @@ class TNNRegression(TFunctionApprox):
   def UpdateBatch(self, X=None, Y=None, not_learn=False):
     #TFunctionApprox.UpdateBatch(self, X, Y, not_learn)
     if X!=None or Y!=None:
-      if len(self.DataX)==0:
-        self.DataX= np.array(X, np.float32)
-        self.DataY= np.array(Y, np.float32)
-      else:
-        self.DataX= np.vstack((self.DataX, np.array(X, np.float32)))
-        self.DataY= np.vstack((self.DataY, np.array(Y, np.float32)))
+      self.BufX.Extend(X)
+      self.BufY.Extend(Y)
+      self.DataX,self.DataY= self.BufX.View(),self.BufY.View()
     if not_learn:  return
     self.UpdateMain()
 
@@ -506,6 +711,22 @@ class TNNRegression(TFunctionApprox):
     res.Grad= g
     return res
 
+  '''
+  Do prediction for many queries at once with ForwardXBatch.
+    Return a list of TPredRes instances (one for each row of X).
+    x_var: Covariance of x common for all queries, or an array (M x Dx x Dx).
+  '''
+  def PredictBatch(self, X, x_var=0.0, with_var=False, with_grad=False):
+    Y, Y_var, G= self.ForwardXBatch(X, x_var, with_var, with_grad)
+    res_list= []
+    for i in range(Y.shape[0]):
+      res= self.TPredRes()
+      res.Y= Y[i].reshape(-1,1)
+      res.Var= Y_var[i] if Y_var is not None else None
+      res.Grad= G[i] if G is not None else None
+      res_list.append(res)
+    return res_list
+
 
 
 def TNNRegressionExample1():
@@ -660,6 +881,7 @@ class TNNClassification(TFunctionApprox):
         label: 'model_mean', 'data_x', or 'data_y'.
         base: Options['base_dir'] or base_dir argument of Save method.'''
     Options['data_file_name']= '{base}nn_{label}.dat'
+    Options['data_binlog']= False  #If True, DataX and DataY are saved into append-only binary logs.
     '''Template of filename to store the training log.
         name: Options['name'].
         n: number of training executions.
@@ -715,27 +937,26 @@ class TNNClassification(TFunctionApprox):
       #for x in self.DataX:
         #fp.write('%s\n'%(' '.join(map(str,x))))
       #fp.close()
-      pickle.dump(ToStdType(self.DataX), OpenW(L(self.Params['nn_data_x']), 'wb'), -1)
+      self.BufX.Save(L(self.Params['nn_data_x']), binlog=self.Options['data_binlog'])
 
       self.Params['nn_data_y']= self.Options['data_file_name'].format(label='data_y',base='{base}')
       #fp= OpenW(L(self.Params['nn_data_y']), 'w')
       #for y in self.DataY:
         #fp.write('%s\n'%(' '.join(map(str,y))))
       #fp.close()
-      pickle.dump(ToStdType(self.DataY), OpenW(L(self.Params['nn_data_y']), 'wb'), -1)
+      self.BufY.Save(L(self.Params['nn_data_y']), binlog=self.Options['data_binlog'])
 
   #Initialize approximator.  Should be executed before Update/UpdateBatch.
   def Init(self):
     TFunctionApprox.Init(self)
     L= self.Locate
+    self.BufX= TSampleBuffer(np.float32)
+    self.BufY= TSampleBuffer(np.int32)
     if self.Params['nn_data_x'] != None:
-      self.DataX= np.array(pickle.load(open(L(self.Params['nn_data_x']), 'rb')), np.float32)
-    else:
-      self.DataX= np.array([],np.float32)
+      self.BufX.Load(L(self.Params['nn_data_x']))
     if self.Params['nn_data_y'] != None:
-      self.DataY= np.array(pickle.load(open(L(self.Params['nn_data_y']), 'rb')), np.int32)
-    else:
-      self.DataY= np.array([],np.int32)
+      self.BufY.Load(L(self.Params['nn_data_y']))
+    self.DataX,self.DataY= self.BufX.View(),self.BufY.View()
 
     self.CreateNNs()
 
@@ -928,12 +1149,9 @@ class TNNClassification(TFunctionApprox):
   def Update(self, x=None, y=None, not_learn=False):
     #TFunctionApprox.Update(self, x, y, not_learn)
     if x!=None or y!=None:
-      if len(self.DataX)==0:
-        self.DataX= np.array([self.ToVec(x)],np.float32)
-        self.DataY= np.array([y],np.int32)
-      else:
-        self.DataX= np.vstack((self.DataX, self.ToVec(x)))
-        self.DataY= np.hstack((self.DataY, y)).astype(np.int32)
+      self.BufX.Append(self.ToVec(x))
+      self.BufY.Append(y)
+      self.DataX,self.DataY= self.BufX.View(),self.BufY.View()
     if not_learn:  return
     self.UpdateMain()
 
@@ -942,12 +1160,9 @@ class TNNClassification(TFunctionApprox):
   def UpdateBatch(self, X=None, Y=None, not_learn=False):
     #TFunctionApprox.UpdateBatch(self, X, Y, not_learn)
     if X!=None or Y!=None:
-      if len(self.DataX)==0:
-        self.DataX= np.array(X, np.float32)
-        self.DataY= np.array(Y, np.int32)
-      else:
-        self.DataX= np.vstack((self.DataX, np.array(X, np.float32)))
-        self.DataY= np.hstack((self.DataY, np.array(Y, np.int32)))
+      self.BufX.Extend(X)
+      self.BufY.Extend(Y)
+      self.DataX,self.DataY= self.BufX.View(),self.BufY.View()
     if not_learn:  return
     self.UpdateMain()
 
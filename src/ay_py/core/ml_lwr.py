@@ -37,6 +37,202 @@ def AddOnes(X):
     x.append(1.0)
   return Y
 
+
+'''
+Incremental KD-tree for nearest neighbor search.
+- Points are inserted one by one (index = insertion order).
+- Each point has a radius R[n]; Within(x) returns the points whose ball contains x,
+  i.e. the reverse-neighbor query used to update the closest-point distances of LWR.
+- norm: 'l2' (L2 norm) or 'max' (max norm).
+- The tree is kept balanced by rebuilding unbalanced sub-trees (scapegoat tree).
+'''
+class TKDTree(object):
+  def __init__(self, norm='l2', alpha=0.7):
+    if norm=='l2':  self.dist= lambda p,q: math.sqrt(sum((pd-qd)**2 for pd,qd in zip(p,q)))
+    elif norm=='max':  self.dist= lambda p,q: max(abs(pd-qd) for pd,qd in zip(p,q))
+    else:  raise Exception('TKDTree: Undefined norm type:',norm)
+    self.Norm= norm
+    self.Alpha= alpha  #Balance factor of scapegoat tree.
+    self.Clear()
+
+  def Clear(self):
+    self.Points= []  #Points (tuples).
+    self.R= []       #Radius of each point.
+    self.Left= []    #Left child index of each node (-1: none).
+    self.Right= []   #Right child index of each node (-1: none).
+    self.Parent= []  #Parent index of each node (-1: root).
+    self.Axis= []    #Split axis of each node.
+    self.Size= []    #Number of nodes in the sub-tree.
+    self.Bound= []   #Maximum radius in the sub-tree.
+    self.Root= -1
+
+  @property
+  def N(self):
+    return len(self.Points)
+
+  #Save the tree into a dictionary.
+  def Save(self):
+    return {'norm':self.Norm, 'alpha':self.Alpha, 'root':self.Root,
+            'points':[list(p) for p in self.Points], 'r':list(self.R),
+            'left':list(self.Left), 'right':list(self.Right), 'parent':list(self.Parent),
+            'axis':list(self.Axis), 'size':list(self.Size), 'bound':list(self.Bound)}
+
+  #Load the tree from a dictionary generated by Save.
+  @staticmethod
+  def FromDict(data):
+    tree= TKDTree(norm=data['norm'], alpha=data['alpha'])
+    tree.Root= data['root']
+    tree.Points= [tuple(p) for p in data['points']]
+    tree.R= list(data['r'])
+    tree.Left= list(data['left'])
+    tree.Right= list(data['right'])
+    tree.Parent= list(data['parent'])
+    tree.Axis= list(data['axis'])
+    tree.Size= list(data['size'])
+    tree.Bound= list(data['bound'])
+    return tree
+
+  #Build a balanced tree from points X and radii R (None: infinity).
+  def Build(self, X, R=None):
+    self.Clear()
+    for n,x in enumerate(X):
+      self.Points.append(tuple(float(xd) for xd in x))
+      self.R.append(float('inf') if R is None or R[n] is None else R[n])
+      self.Left.append(-1)
+      self.Right.append(-1)
+      self.Parent.append(-1)
+      self.Axis.append(0)
+      self.Size.append(1)
+      self.Bound.append(self.R[-1])
+    if self.N>0:
+      self.Root= self.buildSub(list(range(self.N)), -1)
+
+  #Insert a point x with radius r (None: infinity).  Return the index of x.
+  def Insert(self, x, r=None):
+    n= self.N
+    p= tuple(float(xd) for xd in x)
+    r= float('inf') if r is None else r
+    self.Points.append(p)
+    self.R.append(r)
+    self.Left.append(-1)
+    self.Right.append(-1)
+    self.Parent.append(-1)
+    self.Size.append(1)
+    self.Bound.append(r)
+    if self.Root<0:
+      self.Axis.append(0)
+      self.Root= n
+      return n
+    node,depth= self.Root,0
+    while True:
+      self.Size[node]+= 1
+      if r>self.Bound[node]:  self.Bound[node]= r
+      a= self.Axis[node]
+      if p[a]<self.Points[node][a]:
+        if self.Left[node]<0:  self.Left[node]= n; break
+        node= self.Left[node]
+      else:
+        if self.Right[node]<0:  self.Right[node]= n; break
+        node= self.Right[node]
+      depth+= 1
+    self.Parent[n]= node
+    self.Axis.append((self.Axis[node]+1)%len(p))
+    #Rebuild an unbalanced sub-tree if the new node is too deep.
+    if depth+1>math.log(n+1)/math.log(1.0/self.Alpha)+1:
+      child,node= n,self.Parent[n]
+      while node>=0:
+        if self.Size[child]>self.Alpha*self.Size[node]:
+          parent= self.Parent[node]
+          ids= self.collectSub(node)
+          sub= self.buildSub(ids, parent)
+          if parent<0:  self.Root= sub
+          elif self.Left[parent]==node:  self.Left[parent]= sub
+          else:  self.Right[parent]= sub
+          break
+        child,node= node,self.Parent[node]
+    return n
+
+  #Modify the radius of the n-th point.
+  def SetRadius(self, n, r):
+    self.R[n]= r
+    node= n
+    while node>=0:
+      self.updateBound(node)
+      node= self.Parent[node]
+
+  #Return (index, distance) of the closest point to x; (None, None) if the tree is empty.
+  def Nearest(self, x):
+    x= tuple(float(xd) for xd in x)
+    nc,dc= None,None
+    stack= [(self.Root,0.0)] if self.Root>=0 else []
+    while len(stack)>0:
+      node,gap= stack.pop()
+      if dc is not None and gap>=dc:  continue
+      p= self.Points[node]
+      d= self.dist(x,p)
+      if dc is None or d<dc or (d==dc and node<nc):  nc,dc= node,d
+      a= self.Axis[node]
+      diff= x[a]-p[a]
+      near,far= (self.Left[node],self.Right[node]) if diff<0.0 else (self.Right[node],self.Left[node])
+      if far>=0:  stack.append((far,max(gap,abs(diff))))
+      if near>=0:  stack.append((near,gap))
+    return nc,dc
+
+  '''Return a list of (index, distance) of the points n where dist(x,Points[n]) < f_radius(R[n]).
+    f_radius: function to modify the radius (None: identity); it should be non-decreasing. '''
+  def Within(self, x, f_radius=None):
+    x= tuple(float(xd) for xd in x)
+    if f_radius is None:  f_radius= lambda r:r
+    res= []
+    stack= [(self.Root,0.0)] if self.Root>=0 else []
+    while len(stack)>0:
+      node,gap= stack.pop()
+      if gap>=f_radius(self.Bound[node]):  continue
+      p= self.Points[node]
+      d= self.dist(x,p)
+      if d<f_radius(self.R[node]):  res.append((node,d))
+      a= self.Axis[node]
+      diff= x[a]-p[a]
+      near,far= (self.Left[node],self.Right[node]) if diff<0.0 else (self.Right[node],self.Left[node])
+      if far>=0:  stack.append((far,max(gap,abs(diff))))
+      if near>=0:  stack.append((near,gap))
+    return res
+
+  def updateBound(self, node):
+    b= self.R[node]
+    for c in (self.Left[node],self.Right[node]):
+      if c>=0 and self.Bound[c]>b:  b= self.Bound[c]
+    self.Bound[node]= b
+
+  #Return the list of node indexes in the sub-tree of node.
+  def collectSub(self, node):
+    ids= []
+    stack= [node]
+    while len(stack)>0:
+      node= stack.pop()
+      ids.append(node)
+      if self.Left[node]>=0:  stack.append(self.Left[node])
+      if self.Right[node]>=0:  stack.append(self.Right[node])
+    return ids
+
+  #Build a balanced sub-tree from node indexes ids and return the root index.
+  def buildSub(self, ids, parent):
+    if len(ids)==0:  return -1
+    D= len(self.Points[ids[0]])
+    #Split along the axis of the largest spread.
+    spread= lambda a: max(self.Points[i][a] for i in ids)-min(self.Points[i][a] for i in ids)
+    a= max(range(D), key=spread)
+    ids= sorted(ids, key=lambda i:self.Points[i][a])
+    m= len(ids)//2
+    node= ids[m]
+    self.Axis[node]= a
+    self.Parent[node]= parent
+    self.Left[node]= self.buildSub(ids[:m], node)
+    self.Right[node]= self.buildSub(ids[m+1:], node)
+    self.Size[node]= len(ids)
+    self.updateBound(node)
+    return node
+
 class TLWR(TFunctionApprox):
   @staticmethod
   def DefaultOptions():
@@ -54,12 +250,29 @@ class TLWR(TFunctionApprox):
 
     Options['diff_query_x']= False  #Shift the sample x with a query x.
 
+    '''Nearest neighbor index to maintain the closest points.
+      'kdtree': Incremental KD-tree (TKDTree) with the norm of the kernel.
+      None: Linear search. '''
+    Options['nn_index']= 'kdtree'
+
+    '''Truncation of the kernel for sparse prediction (PredictSparse).
+      If a float k is given, only the samples within k*(kernel width) from a query are used
+      (k=5.0 ignores weights less than exp(-12.5)).
+      None: dense prediction with all samples. '''
+    Options['kernel_cutoff']= None
+
+    Options['batch_size']= 256  #Number of queries processed at once in PredictBatch.
+
     Options['base_dir']= '/tmp/lwr/'  #Base directory.  Last '/' is matter.
     '''Some data (DataX, DataY)
         are saved into this file name when Save() is executed.
-        label: 'data_x', or 'data_y'.
+        label: 'data_x', 'data_y', or 'nn_index'.
         base: Options['base_dir'] or base_dir argument of Save method.'''
     Options['data_file_name']= '{base}lwr_{label}.dat'
+    '''If True, DataX and DataY are saved into append-only binary logs (cf. SaveRowsBinLog),
+        i.e. only new samples are written in Save().  Otherwise they are pickled.
+        Init() accepts both formats.'''
+    Options['data_binlog']= False
     return Options
   @staticmethod
   def DefaultParams():
@@ -69,11 +282,13 @@ class TLWR(TFunctionApprox):
     Params['CDists']= None  #Distance to the closest point
     Params['data_x']= None
     Params['data_y']= None
+    Params['nn_index']= None  #Nearest neighbor index (saved into an external file).
     return Params
 
   def __init__(self):
     TFunctionApprox.__init__(self)
     self.Importance= None  #Weight modifier given externally.  Map of {index:weight}.
+    self.binlog_saved= {}  #Number of rows saved in binary logs {file_name:rows}.
 
   #Synchronize Params (and maybe Options) with an internal learner to be saved.
   #base_dir: used to store data into external data file(s); None for a default value.
@@ -91,23 +306,37 @@ class TLWR(TFunctionApprox):
       #for x in self.DataX:
         #fp.write('%s\n'%(' '.join(map(str,x))))
       #fp.close()
-      pickle.dump(ToStdType(self.DataX), OpenW(L(self.Params['data_x']), 'wb'), -1)
+      if self.Options['data_binlog']:
+        SaveRowsBinLog(L(self.Params['data_x']), self.DataX, self.binlog_saved)
+      else:
+        pickle.dump(ToStdType(self.DataX), OpenW(L(self.Params['data_x']), 'wb'), -1)
 
       self.Params['data_y']= self.Options['data_file_name'].format(label='data_y',base='{base}')
       #fp= OpenW(L(self.Params['data_y']), 'w')
       #for y in self.DataY:
         #fp.write('%s\n'%(' '.join(map(str,y))))
       #fp.close()
-      pickle.dump(ToStdType(self.DataY), OpenW(L(self.Params['data_y']), 'wb'), -1)
+      if self.Options['data_binlog']:
+        SaveRowsBinLog(L(self.Params['data_y']), self.DataY, self.binlog_saved)
+      else:
+        pickle.dump(ToStdType(self.DataY), OpenW(L(self.Params['data_y']), 'wb'), -1)
+
+      if self.nn_index is not None:
+        self.Params['nn_index']= self.Options['data_file_name'].format(label='nn_index',base='{base}')
+        pickle.dump(self.nn_index.Save(), OpenW(L(self.Params['nn_index']), 'wb'), -1)
+      else:
+        self.Params['nn_index']= None
 
   #Initialize approximator.  Should be executed before Update/UpdateBatch.
   def Init(self):
     TFunctionApprox.Init(self)
     L= self.Locate
+    load_data= lambda file_name: (LoadRowsBinLog(file_name, self.binlog_saved).tolist() if IsBinLog(file_name)
+                                  else pickle.load(open(file_name, 'rb')))
     if self.Params['data_x'] != None:
-      self.DataX= pickle.load(open(L(self.Params['data_x']), 'rb'))
+      self.DataX= load_data(L(self.Params['data_x']))
     if self.Params['data_y'] != None:
-      self.DataY= pickle.load(open(L(self.Params['data_y']), 'rb'))
+      self.DataY= load_data(L(self.Params['data_y']))
 
     self.C= []
     self.Closests= []
@@ -129,7 +358,19 @@ class TLWR(TFunctionApprox):
     else:
       raise Exception('Undefined kernel type:',self.Options['kernel'])
 
+    self.nn_index= None
+    if self.Options['nn_index']=='kdtree':
+      norm= {'l2g':'l2','maxg':'max'}[self.Options['kernel']]
+      if self.Params['nn_index'] != None:
+        self.nn_index= TKDTree.FromDict(pickle.load(open(L(self.Params['nn_index']), 'rb')))
+      if self.nn_index is None or self.nn_index.Norm!=norm or self.nn_index.N!=len(self.CDists):
+        self.nn_index= TKDTree(norm=norm)
+        self.nn_index.Build(self.DataX[:len(self.CDists)], self.CDists)
+    elif self.Options['nn_index'] is not None:
+      raise Exception('Undefined nearest neighbor index type:',self.Options['nn_index'])
+
     self.lazy_copy= True  #Assign True when DataX or DataY is updated.
+    self.lazy_array= True  #Same as lazy_copy for the array form used in PredictSparse and PredictBatch.
     self.CheckPredictability()
 
 
@@ -154,11 +395,11 @@ class TLWR(TFunctionApprox):
   #If x and/or y are None, only updating internal parameters is done.
   def Update(self, x=None, y=None, not_learn=False):
     TFunctionApprox.Update(self, x, y, not_learn)
-    #FIXME: it's better to use an efficient nearest neighbor like KD tree.
     if len(self.DataX)==1:
       self.Closests.append(-1)
       self.C.append(None)
       self.CDists.append(None)
+      if self.nn_index is not None:  self.nn_index.Insert(x)
       return
     dist_to_c= lambda dist: min( max(self.Options['c_min'], self.Options['c_gain']*dist), self.Options['c_max'] )
     if len(self.Closests)==1:
@@ -166,6 +407,22 @@ class TLWR(TFunctionApprox):
       self.Closests[0]= 1
       self.CDists= [self.dist(self.DataX[0],self.DataX[1])]*2
       self.C= [dist_to_c(self.CDists[0])]*2
+      if self.nn_index is not None:
+        self.nn_index.SetRadius(0, self.CDists[0])
+        self.nn_index.Insert(x, self.CDists[1])
+    elif self.nn_index is not None:
+      n= len(self.Closests)
+      nc,dc= self.nn_index.Nearest(x)
+      #Points whose closest-point distance is reduced by x:
+      for k,d in self.nn_index.Within(x):
+        self.Closests[k]= n
+        self.CDists[k]= d
+        self.C[k]= dist_to_c(d)
+        self.nn_index.SetRadius(k, d)
+      self.Closests.append(nc)
+      self.CDists.append(dc)
+      self.C.append(dist_to_c(dc))
+      self.nn_index.Insert(x, dc)
     else:
       n= len(self.Closests)
       dc= 1.0e100
@@ -185,6 +442,7 @@ class TLWR(TFunctionApprox):
       #for k in range(n+1):
         #self.C[k]= min(self.C[k], self.C[self.Closests[k]])
     self.lazy_copy= True
+    self.lazy_array= True
     self.CheckPredictability()
 
   #Incrementally update the internal parameters with I/O data (X,Y).
@@ -195,6 +453,7 @@ class TLWR(TFunctionApprox):
       self.Update(x,y,not_learn)
     #self.C= self.AutoWidth(c_min)
     self.lazy_copy= True
+    self.lazy_array= True
     self.CheckPredictability()
 
   '''
@@ -205,6 +464,8 @@ class TLWR(TFunctionApprox):
     with_grad: Whether compute a gradient at the query point as well.
   '''
   def Predict(self, x, x_var=0.0, with_var=False, with_grad=False):
+    if self.Options['kernel_cutoff'] is not None:
+      return self.PredictSparse(x, x_var, with_var, with_grad)
     if self.lazy_copy:
       self.X= Mat(AddOnes(copy.deepcopy(self.DataX)) if self.Options['add_one'] else self.DataX)
       self.Y= Mat(self.DataY)
@@ -238,6 +499,146 @@ class TLWR(TFunctionApprox):
       #res.Grad= self.NumDeriv(x,x_var)
     return res
 
+  #Rows of the weighted least squares of a query xa with the samples idx;
+  #return the design matrix, outputs, and weights (Xs,Ys,w), and the query vector xx.
+  def sparseRows(self, xa, x_var_d, idx):
+    Xs= self.Xa[idx]
+    Ys= self.Ya[idx]
+    #Weight vector:
+    xd2= (xa-Xs)**2 / (self.Ca[idx,None]**2 + x_var_d)
+    if self.Options['kernel']=='l2g':  w= np.exp(-0.5*xd2.sum(axis=1))
+    else:                              w= np.exp(-0.5*xd2.max(axis=1))
+    if self.Importance!=None:
+      pos= {n:i for i,n in enumerate(idx)}
+      for n,v in self.Importance.iteritems():
+        if n in pos:  w[pos[n]]*= v
+    if self.Options['diff_query_x']:  Xs= Xs-xa
+    if self.Options['add_one']:
+      Xs= np.hstack((Xs, np.ones((len(idx),1))))
+      xx= np.hstack((xa, [1.0]))
+    else:
+      xx= xa
+    return Xs,Ys,w,xx
+
+  '''
+  Do prediction with the truncated kernel.
+    Only the samples within Options['kernel_cutoff']*(kernel width) from x are used,
+    which are gathered with the nearest neighbor index (all samples if it is None).
+    Weights are computed as a vector, and the weighted least squares is solved with
+    the Cholesky factorization.  The arguments and the return are the same as Predict.
+    If with_var, the covariance of the prediction error is computed with all the samples
+    (as the truncated samples may have large errors), which costs O(N) as well as Predict.
+  '''
+  def PredictSparse(self, x, x_var=0.0, with_var=False, with_grad=False):
+    self.updateArrays()
+    x_var, var_is_zero= RegularizeCov(x_var, len(x))
+    x_var_d= np.diag(x_var)
+    xa= np.array(x, dtype=float).ravel()
+    k= self.Options['kernel_cutoff']
+    N,Dx= self.Xa.shape
+    if self.nn_index is not None:
+      v_max= max(0.0, x_var_d.max())
+      dist_to_c= lambda dist: min( max(self.Options['c_min'], self.Options['c_gain']*dist), self.Options['c_max'] )
+      idx= np.array(sorted(n for n,d in self.nn_index.Within(xa, lambda r: k*math.sqrt(dist_to_c(r)**2+v_max))), dtype=int)
+    else:
+      idx= np.arange(N)
+    Xs,Ys,w,xx= self.sparseRows(xa, x_var_d, idx)
+    D= Xs.shape[1]
+    WX= Xs*w[:,None]
+    A= np.dot(WX.T, Xs) + self.Options['f_reg']*np.eye(D,D)
+    b= np.dot(WX.T, Ys)
+    try:
+      L= la.cholesky(A)
+      beta= la.solve(L.T, la.solve(L, b))
+    except la.LinAlgError:
+      beta= np.dot(la.pinv(A), b)
+    res= self.TPredRes()
+    if self.Options['diff_query_x']:
+      res.Y= Mat(beta[-1]).T
+    else:
+      res.Y= Mat(np.dot(xx, beta)).T
+    grad= Mat(beta[:-1] if self.Options['add_one'] else beta)
+    if with_var:
+      if len(idx)<N:  Xs,Ys,w,xx= self.sparseRows(xa, x_var_d, np.arange(N))
+      div= w.sum()
+      div*= (1.0 - float(D)/float(N)) if N>D else 1.0e-4
+      Err= np.dot(Xs, beta) - Ys
+      div= max(div,1.0e-4)
+      res.Var= Mat(np.dot(Err.T, Err*w[:,None])) / div  #Covariance of prediction error.
+      res.Var+= grad.T * x_var * grad  #Covariance propagated from input.
+    if with_grad:
+      res.Grad= grad
+    return res
+
+  '''
+  Do prediction for many queries at once.
+    The kernel matrix between the queries and the samples is computed in one shot,
+    and the weighted least squares of all queries are solved as a stack.
+    The queries are processed in chunks of Options['batch_size'] to limit memory.
+    If Options['kernel_cutoff'] is set, PredictSparse is used for each query.
+    The arguments and the return are the same as TFunctionApprox.PredictBatch.
+  '''
+  def PredictBatch(self, X, x_var=0.0, with_var=False, with_grad=False):
+    if self.Options['kernel_cutoff'] is not None:
+      return TFunctionApprox.PredictBatch(self, X, x_var, with_var, with_grad)
+    self.updateArrays()
+    Q= np.array(X, dtype=float).reshape(len(X),-1)
+    M,Dx= Q.shape
+    x_var, var_is_zero= RegularizeCov(x_var, Dx)
+    x_var_d= np.diag(x_var)
+    N= self.Xa.shape[0]
+    D= Dx+1 if self.Options['add_one'] else Dx
+    res_list= []
+    for m0 in range(0,M,self.Options['batch_size']):
+      Qb= Q[m0:m0+self.Options['batch_size']]
+      Mb= Qb.shape[0]
+      #Kernel matrix (Mb x N):
+      diff= Qb[:,None,:]-self.Xa[None,:,:]
+      xd2= diff**2 / (self.Ca[None,:,None]**2 + x_var_d)
+      if self.Options['kernel']=='l2g':  W= np.exp(-0.5*xd2.sum(axis=2))
+      else:                              W= np.exp(-0.5*xd2.max(axis=2))
+      if self.Importance!=None:
+        for n,v in self.Importance.iteritems():
+          W[:,n]*= v
+      #Stacked design matrices (Mb x N x D) and queries (Mb x D):
+      Xs= -diff if self.Options['diff_query_x'] else np.broadcast_to(self.Xa, (Mb,N,Dx))
+      xx= Qb
+      if self.Options['add_one']:
+        Xs= np.concatenate((Xs, np.ones((Mb,N,1))), axis=2)
+        xx= np.hstack((Qb, np.ones((Mb,1))))
+      A= np.einsum('mn,mni,mnj->mij', W, Xs, Xs) + self.Options['f_reg']*np.eye(D,D)
+      b= np.einsum('mn,mni,nk->mik', W, Xs, self.Ya)
+      beta= la.solve(A, b)  #Mb x D x Dy
+      if self.Options['diff_query_x']:
+        Y= beta[:,-1,:]
+      else:
+        Y= np.einsum('mi,mik->mk', xx, beta)
+      grad= beta[:,:-1,:] if self.Options['add_one'] else beta
+      if with_var:
+        div= W.sum(axis=1)
+        div*= (1.0 - float(D)/float(N)) if N>D else 1.0e-4
+        div= np.maximum(div,1.0e-4)
+        Err= np.einsum('mni,mik->mnk', Xs, beta) - self.Ya
+        Var= np.einsum('mn,mnk,mnl->mkl', W, Err, Err) / div[:,None,None]  #Covariance of prediction error.
+        Var+= np.einsum('mik,ij,mjl->mkl', grad, x_var, grad)  #Covariance propagated from input.
+      for i in range(Mb):
+        res= self.TPredRes()
+        res.Y= Mat(Y[i]).T
+        if with_var:
+          res.Var= Mat(Var[i])
+        if with_grad:
+          res.Grad= Mat(grad[i])
+        res_list.append(res)
+    return res_list
+
+  #Update the array form of the samples (Xa, Ya, Ca) if lazy_array is set.
+  def updateArrays(self):
+    if self.lazy_array:
+      self.Xa= np.array(self.DataX, dtype=float)
+      self.Ya= np.array(self.DataY, dtype=float)
+      self.Ca= np.array(self.C, dtype=float)
+      self.lazy_array= False
+
   #Compute derivative at x numerically.
   def NumDeriv(self,x,x_var=0.0,h=0.01):
     Dx= Len(x)
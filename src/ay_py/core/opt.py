@@ -17,6 +17,17 @@ def GetSTD(mean, sqmean):
   return math.sqrt(max(0.0,sqmean-mean**2))
 
 
+'''Evaluate fobj for each x in X, return a list of scores (each can be None).
+  executor: an object having map(f,X) like multiprocessing.pool.ThreadPool or multiprocessing.Pool
+    (fobj should be picklable for a process pool); None: evaluated sequentially.
+  fobj_batch: a vectorized version of fobj (fobj_batch(X) returns the list of scores);
+    if given, it is used instead of fobj and executor. '''
+def EvalBatch(fobj, X, executor=None, fobj_batch=None):
+  if fobj_batch is not None:  return list(fobj_batch(X))
+  if executor is not None:    return list(executor.map(fobj, X))
+  return [fobj(x) for x in X]
+
+
 #Search [[f,x]*num] such that f=fobj(x) is not None and x is in bound
 def InitialGuess(bound, fobj, num=1, max_count=None):
   assert(len(bound)==2)
@@ -233,6 +244,28 @@ class TOptimizerInterface:
   def UpdateWith(self,param,score):
     pass
 
+  #Select parameters to be evaluated together (e.g. a population of CMA-ES).
+  #num: number of parameters (None: decided by the optimizer).
+  def SelectBatch(self, num=None):
+    return [self.Select()]
+
+  #Update with given parameters and scores (positive is better; each can be None).
+  def UpdateBatch(self,params,scores):
+    for param,score in zip(params,scores):
+      self.UpdateWith(param,score)
+
+  #Run the optimization loop of SelectBatch, EvalBatch, and UpdateBatch until Stopped.
+  #fobj: objective function to be maximized (can return None).
+  #executor, fobj_batch: see EvalBatch.
+  #Return the number of evaluations.
+  def OptimizeBatch(self, fobj, executor=None, fobj_batch=None):
+    count= 0
+    while not self.Stopped():
+      params= self.SelectBatch()
+      self.UpdateBatch(params, EvalBatch(fobj, params, executor=executor, fobj_batch=fobj_batch))
+      count+= len(params)
+    return count
+
   #Generate a random number inside a bound. Should be executed after Init.
   def Rand(self):
     return None
@@ -539,6 +572,17 @@ class TContOptNoGrad (TOptimizerInterface):
     #CPrint(1,'TContOptNoGrad:DEBUG: Param:%r' % (self.curr_param))
     return self.curr_param
 
+  #Select parameters to be evaluated together.
+  #num: number of parameters; None: the rest of the current generation
+  #(es.popsize minus the solutions already scored) limited by the remaining fevals.
+  def SelectBatch(self, num=None):
+    if self.es is None:  self.lazy_es_gen()
+    if num is None:
+      num= max(1, min(self.es.popsize-len(self.Params['solutions']), self.fevals))
+    params= self.es.ask(num)
+    self.curr_param= params[-1]
+    return params
+
   #Update with a selected parameter and a score (positive is better) which can be None.
   def Update(self,score):
     self.UpdateWith(self.curr_param,score)
@@ -940,6 +984,8 @@ with database seaerch, random initial guess, and CMA-ES.
     db_search_num: number of values searched from database.
     max_db_search_count: maximum number of database search.
     db_param_novelty: only parameters whose distances are greater than this value are considered (i.e. ignoring similar examples in db).
+    batch_eval: if True, CMA-ES asks for the rest of a generation at once and evaluates it with EvalBatch.
+    executor, fobj_batch: see EvalBatch (batch_eval is turned on if one of them is given).
   database, db_search_key: database and key to search in database.
   infer_type: inference type should be this.
 '''
@@ -959,6 +1005,9 @@ def MinimizeFunc_DB(fmin_obj, parameters0, scale0, options,
   db_search_num= pop_or(options,'db_search_num',10)
   max_db_search_count= pop_or(options,'max_db_search_count',1000000)
   db_param_novelty= pop_or(options,'db_param_novelty',0.1)
+  executor= pop_or(options,'executor',None)
+  fobj_batch= pop_or(options,'fobj_batch',None)
+  batch_eval= pop_or(options,'batch_eval',False) or executor is not None or fobj_batch is not None
 
   #Search from database:
   CPrint(1,'Searching from database...')
@@ -1029,20 +1078,25 @@ def MinimizeFunc_DB(fmin_obj, parameters0, scale0, options,
     solutions= []
     scores= []
   while not es.stop() and maxfevals>0:
-    x= es.ask(1)[0]
-    f= fmin_obj(x)
-    maxfevals-= 1
-    if f is not None:
-      has_solution= True
-      solutions.append(x)
-      scores.append(f)
-      if len(scores)>=es.popsize:
-        es.tell(solutions, scores)
-        es.disp()
-        solutions= []
-        scores= []
-        #TEST
-        #if es.result()[1]!=np.inf and -es.result()[1]>0.8:  break
+    if batch_eval:
+      X= es.ask(max(1, min(es.popsize-len(scores), maxfevals)))
+      F= EvalBatch(fmin_obj, X, executor=executor, fobj_batch=fobj_batch)
+    else:
+      X= es.ask(1)
+      F= [fmin_obj(X[0])]
+    for x,f in zip(X,F):
+      maxfevals-= 1
+      if f is not None:
+        has_solution= True
+        solutions.append(x)
+        scores.append(f)
+        if len(scores)>=es.popsize:
+          es.tell(solutions, scores)
+          es.disp()
+          solutions= []
+          scores= []
+          #TEST
+          #if es.result()[1]!=np.inf and -es.result()[1]>0.8:  break
   res= es.result()
 
   if res[0] is not None and res[1]!=np.inf:
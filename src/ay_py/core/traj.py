@@ -33,36 +33,12 @@ Generate t_traj (time trajectory) from x_traj (trajectory of position+quaternion
 t_traj[0] is zero.
 '''
 def TTrajFromXTraj2(x_traj, linear_speed, angular_speed, linear_acceleration):
+  if len(x_traj)==0:  return []
   lin_ang_ratio= linear_speed / angular_speed
-  def dist(x0,x1):
-    diff= DiffX(x1,x0)
-    return la.norm([la.norm(diff[:3]), lin_ang_ratio*la.norm(diff[3:])])
-  d_traj= [0.0]
-  for x0,x1 in zip(x_traj[:-1],x_traj[1:]):
-    d_traj.append(d_traj[-1]+dist(x0,x1))
-  d_T3= d_traj[-1]
-  if linear_acceleration*d_T3 > linear_speed*linear_speed:
-    T1= linear_speed / linear_acceleration
-    T2= d_T3 / linear_speed
-    T3= T2 + T1
-    d_T1= linear_speed*linear_speed / (2.0*linear_acceleration)
-    d_T2= d_T3 - d_T1
-    def t_from_start(d):
-      if d<d_T1:    return np.sqrt(2.0*d/linear_acceleration)
-      elif d<d_T2:  return d/linear_speed + linear_speed/(2.0*linear_acceleration)
-      else:         return T3 - np.sqrt(2.0*max(0.0,d_T3-d)/linear_acceleration)
-    t_traj= map(t_from_start, d_traj)
-    #print [('T1' if d1<d_T1 else ('T2' if d1<d_T2 else 'T3'), t1-t0) for t0,t1,d0,d1 in zip(t_traj[:-1],t_traj[1:],d_traj[:-1],d_traj[1:])]
-  else:  #There is no constant-velocity phase.
-    T1= np.sqrt(d_T3/linear_acceleration)
-    T3= 2.0*T1
-    d_T1= d_T3 / 2.0
-    def t_from_start(d):
-      if d<d_T1:    return np.sqrt(2.0*d/linear_acceleration)
-      else:         return T3 - np.sqrt(2.0*max(0.0,d_T3-d)/linear_acceleration)
-    t_traj= map(t_from_start, d_traj)
-    #print [('_T1' if d1<d_T1 else '_T3', t1-t0) for t0,t1,d0,d1 in zip(t_traj[:-1],t_traj[1:],d_traj[:-1],d_traj[1:])]
-  return t_traj
+  diff= DiffXBatch(x_traj[:-1], x_traj[1:])
+  dists= np.sqrt((diff[:,:3]**2).sum(axis=1) + lin_ang_ratio**2*(diff[:,3:]**2).sum(axis=1))
+  d_traj= np.concatenate(([0.0],np.cumsum(dists)))
+  return TrapezoidalTTraj(d_traj, linear_speed, linear_acceleration).tolist()
 
 '''
 Generate t_traj (time trajectory) from a set of trajectories x_trajs in different spaces, and speed and acceleration.
@@ -80,38 +56,41 @@ dist_criteria: List of criteria to calculate distances for each points on trajec
 '''
 def TTrajFromXTraj3(x_trajs, speed, speed_ratios, acceleration, dist_criteria):
   if len(x_trajs)==0:  return []
+  if len(x_trajs[0])==0:  return []
   speed_ratios= [1.0]+list(speed_ratios)
-  def dist(x0,x1,dist_criterion):
-    if dist_criterion=='E':  return Dist(x0,x1)
-    if dist_criterion=='Q':  return np.linalg.norm(DiffQ(x0,x1))
-  d_traj= [0.0]
-  for k in range(len(x_trajs[0])-1):
-    dists= [dist(x_traj[k],x_traj[k+1],dc)/sr for x_traj,sr,dc in zip(x_trajs,speed_ratios,dist_criteria)]
-    d_traj.append(d_traj[-1]+max(dists))
-    #d_traj.append(d_traj[-1]+np.linalg.norm(dists))
+  def dists(x_traj,dist_criterion):
+    x_traj= np.asarray(x_traj,dtype=float)
+    if dist_criterion=='E':  return la.norm(x_traj[1:]-x_traj[:-1],axis=1)
+    if dist_criterion=='Q':  return la.norm(InvRodriguesBatch(np.matmul(QToRotBatch(x_traj[1:]),np.swapaxes(QToRotBatch(x_traj[:-1]),1,2))),axis=1)
+  dists_all= [dists(x_traj,dc)/sr for x_traj,sr,dc in zip(x_trajs,speed_ratios,dist_criteria)]
+  d_traj= np.concatenate(([0.0],np.cumsum(np.max(dists_all,axis=0))))
+  return TrapezoidalTTraj(d_traj, speed, acceleration).tolist()
+
+'''
+Generate t_traj (time trajectory, numpy array) from a sequence of distances d_traj along a path
+with a trapezoidal velocity profile (zero velocity at the start and the end).
+d_traj: Monotonically increasing distances from the start (d_traj[0] is zero).
+speed, acceleration: Max speed and acceleration along the path.
+'''
+def TrapezoidalTTraj(d_traj, speed, acceleration):
+  d_traj= np.asarray(d_traj,dtype=float)
+  if len(d_traj)==0:  return d_traj.copy()
   d_T3= d_traj[-1]
+  t_acc= np.sqrt(2.0*np.maximum(0.0,d_traj)/acceleration)
   if acceleration*d_T3 > speed*speed:
     T1= speed / acceleration
     T2= d_T3 / speed
     T3= T2 + T1
     d_T1= speed*speed / (2.0*acceleration)
     d_T2= d_T3 - d_T1
-    def t_from_start(d):
-      if d<d_T1:    return np.sqrt(2.0*d/acceleration)
-      elif d<d_T2:  return d/speed + speed/(2.0*acceleration)
-      else:         return T3 - np.sqrt(2.0*max(0.0,d_T3-d)/acceleration)
-    t_traj= map(t_from_start, d_traj)
-    #print [('T1' if d1<d_T1 else ('T2' if d1<d_T2 else 'T3'), t1-t0) for t0,t1,d0,d1 in zip(t_traj[:-1],t_traj[1:],d_traj[:-1],d_traj[1:])]
+    t_dec= T3 - np.sqrt(2.0*np.maximum(0.0,d_T3-d_traj)/acceleration)
+    return np.where(d_traj<d_T1, t_acc, np.where(d_traj<d_T2, d_traj/speed + speed/(2.0*acceleration), t_dec))
   else:  #There is no constant-velocity phase.
     T1= np.sqrt(d_T3/acceleration)
     T3= 2.0*T1
     d_T1= d_T3 / 2.0
-    def t_from_start(d):
-      if d<d_T1:    return np.sqrt(2.0*d/acceleration)
-      else:         return T3 - np.sqrt(2.0*max(0.0,d_T3-d)/acceleration)
-    t_traj= map(t_from_start, d_traj)
-    #print [('_T1' if d1<d_T1 else '_T3', t1-t0) for t0,t1,d0,d1 in zip(t_traj[:-1],t_traj[1:],d_traj[:-1],d_traj[1:])]
-  return t_traj
+    t_dec= T3 - np.sqrt(2.0*np.maximum(0.0,d_T3-d_traj)/acceleration)
+    return np.where(d_traj<d_T1, t_acc, t_dec)
 
 #Remove radian jumping in a joint angle trajectory.
 def SmoothQTraj(q_traj):
@@ -171,6 +150,97 @@ def LimitQTrajVel(q_start, q_traj, t_traj, qvel_limits, acc_phase=9):
     vel_limits= [v*dv*float(i_term-i) for v in qvel_limits]
     t_offset,t_prev,q_prev= sub_proc(qt, i_term+i_middle+i, t_offset, t_prev, q_prev, vel_limits)
 
+'''Time-optimal time parameterization of a joint angle trajectory
+under joint velocity and acceleration limits (forward/backward pass over the path segments).
+The trajectory is regarded as a piecewise linear path q_start-->q_traj[0]-->...-->q_traj[-1]
+that starts and ends with zero velocity.
+The path speed is continuous; the jumps of the joint velocities caused by the direction changes
+at the via-points are regarded as accelerations over the neighboring segments,
+which approximates the curvature (centripetal) term for densely sampled q_traj.
+A half of qacc_limits at most is used by the jumps, and the rest by the path acceleration,
+so that their sum does not exceed qacc_limits.
+Return t_traj (numpy array), corresponding times in seconds from start [t1,t2,...,tN].
+  q_start: joint angles at t=0.
+  q_traj: joint angle trajectory [q0,...,qD]*N.
+  qvel_limits: limit of velocities.
+  qacc_limits: limit of accelerations.  If None, only the velocity limits are considered.
+  t_traj: If not None, the result is uniformly slowed down so that its duration is not shorter than t_traj[-1]
+    (i.e. t_traj[-1] is the minimum duration).
+  Note: this can be used instead of LimitQTrajVel as:
+    t_traj= QTrajTimeParam(q_start, q_traj, qvel_limits, qacc_limits, t_traj) '''
+def QTrajTimeParam(q_start, q_traj, qvel_limits, qacc_limits=None, t_traj=None):
+  if len(q_traj)==0:  return np.zeros(0)
+  q= np.vstack((np.asarray(q_start,dtype=float).reshape(1,-1), np.asarray(q_traj,dtype=float)))
+  dq= q[1:]-q[:-1]
+  dq= dq-2.0*math.pi*np.floor((dq+math.pi)/(2.0*math.pi))  #AngleMod1
+  dq_signed,dq= dq,np.abs(dq)
+  #Length of each segment in the time to move at the max velocity;
+  #the path speed u (0<=u<=1) is defined as a ratio to the max velocity.
+  L= np.max(dq/np.asarray(qvel_limits,dtype=float),axis=1)
+  moving= L>0.0
+  #Speed limits (on w=u**2) at the via-points (c) and in the segments (c_seg),
+  #and the path acceleration limits (|du/dt|<=1/inv_alpha) of the segments.
+  #The joint acceleration e*du/dt + de*u**2/ds (e=dq/L: joint velocity at u=1) is kept within qacc_limits
+  #by giving at most a half of qacc_limits to the velocity jump at each via-point (de*u**2/ds),
+  #and the rest to the tangential acceleration (e*du/dt) of the neighboring segments.
+  #The velocity jump is spread over the neighboring segments, so their speed is limited by the via-point.
+  c= np.ones(len(L)+1)
+  c_seg= np.ones(len(L))
+  inv_alpha= np.zeros(len(L))
+  if qacc_limits is not None:
+    qacc_limits= np.asarray(qacc_limits,dtype=float)
+    e= np.zeros_like(dq_signed)
+    e[moving]= dq_signed[moving]/L[moving].reshape(-1,1)
+    #Speed limits at the via-points from the joint velocity jumps:
+    #  u*|e[i+1]-e[i]| <= 0.5*qacc_limits*(L[i]+L[i+1])/(2*u).
+    ds= (L[:-1]+L[1:])/2.0
+    de= np.abs(e[1:]-e[:-1])
+    via= moving[:-1] & moving[1:]
+    with np.errstate(divide='ignore',invalid='ignore'):
+      c_via= 0.5*np.min(qacc_limits/de,axis=1)*ds
+    c[1:-1][via]= np.minimum(1.0, c_via[via])
+    c_max= c.copy()  #Max of w around each via-point.
+    c_seg= np.minimum(c[:-1],c[1:])
+    c[1:-1]= np.minimum(c_seg[:-1],c_seg[1:])
+  c[0]= c[-1]= 0.0
+  #Stop at the ends of the zero-length segments (repeated waypoints) as the direction is undefined there.
+  c[:-1][~moving]= 0.0
+  c[1:][~moving]= 0.0
+  if qacc_limits is not None:
+    #Acceleration used by the velocity jumps at the via-points (zero at the ends), and
+    #the rest given to the tangential acceleration of each segment (its max over the both ends).
+    acc_via= np.zeros((len(L)+1,len(qacc_limits)))
+    acc_via[1:-1][via]= de[via]*(c_max[1:-1][via]/ds[via]).reshape(-1,1)
+    acc_tan= qacc_limits-np.maximum(acc_via[:-1],acc_via[1:])
+    inv_alpha[moving]= np.max(np.abs(e[moving])/acc_tan[moving],axis=1)
+  #Max increase of u**2 in each segment; values over 1 are equivalent to 1 as u<=1.
+  g= np.ones(len(L))
+  acc_lim= inv_alpha>0.0
+  g[acc_lim]= np.minimum(1.0, 2.0*L[acc_lim]/inv_alpha[acc_lim])
+  #Forward and backward passes on w=u**2 at the via-points:
+  #  w[i]= min(c[i], w[i-1]+g[i]) is solved by the cumulative minimum.
+  G= np.concatenate(([0.0],np.cumsum(g)))
+  w_fwd= G + np.minimum.accumulate(c-G)
+  Gb= np.concatenate(([0.0],np.cumsum(g[::-1])))
+  w_bwd= (Gb + np.minimum.accumulate(c[::-1]-Gb))[::-1]
+  w= np.clip(np.minimum(w_fwd,w_bwd),0.0,1.0)
+  u= np.sqrt(w)
+  u0,u1= u[:-1],u[1:]
+  #Duration of each segment (trapezoidal or triangular profile of u; the max of u is u_seg).
+  u_seg= np.sqrt(c_seg)
+  dt= L/u_seg  #Case of no acceleration limit.
+  trap= acc_lim & ((w[:-1]+w[1:])/2.0+L/np.where(acc_lim,inv_alpha,1.0) > c_seg)
+  dt[trap]= ((2.0*u_seg-u0-u1)*inv_alpha + (L - (2.0*c_seg-w[:-1]-w[1:])/2.0*inv_alpha)/u_seg)[trap]
+  tri= acc_lim & ~trap
+  up= np.sqrt((w[:-1]+w[1:])/2.0 + L/np.where(acc_lim,inv_alpha,1.0))
+  dt[tri]= ((2.0*up-u0-u1)*inv_alpha)[tri]
+  dt[~moving]= 0.0
+  t_res= np.cumsum(dt)
+  if t_traj is not None and len(t_traj)>0 and t_res[-1]<t_traj[-1]:
+    if t_res[-1]>0.0:  t_res*= t_traj[-1]/t_res[-1]
+    else:  t_res= np.array(t_traj,dtype=float)
+  return t_res
+
 #DEPRECATED:
 #  IKTrajCheck was deprecated due to its inaccuracy.
 #  Use CheckXQTrajValidity instead.
@@ -202,42 +272,59 @@ Return True if the trajectories are valid.
 f_fK: Forward kinematics (x=f_fk(q)).
 N_int: Number of interpolation.
 dp_lim, dq_lim: Max position and orientation errors (meters, radians).
+f_fk_batch: Batch version of forward kinematics (x_batch=f_fk_batch(q_batch); (M,Dq)-->(M,7)).
+  If given, it is used instead of f_fk.
 '''
-def CheckXQTrajValidity(q_traj, x_traj, f_fk, dp_lim=np.inf, dq_lim=0.1, N_int=5):
+def CheckXQTrajValidity(q_traj, x_traj, f_fk, dp_lim=np.inf, dq_lim=0.1, N_int=5, f_fk_batch=None):
   if len(q_traj)<=1:  return True
-  x_traj_int= [list(x_traj[0])] + sum([XInterpolation(x1,x2,N_int) for x1,x2 in zip(x_traj[:-1],x_traj[1:])], [])
-  q_traj_int= [q_traj[0]] + sum([(q1+(np.array(q2)-q1)*np.linspace(0,1,N_int+1)[1:].reshape(-1,1)).tolist() for q1,q2 in zip(q_traj[:-1],q_traj[1:])], [])
-  x_traj_est= map(f_fk, q_traj_int)
-  x_diff= map(lambda d: np.linalg.norm(d[:3])<dp_lim and np.linalg.norm(d[3:])<dq_lim, [DiffX(xi,xe) for xi,xe in zip(x_traj_int,x_traj_est)])
-  return all(x_diff)
+  x_traj_int= XTrajInterpolation(x_traj, N_int)
+  q_traj_int= VecTrajInterpolation(q_traj, N_int)
+  if f_fk_batch is not None:  x_traj_est= f_fk_batch(q_traj_int)
+  else:  x_traj_est= [f_fk(q) for q in q_traj_int]
+  x_diff= DiffXBatch(x_traj_int, x_traj_est)
+  return bool(np.all((la.norm(x_diff[:,:3],axis=1)<dp_lim) & (la.norm(x_diff[:,3:],axis=1)<dq_lim)))
 
 #Return the interpolation from x1 to x2 with N points
 #p1 is not included
 def XInterpolation(x1,x2,N):
-  p1,R1= XToPosRot(x1)
-  p2,R2= XToPosRot(x2)
-  dp= (p2-p1)/float(N)
-  trans_R= np.dot(R2,R1.T)
-  w= InvRodrigues(trans_R)
-  traj=[]
-  for t in range(N):
-    R= np.dot(Rodrigues(float(t+1)/float(N)*w),R1)
-    p1= p1+dp
-    traj.append(PosRotToX(p1,R))
-  return traj
+  return XInterpolationArray(x1,x2,N).tolist()
 
 #Return the interpolation from q1 to q2 with N points
 #q1 is not included
 def QInterpolation(q1,q2,N):
-  R1= QToRot(q1)
-  R2= QToRot(q2)
-  trans_R= np.dot(R2,R1.T)
-  w= InvRodrigues(trans_R)
-  traj=[]
-  for t in range(N):
-    R= np.dot(Rodrigues(float(t+1)/float(N)*w),R1)
-    traj.append(RotToQ(R))
-  return traj
+  return QInterpolationArray(q1,q2,N).tolist()
+
+#Array version of XInterpolation; return an (N,7) array.
+#The orientations are interpolated along the geodesic (slerp) for all points at once.
+def XInterpolationArray(x1,x2,N):
+  s= np.arange(1,N+1)/float(N)
+  return AverageXBatch(x1, x2, s)
+
+#Array version of QInterpolation; return an (N,4) array.
+def QInterpolationArray(q1,q2,N):
+  s= np.arange(1,N+1)/float(N)
+  R1= QToRotBatch(q1)
+  w= InvRodriguesBatch(np.matmul(QToRotBatch(q2),np.swapaxes(R1,1,2)))
+  return RotToQBatch(np.matmul(RodriguesBatch(s.reshape(-1,1)*w),R1))
+
+#Interpolate every segment of a pose trajectory x_traj with N points.
+#Return an ((len(x_traj)-1)*N+1,7) array starting from x_traj[0]
+#  (same as [x_traj[0]]+XInterpolation(x_traj[0],x_traj[1],N)+XInterpolation(x_traj[1],x_traj[2],N)+...).
+def XTrajInterpolation(x_traj, N):
+  x_traj= np.asarray(x_traj,dtype=float).reshape(-1,7)
+  if len(x_traj)<=1:  return x_traj.copy()
+  s= np.tile(np.arange(1,N+1)/float(N), len(x_traj)-1)
+  x_int= AverageXBatch(np.repeat(x_traj[:-1],N,axis=0), np.repeat(x_traj[1:],N,axis=0), s)
+  return np.vstack((x_traj[:1], x_int))
+
+#Linearly interpolate every segment of a vector trajectory (e.g. joint angles) with N points.
+#Return an ((len(v_traj)-1)*N+1,D) array starting from v_traj[0].
+def VecTrajInterpolation(v_traj, N):
+  v_traj= np.asarray(v_traj,dtype=float)
+  if len(v_traj)<=1:  return v_traj.copy()
+  s= (np.arange(1,N+1)/float(N)).reshape(1,-1,1)
+  v_int= v_traj[:-1,None,:] + (v_traj[1:]-v_traj[:-1])[:,None,:]*s
+  return np.vstack((v_traj[:1], v_int.reshape(-1,v_traj.shape[1])))
 
 '''Transform a Cartesian trajectory to joint angle trajectory.
   func_ik: IK function (x, q_start).
@@ -408,25 +495,163 @@ class TCubicHermiteSpline:
     self.Initialize(data=None, tan_method=None, end_tan=None, c=None, m=None)
 
 
+#Multi-dimensional (vector) version of TCubicHermiteSpline.
+#Key points: [[t0,x0],[t1,x1],[t2,x2],...] where x is a vector (list or array of D elements).
+#Key points are stored in arrays T (N), X (N,D), M (N,D), and polynomial coefficients
+#of segments are precomputed, so that all dimensions (and a vector of times) are evaluated at once.
+class TCubicHermiteSplineN:
+  class TParam: pass
+
+  def __init__(self):
+    self.Param= self.TParam()
+
+  #Number of dimensions.
+  @property
+  def D(self):
+    return self.X.shape[1]
+
+  #Return segment indexes for times t (array).  Out-of-range t are clipped with warnings.
+  def FindIdx(self, t):
+    T= self.T
+    idx= np.searchsorted(T, t, side='left')-1
+    idx[t==T[0]]= 0
+    idx[np.abs(t-T[-1])<1.0e-6]= len(T)-2
+    out= (idx<0) | (idx>=len(T)-1)
+    if out.any():
+      for t_i,idx_i in zip(t[out],idx[out]):
+        print('WARNING: Given t= %f is out of the key points (index: %i)' % (t_i,idx_i))
+      t= np.where(idx<0, T[0], np.where(idx>=len(T)-1, T[-1], t))
+      idx= np.clip(idx, 0, len(T)-2)
+    return idx, t
+
+  #Return interpolated value at t.
+  #t: a time (float) or a vector of times; x is a vector (D) or a matrix (len(t),D) respectively.
+  #with_tan: If True, both x and dx/dt are returned.
+  #with_dd: If True, x,dx/dt,ddx/ddt are returned (with_tan is ignored).
+  def Evaluate(self, t, with_tan=False, with_dd=False):
+    is_scalar= np.isscalar(t)
+    if is_scalar and self.T[0]<t<self.T[-1]-1.0e-6:
+      #Fast path for a single time (e.g. control loop).
+      idx= int(np.searchsorted(self.T, t))-1
+      dT= self.dT[idx]
+      tr= (t-self.T[idx])/dT
+      a0,a1,a2,a3= self.C[:,idx]
+      x= a0+tr*(a1+tr*(a2+tr*a3))
+      if not with_tan and not with_dd:  return x
+      dx= (a1+tr*(2.0*a2+tr*3.0*a3))/dT
+      if not with_dd:  return x,dx
+      return x,dx,(2.0*a2+6.0*tr*a3)/(dT*dT)
+    t= np.atleast_1d(np.asarray(t,dtype=float))
+    idx,t= self.FindIdx(t)
+    dT= self.dT[idx][:,None]
+    tr= ((t-self.T[idx])/self.dT[idx])[:,None]
+    a0,a1,a2,a3= self.C[0][idx],self.C[1][idx],self.C[2][idx],self.C[3][idx]
+    res= [a0+tr*(a1+tr*(a2+tr*a3))]
+    if with_tan or with_dd:
+      res.append((a1+tr*(2.0*a2+tr*3.0*a3))/dT)
+    if with_dd:
+      res.append((2.0*a2+6.0*tr*a3)/(dT*dT))
+    if is_scalar:  res= [r[0] for r in res]
+    return res[0] if len(res)==1 else tuple(res)
+
+  #Compute a phase information (n, tp) for a cyclic spline curve (t can be a vector).
+  #n:  n-th occurrence of the base wave
+  #tp: phase (time in the base wave)
+  def PhaseInfo(self, t):
+    t0= self.T[0]
+    T= self.T[-1]-t0
+    mod= np.mod(np.asarray(t,dtype=float)-t0,T) if T!=0 else np.asarray(t,dtype=float)-t0
+    tp= t0+mod  #Phase
+    n= (t-t0-mod)/T
+    return n, tp
+
+  #Return interpolated value at t (cyclic version).
+  #pi: Phase information.
+  #with_tan: If True, both x and dx/dt are returned.
+  #with_dd: If True, x,dx/dt,ddx/ddt are returned (with_tan is ignored).
+  def EvaluateC(self, t, pi=None, with_tan=False, with_dd=False):
+    if pi is None:
+      n, tp= self.PhaseInfo(t)
+    else:
+      n, tp= pi
+    res= self.Evaluate(tp, with_tan=with_tan, with_dd=with_dd)
+    x= res[0] if (with_tan or with_dd) else res
+    x= x + np.multiply.outer(n, self.X[-1]-self.X[0])
+    return (x,)+res[1:] if (with_tan or with_dd) else x
+
+  #data= [[t0,x0],[t1,x1],[t2,x2],...]
+  FINITE_DIFF= TCubicHermiteSpline.FINITE_DIFF
+  CARDINAL= TCubicHermiteSpline.CARDINAL
+  ZERO= TCubicHermiteSpline.ZERO
+  GRAD= TCubicHermiteSpline.GRAD
+  CYCLIC= TCubicHermiteSpline.CYCLIC
+  def Initialize(self, data, tan_method=CARDINAL, end_tan=GRAD, c=0.0, m=1.0):
+    if data is not None:
+      self.T= np.array([d[0] for d in data], dtype=float)
+      self.X= np.array([d[1] for d in data], dtype=float).reshape(len(data),-1)
+
+    #Store parameters for future use / remind parameters if not given
+    if tan_method is None:  tan_method= self.Param.TanMethod
+    else:                   self.Param.TanMethod= tan_method
+    if end_tan is None:  end_tan= self.Param.EndTan
+    else:                self.Param.EndTan= end_tan
+    if c is None:  c= self.Param.C
+    else:          self.Param.C= c
+    if m is None:  m= self.Param.M
+    else:          self.Param.M= m
+
+    T,X= self.T,self.X
+    grad= lambda idx1,idx2: (X[idx2]-X[idx1])/np.reshape(T[idx2]-T[idx1],np.shape(idx1)+(1,))
+
+    self.M= np.zeros_like(X)
+    if len(T)>2:
+      i= np.arange(1,len(T)-1)
+      if tan_method == self.FINITE_DIFF:
+        self.M[1:-1]= 0.5*grad(i,i+1) + 0.5*grad(i-1,i)
+      elif tan_method == self.CARDINAL:
+        self.M[1:-1]= (1.0-c)*grad(i-1,i+1)
+
+    if end_tan == self.ZERO:
+      self.M[0]= 0.0
+      self.M[-1]= 0.0
+    elif end_tan == self.GRAD:
+      self.M[0]= m*grad(0,1)
+      self.M[-1]= m*grad(-2,-1)
+    elif end_tan == self.CYCLIC:
+      if tan_method == self.FINITE_DIFF:
+        M= 0.5*grad(0,1) + 0.5*grad(-2,-1)
+        self.M[0]= M
+        self.M[-1]= M
+      elif tan_method == self.CARDINAL:
+        M= (1.0-c)*(X[-1]-X[0]+X[1]-X[-2])/(T[-1]-T[0]+T[1]-T[-2])
+        self.M[0]= M
+        self.M[-1]= M
+
+    #Coefficients of the segment polynomials: x(tr)= C[0]+C[1]*tr+C[2]*tr^2+C[3]*tr^3, tr in [0,1].
+    self.dT= T[1:]-T[:-1]
+    dT= self.dT[:,None]
+    p0,p1= X[:-1],X[1:]
+    m0,m1= dT*self.M[:-1],dT*self.M[1:]
+    self.C= np.array([p0, m0, -3.0*p0-2.0*m0+3.0*p1-m1, 2.0*p0+m0-2.0*p1+m1])
+
+  def Update(self):
+    self.Initialize(data=None, tan_method=None, end_tan=None, c=None, m=None)
+
+
 
 '''Convert joint angle trajectory to joint velocity trajectory.'''
 def QTrajToDQTraj(q_traj, t_traj):
   dof= len(q_traj[0])
 
   #Modeling the trajectory with spline.
-  splines= [TCubicHermiteSpline() for d in range(dof)]
-  for d in range(len(splines)):
-    data_d= [[t,q[d]] for q,t in zip(q_traj,t_traj)]
-    splines[d].Initialize(data_d, tan_method=splines[d].CARDINAL, c=0.0, m=0.0)
+  spline= TCubicHermiteSplineN()
+  spline.Initialize(list(zip(t_traj,q_traj)), tan_method=spline.CARDINAL, c=0.0, m=0.0)
 
   #NOTE: We don't have to make spline models as we just want velocities at key points.
   #  They can be obtained by computing tan_method, which will be more efficient.
 
-  dq_traj= []
-  for t in t_traj:
-    dq= [splines[d].Evaluate(t,with_tan=True)[1] for d in range(dof)]
-    dq_traj.append(dq)
-  return dq_traj
+  dq_traj= spline.Evaluate(t_traj,with_tan=True)[1].reshape(len(t_traj),dof)
+  return dq_traj.tolist()
 
 
 
@@ -18,6 +18,11 @@ import random
 import traceback
 import importlib
 import hashlib
+import bisect
+import struct
+import mmap
+import six.moves.cPickle as pickle
+import base64
 
 #Speedup YAML using CLoader/CDumper
 from yaml import load as yamlload
@@ -27,6 +32,7 @@ try:
 except ImportError:
   from yaml import Loader as YLoader, Dumper as YDumper
 from yaml import Dumper as yaml_Dumper
+from yaml import add_representer as yaml_add_representer, add_constructor as yaml_add_constructor
 
 def AskYesNo():
   while 1:
@@ -354,18 +360,64 @@ class Types:
   npuint= (np.uint8, np.uint16, np.uint32, np.uint64)
   npfloat= (np.float_, np.float16, np.float32, np.float64)
 
+#Converters of ToStdType dispatched with the exact type (fast path).
+_STD_TYPE_CNV= {t:(lambda x:x) for t in Types.stdprim}
+_STD_TYPE_CNV.update({t:bool for t in (np.bool_,)})
+_STD_TYPE_CNV.update({t:int for t in Types.npint+Types.npuint})
+_STD_TYPE_CNV.update({t:float for t in Types.npfloat})
+_STD_TYPE_CNV[np.ndarray]= lambda x:x.tolist()
+#Converters of the classes registered by RegisterStdTypeCnv.
+_OBJ_STD_TYPE_CNV= {}
+
+#Register a converter cnv of the class t used by ToStdType instead of converting t.__dict__
+#(e.g. a view object referring to a database).  cnv(x) should return an object that ToStdType can convert.
+def RegisterStdTypeCnv(t, cnv):
+  _OBJ_STD_TYPE_CNV[t]= cnv
+
+#Element types of lists converted in bulk.
+_STD_SCALAR_TYPES= frozenset(Types.stdprim)
+_NP_SCALAR_TYPES= frozenset(Types.npint+Types.npuint+Types.npfloat+(np.bool_,))
+
+#Convert a list (or tuple, set) x into a standard python object (cf. ToStdType).
+def _ListToStdType(x, except_cnv, array_cnv):
+  types= set(map(type,x))
+  if types<=_STD_SCALAR_TYPES:
+    #Only lists of a single numeric type are given to array_cnv (e.g. ints in a float list are kept as ints).
+    if array_cnv is not None and (types==set((int,)) or types==set((float,))):
+      return array_cnv(np.array(list(x)))
+    return list(x)
+  if len(types)==1 and next(iter(types)) in _NP_SCALAR_TYPES:
+    return ToStdType(np.array(list(x)), except_cnv, array_cnv)
+  if array_cnv is not None and len(x)>0 and types<=set((list,tuple)):
+    #Rows of a single numeric type (int or float) with the same length.
+    etypes= set()
+    for row in x:  etypes.update(map(type,row))
+    if etypes==set((int,)) or etypes==set((float,)):
+      a= np.array(list(x))
+      if a.dtype.kind in 'fi':  return array_cnv(a)
+  return [ToStdType(x2,except_cnv,array_cnv) for x2 in x]
+
 #Convert a data into a standard python object
-def ToStdType(x, except_cnv=lambda y:y):
+#Homogeneous numeric lists and ndarrays are converted in bulk.
+#array_cnv: if given, numeric ndarrays and lists are converted by array_cnv(ndarray) instead of lists
+#  (e.g. to encode large arrays compactly in DumpYAML).
+def ToStdType(x, except_cnv=lambda y:y, array_cnv=None):
+  cnv= _STD_TYPE_CNV.get(type(x))
+  if cnv is not None and (array_cnv is None or type(x) is not np.ndarray):  return cnv(x)
   if isinstance(x, Types.npbool):   return bool(x)
   if isinstance(x, Types.npint):    return int(x)
   if isinstance(x, Types.npuint):   return int(x)
   if isinstance(x, Types.npfloat):  return float(x)
   if isinstance(x, Types.stdprim):  return x
-  if isinstance(x, np.ndarray):  return x.tolist()
-  if isinstance(x, (list,tuple,set)):  return map(lambda x2:ToStdType(x2,except_cnv), x)
-  if isinstance(x, dict):  return {ToStdType(k,except_cnv):ToStdType(v,except_cnv) for k,v in x.iteritems()}
+  if isinstance(x, np.ndarray):
+    if array_cnv is None or x.dtype.kind not in 'fiu':  return x.tolist()
+    return array_cnv(np.asarray(x))
+  if isinstance(x, (list,tuple,set)):  return _ListToStdType(x, except_cnv, array_cnv)
+  if isinstance(x, dict):  return {ToStdType(k,except_cnv,array_cnv):ToStdType(v,except_cnv,array_cnv) for k,v in x.iteritems()}
+  cnv= _OBJ_STD_TYPE_CNV.get(type(x))
+  if cnv is not None:  return ToStdType(cnv(x),except_cnv,array_cnv)
   try:
-    return {ToStdType(k,except_cnv):ToStdType(v,except_cnv) for k,v in x.__dict__.iteritems()}
+    return {ToStdType(k,except_cnv,array_cnv):ToStdType(v,except_cnv,array_cnv) for k,v in x.__dict__.iteritems()}
   except AttributeError:
     return except_cnv(x)
     #pass
@@ -522,11 +574,19 @@ def LoadYAML(file_name):
 #If directive (str) is given, it is inserted at the beginning of the YAML.
 #If correct_indent, Dumper_IndentPlus is used as the dumper.
 #If to_std_type, the input dictionary is converted to regular types by ToStdType with except_cnv.
-def DumpYAML(d, except_cnv=lambda y:y, directive=None, correct_indent=True, to_std_type=True):
+#compact: encoding of numeric arrays (ndarrays and lists of a single numeric type) whose size >= compact_min_size:
+#  None: sequences of scalars (default).
+#  'binary': YAML_NDARRAY_TAG mapping of dtype, shape, and base64 data (LoadYAML decodes it into lists).
+def DumpYAML(d, except_cnv=lambda y:y, directive=None, correct_indent=True, to_std_type=True, compact=None, compact_min_size=16):
   s= ''
   if directive is not None:
     s+= directive+'\n'
-  d= ToStdType(d,except_cnv)
+  if to_std_type:
+    array_cnv= None
+    if compact is not None:
+      if compact!='binary':  raise Exception('DumpYAML: unknown compact:',compact)
+      array_cnv= lambda a: TYAMLArray(a,compact) if a.size>=compact_min_size else a.tolist()
+    d= ToStdType(d,except_cnv,array_cnv)
   s+= yamldump(d, Dumper=Dumper_IndentPlus if correct_indent else YDumper)
   return s
 
@@ -535,15 +595,127 @@ def DumpYAML(d, except_cnv=lambda y:y, directive=None, correct_indent=True, to_s
 #If interactive, prompted before overwriting the file_name.
 #If correct_indent, Dumper_IndentPlus is used as the dumper.
 #If to_std_type, the input dictionary is converted to regular types by ToStdType with except_cnv.
-def SaveYAML(d, file_name, except_cnv=lambda y:y, interactive=True, directive=None, correct_indent=True, to_std_type=True):
+#compact, compact_min_size: encoding of large numeric arrays (cf. DumpYAML).
+def SaveYAML(d, file_name, except_cnv=lambda y:y, interactive=True, directive=None, correct_indent=True, to_std_type=True, compact=None, compact_min_size=16):
   with OpenW(file_name,interactive=interactive) as fp:
-    fp.write(DumpYAML(d))
+    fp.write(DumpYAML(d, except_cnv=except_cnv, directive=directive, correct_indent=correct_indent,
+                      to_std_type=to_std_type, compact=compact, compact_min_size=compact_min_size))
+
+'''Append-only binary log (BinLog) of length-prefixed records.
+File format:
+  BINLOG_MAGIC, then records; each record is:
+    uint32 (little endian): byte size of the rest of the record,
+    uint32: byte size of meta, meta (pickled), padding to 8 bytes,
+    raw float64 (little endian) arrays whose shapes are stored in meta.
+  A record is (meta, arrays) where meta is a picklable object (e.g. a dict of standard types)
+  and arrays is a list of float64 arrays.
+Records are only appended (AppendBinLog), so a long log is saved incrementally.
+A truncated last record (e.g. by a crash during writing) is ignored by LoadBinLog.
+'''
+BINLOG_MAGIC= b'AYBLOG1\n'
+
+#Return True if file_name is a BinLog file.
+def IsBinLog(file_name):
+  if not os.path.exists(file_name):  return False
+  with open(file_name,'rb') as fp:
+    return fp.read(len(BINLOG_MAGIC))==BINLOG_MAGIC
+
+#Append records=[(meta,arrays),...] to a BinLog file_name (created if not exist).
+#If interactive, prompted to create the parent directory if it does not exist.
+def AppendBinLog(file_name, records, interactive=True):
+  new_file= not os.path.exists(file_name) or os.path.getsize(file_name)==0
+  with OpenW(file_name,'ab',interactive=interactive) as fp:
+    if new_file:  fp.write(BINLOG_MAGIC)
+    for meta,arrays in records:
+      arrays= [np.ascontiguousarray(a,dtype='<f8') for a in arrays]
+      meta_bytes= pickle.dumps((meta,[a.shape for a in arrays]), 2)
+      pad= -(8+len(meta_bytes))%8
+      size= 4+len(meta_bytes)+pad+sum(a.nbytes for a in arrays)
+      fp.write(struct.pack('<II',size,len(meta_bytes)))
+      fp.write(meta_bytes)
+      fp.write(b'\0'*pad)
+      for a in arrays:  fp.write(a.tobytes())
+
+#Load records from a BinLog file_name; a generator of (meta,arrays).
+#If use_mmap, the file is memory-mapped and arrays are read-only views of the file (no copy).
+def LoadBinLog(file_name, use_mmap=True):
+  with open(file_name,'rb') as fp:
+    if fp.read(len(BINLOG_MAGIC))!=BINLOG_MAGIC:
+      raise IOError('LoadBinLog: not a BinLog file: {0}'.format(file_name))
+    file_size= os.fstat(fp.fileno()).st_size
+    if use_mmap and file_size>len(BINLOG_MAGIC):
+      buf= mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+      fp.seek(0)
+      buf= fp.read()
+  pos= len(BINLOG_MAGIC)
+  while pos+8<=file_size:
+    size,meta_size= struct.unpack('<II',buf[pos:pos+8])
+    if pos+4+size>file_size:  break  #Truncated record.
+    meta,shapes= pickle.loads(buf[pos+8:pos+8+meta_size])
+    offset= pos+8+meta_size
+    offset+= -offset%8
+    arrays= []
+    for shape in shapes:
+      count= int(np.prod(shape))
+      arrays.append(np.frombuffer(buf, dtype='<f8', count=count, offset=offset).reshape(shape))
+      offset+= 8*count
+    yield meta,arrays
+    pos+= 4+size
+
+'''Save rows (a 2D array or a list of rows) into a BinLog file_name incrementally.
+  saved: dictionary {file_name:number of saved rows} kept by the caller.
+  Only the rows after the saved ones are appended; the file is rewritten
+  if it was not saved with saved, or the number of rows decreased. '''
+def SaveRowsBinLog(file_name, rows, saved, interactive=True):
+  n_saved= saved.get(file_name)
+  if n_saved is None or n_saved>len(rows) or not IsBinLog(file_name):
+    OpenW(file_name,'wb',interactive=interactive).close()
+    n_saved= 0
+  if len(rows)>n_saved:
+    AppendBinLog(file_name, [({'start':n_saved}, [np.asarray(rows[n_saved:],dtype=float)])], interactive=interactive)
+  saved[file_name]= len(rows)
+
+#Load rows saved by SaveRowsBinLog as a 2D array.
+#If saved (dictionary) is given, saved[file_name] is updated so that SaveRowsBinLog appends new rows.
+def LoadRowsBinLog(file_name, saved=None):
+  blocks= [arrays[0] for meta,arrays in LoadBinLog(file_name)]
+  rows= np.concatenate(blocks) if len(blocks)>0 else np.zeros((0,0))
+  if saved is not None:  saved[file_name]= len(rows)
+  return rows
 
 #Dumper class to correct the list indentation issue of the original Dumper.
 class Dumper_IndentPlus(yaml_Dumper):
   def increase_indent(self, flow=False, *args, **kwargs):
     return super(Dumper_IndentPlus,self).increase_indent(flow=flow, indentless=False)
 
+'''Numeric array to be encoded compactly in YAML (cf. DumpYAML).
+  style: 'binary'. '''
+class TYAMLArray(object):
+  def __init__(self, array, style):
+    self.Array= array
+    self.Style= style
+
+YAML_NDARRAY_TAG= '!ndarray'
+
+def _RepresentYAMLArray(dumper, data):
+  a= data.Array
+  if data.Style=='binary':
+    a= np.ascontiguousarray(a, dtype=a.dtype.newbyteorder('<'))
+    b64= base64.b64encode(a.tobytes())
+    if not isinstance(b64,str):  b64= b64.decode('ascii')
+    return dumper.represent_mapping(YAML_NDARRAY_TAG, {'dtype':str(a.dtype.str), 'shape':list(a.shape), 'data':b64})
+  raise Exception('TYAMLArray: unknown style:',data.Style)
+
+def _ConstructYAMLArray(loader, node):
+  value= loader.construct_mapping(node, deep=True)
+  a= np.frombuffer(base64.b64decode(value['data']), dtype=np.dtype(str(value['dtype'])))
+  return a.reshape(value['shape']).tolist()
+
+for _dumper in (Dumper_IndentPlus, YDumper):
+  yaml_add_representer(TYAMLArray, _RepresentYAMLArray, Dumper=_dumper)
+yaml_add_constructor(YAML_NDARRAY_TAG, _ConstructYAMLArray, Loader=YLoader)
+
 #Get an SHA-1 hash of a dictionary d.
 def GetSHA1HashOfDict(d):
   d_yaml= yamldump(d, Dumper=YDumper)
@@ -822,24 +994,64 @@ class TSignal:
       return self.queue.get(block,timeout)
 
 
-'''Modified rospy.Rate with standard time.
-https://docs.ros.org/api/rospy/html/rospy.timer-pysrc.html#Rate '''
+#Monotonic clock (seconds) that is not affected by system time changes (cf. _monotonic.py).
+from ._monotonic import MonotonicTime
+
+'''Modified rospy.Rate with a monotonic clock.
+https://docs.ros.org/api/rospy/html/rospy.timer-pysrc.html#Rate
+Additional features:
+  spin: Duration (sec) of a busy-wait tail; sleep() uses time.sleep until (deadline-spin)
+    and then spins until the deadline, which gives sub-millisecond accuracy at a cost of CPU.
+  Statistics of the loop: histogram of the actual periods, number of overruns
+    (deadline already passed when sleep() is called), worst-case latency (wake-up time - deadline).
+    Use Stats() to get them, and PrintStats() to log them.
+Example:
+  rate= TRate(500, spin=0.001)
+  while running:
+    ...
+    rate.sleep()
+  rate.PrintStats()
+'''
 class TRate(object):
   """
   Convenience class for sleeping in a loop at a specified rate
   """
 
-  def __init__(self, hz, reset=False):
+  def __init__(self, hz, reset=False, spin=0.0, hist_edges=None):
     """
     Constructor.
     @param hz: hz rate to determine sleeping
     @type  hz: float
     @param reset: if True, timer is reset when time moved backward. [default: False]
     @type  reset: bool
+    @param spin: duration (sec) of the busy-wait tail before each deadline. [default: 0.0]
+    @type  spin: float
+    @param hist_edges: bin edges of the period histogram as ratios to the nominal period.
+      [default: (0.5,0.9,0.95,0.99,1.01,1.05,1.1,1.5,2.0)]
+    @type  hist_edges: list of float
     """
-    self.last_time = time.time()
+    self.last_time = MonotonicTime()
     self.sleep_dur = 1.0/hz
     self._reset = reset
+    self.spin = spin
+    if hist_edges is None:  hist_edges = (0.5,0.9,0.95,0.99,1.01,1.05,1.1,1.5,2.0)
+    self.hist_edges = [e*self.sleep_dur for e in hist_edges]
+    self.ResetStats()
+
+  def ResetStats(self):
+    """
+    Reset the statistics.
+    """
+    self.hist = [0]*(len(self.hist_edges)+1)
+    self.num_cycles = 0
+    self.num_overruns = 0
+    self.num_resets = 0
+    self.max_latency = 0.0
+    self.sum_period = 0.0
+    self.sum_period2 = 0.0
+    self.min_period = None
+    self.max_period = None
+    self.last_wake = None
 
   def _remaining(self, curr_time):
     """
@@ -863,7 +1075,7 @@ class TRate(object):
     @return: time remaining
     @rtype: L{Time}
     """
-    curr_time = time.time()
+    curr_time = MonotonicTime()
     return self._remaining(curr_time)
 
   def sleep(self):
@@ -872,14 +1084,69 @@ class TRate(object):
     account the time elapsed since the last successful
     sleep().
     """
-    curr_time = time.time()
-    time.sleep(max(0.0, self._remaining(curr_time)))
-    self.last_time = self.last_time + self.sleep_dur
+    curr_time = MonotonicTime()
+    remaining = self._remaining(curr_time)
+    deadline = self.last_time + self.sleep_dur
+    if remaining > self.spin:
+      time.sleep(remaining - self.spin)
+    wake_time = MonotonicTime()
+    while wake_time < deadline:
+      wake_time = MonotonicTime()
+    self.last_time = deadline
+    self._update_stats(wake_time, remaining < 0.0)
 
     # detect time jumping forwards, as well as loops that are
     # inherently too slow
     if curr_time - self.last_time > self.sleep_dur * 2:
       self.last_time = curr_time
+      self.num_resets += 1
+
+  def _update_stats(self, wake_time, overrun):
+    latency = wake_time - self.last_time
+    if latency > self.max_latency:  self.max_latency = latency
+    if overrun:  self.num_overruns += 1
+    if self.last_wake is not None:
+      period = wake_time - self.last_wake
+      self.hist[bisect.bisect_right(self.hist_edges, period)] += 1
+      self.num_cycles += 1
+      self.sum_period += period
+      self.sum_period2 += period*period
+      if self.min_period is None or period < self.min_period:  self.min_period = period
+      if self.max_period is None or period > self.max_period:  self.max_period = period
+    self.last_wake = wake_time
+
+  def Stats(self):
+    """
+    Return the statistics of the loop as a dictionary.
+    @return: {'rate','cycles','overruns','resets','max_latency','period_mean','period_std',
+      'period_min','period_max','hist_edges','hist'}; hist[i] is the number of periods
+      in [hist_edges[i-1],hist_edges[i]) where hist_edges[-1]=0 and hist_edges[len]=inf.
+    @rtype: dict
+    """
+    n = self.num_cycles
+    mean = self.sum_period/n if n>0 else None
+    std = math.sqrt(max(0.0, self.sum_period2/n - mean*mean)) if n>0 else None
+    return {'rate':1.0/self.sleep_dur, 'cycles':n, 'overruns':self.num_overruns,
+            'resets':self.num_resets, 'max_latency':self.max_latency,
+            'period_mean':mean, 'period_std':std,
+            'period_min':self.min_period, 'period_max':self.max_period,
+            'hist_edges':list(self.hist_edges), 'hist':list(self.hist)}
+
+  def PrintStats(self, name='TRate'):
+    """
+    Print the statistics of the loop.
+    @param name: label of the loop
+    @type  name: str
+    """
+    st = self.Stats()
+    ms = lambda v: '{0:.3f}'.format(v*1.0e3) if v is not None else '-'
+    print('{0}: {1} Hz, cycles={2}, overruns={3}, resets={4}, max latency={5} ms'.format(
+      name, st['rate'], st['cycles'], st['overruns'], st['resets'], ms(st['max_latency'])))
+    print('  period [ms]: mean={0}, std={1}, min={2}, max={3}'.format(
+      ms(st['period_mean']), ms(st['period_std']), ms(st['period_min']), ms(st['period_max'])))
+    edges = ['0']+[ms(e) for e in st['hist_edges']]+['inf']
+    print('  histogram: '+', '.join('[{0},{1}):{2}'.format(edges[i],edges[i+1],h)
+                                   for i,h in enumerate(st['hist'])))
 
 '''
 Meta-class to generate a singleton class with multiple instances.
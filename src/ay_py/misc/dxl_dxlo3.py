@@ -4,7 +4,7 @@
 #\author  Akihiko Yamaguchi, info@akihikoy.net
 #\version 0.1
 #\date    Jan.28, 2020
-from dxl_util import TDynamixel1
+from dxl_util import TDynamixel1, TDynamixelSync, TStateRingBuffer, StartBusJob, StopBusJob
 from ..core.util import TRate, CPrint
 import time
 import threading
@@ -19,16 +19,18 @@ class TDxlO3(object):
     self.baudrate= 2e6
     self.op_mode= None  #Using default
     self.dxl= [TDynamixel1(dxl_type,dev=self.dev) for dxl_type in self.dxl_type]
+    self.dxl_sync= None  #TDynamixelSync of self.dxl (sync read/write).
 
     #Thread locker:
     self.port_locker= threading.RLock()
     self.state_locker= threading.RLock()
     self.moveth_locker= threading.RLock()
     self.state= {'stamp':0.0, 'position':[], 'velocity':[], 'effort':[]}
+    self.state_buffer= TStateRingBuffer(len(self.dxl))  #Written by StateObserver.
     self.moveth_cmd= {'pos':[],'max_effort':[]}
     self.hz_state_obs= 40  #State observation rate (Hz).
     self.hz_moveth_ctrl= 60  #MoveTh control rate (Hz).
-    self.threads= {  #ThreadName:[IsActive,ThreadObject]
+    self.threads= {  #ThreadName:[IsActive,JobName]; jobs are executed by the bus scheduler of the port.
       'StateObserver':[False,None],
       'MoveThController':[False,None],}
 
@@ -61,6 +63,7 @@ class TDxlO3(object):
         if self.op_mode is not None:  dxl.OpMode= self.op_mode
         dxl.Id= id
         ra(dxl.Setup())
+      if all(res):  self.dxl_sync= TDynamixelSync(self.dxl)
 
     if all(res):  ra(self.Activate())
 
@@ -84,10 +87,15 @@ class TDxlO3(object):
   def PosRange(self):
     return self.gripper_range[0],self.gripper_range[1]
 
+  #Get current positions (Dynamixel values) of all servos with a single sync read.
+  def position_cmd(self):
+    with self.port_locker:
+      data= self.dxl_sync.ReadState()
+    return data['PRESENT_POSITION'] if data is not None else [None]*len(self.dxl)
+
   '''Get current positions (in radian).'''
   def Position(self):
-    with self.port_locker:
-      pos= [dxl.Position() for dxl in self.dxl]
+    pos= self.position_cmd()
     if None in pos:
       print 'DxlG: Failed to read position;',pos
       return None
@@ -138,12 +146,11 @@ class TDxlO3(object):
     max_effort= [max_effort]*len(self.dxl) if isinstance(max_effort,(int,float)) else max_effort
     trg_curr= [dxl.CurrentLimit*me*0.01 for dxl,me in zip(self.dxl,max_effort)]
     with self.port_locker:
-      for dxl,c,tc in zip(self.dxl,cmd,trg_curr):
-        dxl.MoveToC(c, tc, blocking=False)
+      self.dxl_sync.MoveToC(cmd, trg_curr)
 
     p_log= []  #For detecting stuck.
     while blocking:
-      pos= [dxl.Position() for dxl in self.dxl]
+      pos= self.position_cmd()
       if None in pos:  return
       p_log.append(pos)
       if len(p_log)>50:  p_log.pop(0)
@@ -164,26 +171,27 @@ class TDxlO3(object):
 
   #Get current state saved in memory (no port access when running this function).
   #Run StartStateObs before using this.
+  #The latest sample of self.state_buffer is returned (no lock).
   def State(self):
-    with self.state_locker:
-      state= copy.deepcopy(self.state)
+    state= self.state_buffer.LatestDict()
+    if state is None:
+      with self.state_locker:
+        return copy.deepcopy(self.state)
+    for key in ('position','velocity','effort'):
+      if None in state[key]:  state[key]= None
     return state
 
-  #Start state observation.
+  #Start state observation (as a job of the bus scheduler of the port).
   #  callback: Callback function at the end of each observation cycle.
   def StartStateObs(self, callback=None):
     self.StopStateObs()
-    th_func= lambda:self.StateObserver(callback)
     self._state_observer_callback= callback  #For future use.
-    self.threads['StateObserver']= [True, threading.Thread(name='StateObserver', target=th_func)]
-    self.threads['StateObserver'][1].start()
+    StartBusJob(self.dev, self.threads, 'StateObserver', lambda:self.StateObserver(callback),
+                rate=self.hz_state_obs, priority=1)
 
   #Stop state observation.
   def StopStateObs(self):
-    if self.threads['StateObserver'][0]:
-      self.threads['StateObserver'][0]= False
-      self.threads['StateObserver'][1].join()
-    self.threads['StateObserver']= [False,None]
+    StopBusJob(self.dev, self.threads, 'StateObserver')
 
   #Set rate (Hz) of state observation.
   #Works anytime.
@@ -225,59 +233,50 @@ class TDxlO3(object):
       max_effort= [dxl.Read('GOAL_CURRENT')/dxl.CurrentLimit*100.0 for dxl in self.dxl]
     with self.moveth_locker:
       self.moveth_cmd= {'pos':goal_pos,'max_effort':max_effort}
-    th_func= lambda:self.MoveThController()
-    self.threads['MoveThController']= [True, threading.Thread(name='MoveThController', target=th_func)]
-    self.threads['MoveThController'][1].start()
+    StartBusJob(self.dev, self.threads, 'MoveThController', self.MoveThController,
+                rate=self.hz_moveth_ctrl, priority=2)
 
   #Stop MoveTh.
   def StopMoveTh(self):
-    if self.threads['MoveThController'][0]:
-      self.threads['MoveThController'][0]= False
-      self.threads['MoveThController'][1].join()
-    self.threads['MoveThController']= [False,None]
+    StopBusJob(self.dev, self.threads, 'MoveThController')
 
   #Set rate (Hz) of MoveTh controller.
   def SetMoveThCtrlRate(self, rate):
     if self.hz_moveth_ctrl!=rate:
       self.hz_moveth_ctrl= rate
 
-  #State observer thread.
+  #State observer (one cycle; executed periodically by the bus scheduler).
   #NOTE: Don't call this function directly.  Use self.StartStateObs and self.State
   def StateObserver(self, callback):
-    rate= TRate(self.hz_state_obs)
-    while self.threads['StateObserver'][0]:
-      with self.port_locker:
-        p,v,c= [dxl.Position() for dxl in self.dxl],[dxl.Velocity() for dxl in self.dxl],[dxl.Current() for dxl in self.dxl]
-      state= {
-        'stamp':time.time(),
-        'position':self.gripper_cmd2pos(p) if None not in p else None,
-        'velocity':self.gripper_cmd2vel(v) if None not in v else None,
-        'effort':[ci/dxl.CurrentLimit*100.0 for ci,dxl in zip(c,self.dxl)] if None not in c else None,
-        }
-      #print state['position']
-      with self.state_locker:
-        self.state= state
-      if callback is not None:
-        callback(state)
-      rate.sleep()
-    self.threads['StateObserver'][0]= False
-
-  #MoveTh controller thread.
+    with self.port_locker:
+      data= self.dxl_sync.ReadState()
+    if data is not None:
+      p,v,c= data['PRESENT_POSITION'],data['PRESENT_VELOCITY'],data['PRESENT_CURRENT']
+    else:
+      p,v,c= [None],[None],[None]
+    state= {
+      'stamp':time.time(),
+      'position':self.gripper_cmd2pos(p) if None not in p else None,
+      'velocity':self.gripper_cmd2vel(v) if None not in v else None,
+      'effort':[ci/dxl.CurrentLimit*100.0 for ci,dxl in zip(c,self.dxl)] if None not in c else None,
+      }
+    #print state['position']
+    self.state_buffer.Push(state['stamp'], state['position'], state['velocity'], state['effort'])
+    if callback is not None:
+      callback(state)
+    return True
+
+  #MoveTh controller (one cycle; executed periodically by the bus scheduler).
   #NOTE: Don't call this function directly.  Use self.StartMoveTh
   def MoveThController(self):
-    rate= TRate(self.hz_moveth_ctrl)
-    while self.threads['MoveThController'][0]:
-      with self.moveth_locker:
-        moveth_cmd= copy.deepcopy(self.moveth_cmd)
-      pos,max_effort= moveth_cmd['pos'],moveth_cmd['max_effort']
-      cmd= [max(cmin,min(cmax,int(c))) for cmin,cmax,c in zip(self.CmdMinMax[0],self.CmdMinMax[1],self.gripper_pos2cmd(pos))]
-      trg_curr= [dxl.CurrentLimit*me*0.01 for dxl,me in zip(self.dxl,max_effort)]
+    with self.moveth_locker:
+      moveth_cmd= copy.deepcopy(self.moveth_cmd)
+    pos,max_effort= moveth_cmd['pos'],moveth_cmd['max_effort']
+    cmd= [max(cmin,min(cmax,int(c))) for cmin,cmax,c in zip(self.CmdMinMax[0],self.CmdMinMax[1],self.gripper_pos2cmd(pos))]
+    trg_curr= [dxl.CurrentLimit*me*0.01 for dxl,me in zip(self.dxl,max_effort)]
 
-      with self.port_locker:
-        for dxl,c,tc in zip(self.dxl,cmd,trg_curr):
-          dxl.MoveToC(c, tc, blocking=False)
+    with self.port_locker:
+      self.dxl_sync.MoveToC(cmd, trg_curr)
 
-      #print 'dxl_gripper:MoveThController:rate.remaining:',rate.remaining()
-      rate.sleep()
-    self.threads['MoveThController'][0]= False
+    return True
 
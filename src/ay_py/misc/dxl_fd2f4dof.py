@@ -20,6 +20,7 @@ class TFD2F4DoF(TMikata):
     self.port_locker= threading.RLock()
     self.state_locker= threading.RLock()
     self.state= {'stamp':0.0, 'name':self.JointNames(), 'position':[], 'velocity':[], 'effort':[]}
+    self.state_buffer= None  #TStateRingBuffer written by StateObserver.
     self.hz_state_obs= 50  #State observation rate (Hz).
     self.hz_traj_ctrl= 200  #Trajectory control rate (Hz).
     self.threads= {  #ThreadName:[IsActive,ThreadObject]
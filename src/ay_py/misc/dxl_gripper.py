@@ -7,7 +7,7 @@
 #\version 0.2
 #\date    May.21, 2022
 #         Refactored the code.
-from dxl_util import TDynamixel1
+from dxl_util import TDynamixel1, TDynamixelSync, TStateRingBuffer, StartBusJob, StopBusJob
 from ..misc.dxl_holding import TDxlHolding
 from ..core.util import TRate, CPrint
 import time
@@ -23,16 +23,18 @@ class TDxlGripperBase(object):
     self.baudrate= 2e6
     self.op_mode= None  #Using default
     self.dxl= TDynamixel1(self.dxl_type,dev=self.dev)
+    self.dxl_sync= None  #TDynamixelSync to read the present state with a single packet.
 
     #Thread locker:
     self.port_locker= threading.RLock()
     self.state_locker= threading.RLock()
     self.moveth_locker= threading.RLock()
     self.state= {'stamp':0.0, 'position':None, 'velocity':None, 'effort':None}
+    self.state_buffer= TStateRingBuffer(1)  #Written by StateObserver.
     self.moveth_cmd= {'pos':None,'max_effort':None}
     self.hz_state_obs= 40  #State observation rate (Hz).
     self.hz_moveth_ctrl= 60  #MoveTh control rate (Hz).
-    self.threads= {  #ThreadName:[IsActive,ThreadObject]
+    self.threads= {  #ThreadName:[IsActive,JobName]; jobs are executed by the bus scheduler of the port.
       'StateObserver':[False,None],
       'MoveThController':[False,None],}
 
@@ -64,6 +66,7 @@ class TDxlGripperBase(object):
 
     with self.port_locker:
       ra(self.dxl.Setup())
+      self.dxl_sync= TDynamixelSync([self.dxl])
 
     ra(self.Activate())
 
@@ -148,26 +151,25 @@ class TDxlGripperBase(object):
 
   #Get current state saved in memory (no port access when running this function).
   #Run StartStateObs before using this.
+  #The latest sample of self.state_buffer is returned (no lock).
   def State(self):
-    with self.state_locker:
-      state= copy.deepcopy(self.state)
+    state= self.state_buffer.LatestDict(scalar=True)
+    if state is None:
+      with self.state_locker:
+        return copy.deepcopy(self.state)
     return state
 
-  #Start state observation.
+  #Start state observation (as a job of the bus scheduler of the port).
   #  callback: Callback function at the end of each observation cycle.
   def StartStateObs(self, callback=None):
     self.StopStateObs()
-    th_func= lambda:self.StateObserver(callback)
     self._state_observer_callback= callback  #For future use.
-    self.threads['StateObserver']= [True, threading.Thread(name='StateObserver', target=th_func)]
-    self.threads['StateObserver'][1].start()
+    StartBusJob(self.dev, self.threads, 'StateObserver', lambda:self.StateObserver(callback),
+                rate=self.hz_state_obs, priority=1)
 
   #Stop state observation.
   def StopStateObs(self):
-    if self.threads['StateObserver'][0]:
-      self.threads['StateObserver'][0]= False
-      self.threads['StateObserver'][1].join()
-    self.threads['StateObserver']= [False,None]
+    StopBusJob(self.dev, self.threads, 'StateObserver')
 
   #Set rate (Hz) of state observation.
   #Works anytime.
@@ -210,62 +212,54 @@ class TDxlGripperBase(object):
       max_effort= self.dxl.Read('GOAL_CURRENT')/self.dxl.CurrentLimit*100.0
     with self.moveth_locker:
       self.moveth_cmd= {'pos':goal_pos,'max_effort':max_effort}
-    th_func= lambda:self.MoveThController()
-    self.threads['MoveThController']= [True, threading.Thread(name='MoveThController', target=th_func)]
-    self.threads['MoveThController'][1].start()
+    StartBusJob(self.dev, self.threads, 'MoveThController', self.MoveThController,
+                rate=self.hz_moveth_ctrl, priority=2)
 
   #Stop MoveTh.
   def StopMoveTh(self):
-    if self.threads['MoveThController'][0]:
-      self.threads['MoveThController'][0]= False
-      self.threads['MoveThController'][1].join()
-    self.threads['MoveThController']= [False,None]
+    StopBusJob(self.dev, self.threads, 'MoveThController')
 
   #Set rate (Hz) of MoveTh controller.
   def SetMoveThCtrlRate(self, rate):
     if self.hz_moveth_ctrl!=rate:
       self.hz_moveth_ctrl= rate
 
-  #State observer thread.
+  #State observer (one cycle; executed periodically by the bus scheduler).
   #NOTE: Don't call this function directly.  Use self.StartStateObs and self.State
   def StateObserver(self, callback):
-    rate= TRate(self.hz_state_obs)
-    while self.threads['StateObserver'][0]:
-      with self.port_locker:
-        p,v,c= self.dxl.Position(),self.dxl.Velocity(),self.dxl.Current()
-      state= {
-        'stamp':time.time(),
-        'position':self.gripper_cmd2pos(p) if p is not None else None,
-        'velocity':self.gripper_cmd2vel(v) if v is not None else None,
-        #'effort':(float(c)/self.dxl.CurrentLimit*100.0) if c is not None else None,
-        'effort':self.dxl.ConvCurr(c) if c is not None else None,
-        }
-      #print state['position']
-      with self.state_locker:
-        self.state= state
-      if callback is not None:
-        callback(state)
-      rate.sleep()
-    self.threads['StateObserver'][0]= False
-
-
-  #MoveTh controller thread.
+    with self.port_locker:
+      data= self.dxl_sync.ReadState()
+    if data is not None:
+      p,v,c= data['PRESENT_POSITION'][0],data['PRESENT_VELOCITY'][0],data['PRESENT_CURRENT'][0]
+    else:
+      p,v,c= None,None,None
+    state= {
+      'stamp':time.time(),
+      'position':self.gripper_cmd2pos(p) if p is not None else None,
+      'velocity':self.gripper_cmd2vel(v) if v is not None else None,
+      #'effort':(float(c)/self.dxl.CurrentLimit*100.0) if c is not None else None,
+      'effort':self.dxl.ConvCurr(c) if c is not None else None,
+      }
+    #print state['position']
+    self.state_buffer.Push(state['stamp'], [state['position']], [state['velocity']], [state['effort']])
+    if callback is not None:
+      callback(state)
+    return True
+
+
+  #MoveTh controller (one cycle; executed periodically by the bus scheduler).
   #NOTE: Don't call this function directly.  Use self.StartMoveTh
   def MoveThController(self):
-    rate= TRate(self.hz_moveth_ctrl)
-    while self.threads['MoveThController'][0]:
-      with self.moveth_locker:
-        moveth_cmd= copy.deepcopy(self.moveth_cmd)
-      pos,max_effort= moveth_cmd['pos'],moveth_cmd['max_effort']
-      cmd= max(self.CmdMin,min(self.CmdMax,int(self.gripper_pos2cmd(pos))))
-      trg_curr= self.dxl.CurrentLimit*max_effort*0.01
+    with self.moveth_locker:
+      moveth_cmd= copy.deepcopy(self.moveth_cmd)
+    pos,max_effort= moveth_cmd['pos'],moveth_cmd['max_effort']
+    cmd= max(self.CmdMin,min(self.CmdMax,int(self.gripper_pos2cmd(pos))))
+    trg_curr= self.dxl.CurrentLimit*max_effort*0.01
 
-      with self.port_locker:
-        self.dxl.MoveToC(cmd, trg_curr, blocking=False)
+    with self.port_locker:
+      self.dxl.MoveToC(cmd, trg_curr, blocking=False)
 
-      #print 'dxl_gripper:MoveThController:rate.remaining:',rate.remaining()
-      rate.sleep()
-    self.threads['MoveThController'][0]= False
+    return True
 
 
 '''3D-printed Dynamixel Gripper utility class'''
@@ -335,36 +329,31 @@ class TDynamixelGripper(TDxlGripperBase):
       max_effort= self.dxl.ConvPWM(self.dxl.Read('GOAL_PWM'))
     with self.moveth_locker:
       self.moveth_cmd= {'pos':goal_pos,'max_effort':max_effort}
-    th_func= lambda:self.MoveThController()
-    self.threads['MoveThController']= [True, threading.Thread(name='MoveThController', target=th_func)]
-    self.threads['MoveThController'][1].start()
+    StartBusJob(self.dev, self.threads, 'MoveThController', self.MoveThController,
+                rate=self.hz_moveth_ctrl, priority=2)
 
-  #MoveTh controller thread.
+  #MoveTh controller (one cycle; executed periodically by the bus scheduler).
   #NOTE: Don't call this function directly.  Use self.StartMoveTh
   def MoveThController(self):
-    rate= TRate(self.hz_moveth_ctrl)
-    while self.threads['MoveThController'][0]:
-      with self.moveth_locker:
-        moveth_cmd= copy.deepcopy(self.moveth_cmd)
-      pos,max_effort= moveth_cmd['pos'],moveth_cmd['max_effort']
-      cmd= max(self.CmdMin,min(self.CmdMax,int(self.gripper_pos2cmd(pos))))
-      max_pwm= self.dxl.InvConvPWM(max_effort)
-
-      #print 'entry..'
-      if self.holding is None:
-        #print 'a..'
-        with self.port_locker:
-          self.dxl.SetPWM(max_pwm)
-          self.dxl.MoveTo(cmd, blocking=False)
-        #print 'b..'
-      else:
-        with self.port_locker:
-          self.dxl.SetPWM(max_pwm)
-        #self.holding.SetTarget(cmd, self.holding_max_pwm_rate*max_pwm)
-
-      #print 'dxl_gripper:MoveThController:rate.remaining:',rate.remaining()
-      rate.sleep()
-    self.threads['MoveThController'][0]= False
+    with self.moveth_locker:
+      moveth_cmd= copy.deepcopy(self.moveth_cmd)
+    pos,max_effort= moveth_cmd['pos'],moveth_cmd['max_effort']
+    cmd= max(self.CmdMin,min(self.CmdMax,int(self.gripper_pos2cmd(pos))))
+    max_pwm= self.dxl.InvConvPWM(max_effort)
+
+    #print 'entry..'
+    if self.holding is None:
+      #print 'a..'
+      with self.port_locker:
+        self.dxl.SetPWM(max_pwm)
+        self.dxl.MoveTo(cmd, blocking=False)
+      #print 'b..'
+    else:
+      with self.port_locker:
+        self.dxl.SetPWM(max_pwm)
+      #self.holding.SetTarget(cmd, self.holding_max_pwm_rate*max_pwm)
+
+    return True
 
 
   #Start holding controller with control rate (Hz).
@@ -389,7 +378,7 @@ class TDynamixelGripper(TDxlGripperBase):
     self.holding.observer= holding_observer
     self.holding.controller= holding_controller
     self.holding.SetTarget(goal_pos, self.holding_max_pwm_rate*max_pwm)
-    self.holding.Start()
+    self.holding.Start(self.dev)
 
   def StopHolding(self):
     if self.holding is not None:
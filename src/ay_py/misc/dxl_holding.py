@@ -4,6 +4,9 @@
 #\author  Akihiko Yamaguchi, info@akihikoy.net
 #\version 0.1
 #\date    Jan.30, 2018
+#\version 0.2
+#\date    Oct.16, 2026
+#         The control loop can be executed as a job of the bus scheduler of the port (Start(dev)).
 import threading
 from ..core.util import TRate, CPrint
 
@@ -28,7 +31,7 @@ Example:
   holding.observer= holding_observer
   holding.controller= holding_controller
   holding.SetTarget(TARGET_POS, MAX_PWM)
-  holding.Start()
+  holding.Start()  #Or holding.Start(dev) to execute the control as a job of the bus scheduler of the port dev.
 
   user-defined-loop:
     ...
@@ -52,6 +55,9 @@ class TDxlHolding(object):
     self.observer= None  #Should be: pos,vel,pwm= observer()
     self.controller= None  #Should be: controller(target_position)
 
+    self.threads= {'Holding':[False,None]}  #Job of the bus scheduler (cf. StartBusJob).
+    self.dev= None  #Port of the bus scheduler executing the job.
+
   #Set target position.
   #  trg_pos: Target position.
   #  max_pwm: Maximum effort; when pwm exceeds this value, we don't increase the offset.
@@ -59,41 +65,56 @@ class TDxlHolding(object):
     self.trg_pos= trg_pos
     self.max_pwm= max_pwm if max_pwm is not None else self.max_pwm
 
-  def Start(self):
+  #Start the holding control.
+  #  dev: If None, the control loop runs in a thread.  Otherwise the control (Step) is executed
+  #    as a job of the bus scheduler of the port dev (cf. dxl_util.StartBusJob).
+  def Start(self, dev=None):
     self.Stop()
+    #Virtual offset:
+    self.trg_offset= 0.0
+    if dev is not None:
+      from .dxl_util import StartBusJob
+      self.dev= dev
+      StartBusJob(self.dev, self.threads, 'Holding', self.Step, rate=self.ctrl_rate, priority=2)
+      return
     self.thread= threading.Thread(name='holding', target=self.Loop)
     self.is_running= True
     self.thread.start()
 
   def Stop(self):
+    if self.threads['Holding'][0]:
+      from .dxl_util import StopBusJob
+      StopBusJob(self.dev, self.threads, 'Holding')
+      self.dev= None
     if self.is_running:
       self.is_running= False
       self.thread.join()
 
+  #NOTE: Don't call this function directly.  Use self.Start
   def Loop(self):
-    sign= lambda x: 1 if x>0 else -1 if x<0 else 0
-
     rate= TRate(self.ctrl_rate)
-
-    #Virtual offset:
-    self.trg_offset= 0.0
-
     while self.is_running:
-      pos,vel,pwm= self.observer()
-
-      if self.trg_offset!=0 and sign(self.trg_pos-pos)!=sign(self.trg_offset):
-        self.trg_pos= self.trg_pos+self.trg_offset
-        self.trg_offset= 0.0
-      elif abs(vel)>=self.th_v:
-        self.trg_pos= self.trg_pos+self.trg_offset
-        self.trg_offset= 0.0
-      elif abs(self.trg_pos-pos)>self.th_p and abs(vel)<self.th_v and abs(pwm)<self.max_pwm:
-        self.trg_offset= self.trg_offset + self.ostep*sign(self.trg_pos-pos)
-      #print pos,vel,pwm,'--',self.trg_pos,self.trg_offset
-
-      #print 'dxl_holding:Loop:',int(self.trg_pos+self.trg_offset)
-      self.controller(int(self.trg_pos+self.trg_offset))
-
+      self.Step()
       rate.sleep()
       #print 'dxl_holding:Loop:rate.remaining:',rate.remaining()
 
+  #One cycle of the holding control (executed periodically by Loop or by the bus scheduler).
+  #NOTE: Don't call this function directly.  Use self.Start
+  def Step(self):
+    sign= lambda x: 1 if x>0 else -1 if x<0 else 0
+    pos,vel,pwm= self.observer()
+
+    if self.trg_offset!=0 and sign(self.trg_pos-pos)!=sign(self.trg_offset):
+      self.trg_pos= self.trg_pos+self.trg_offset
+      self.trg_offset= 0.0
+    elif abs(vel)>=self.th_v:
+      self.trg_pos= self.trg_pos+self.trg_offset
+      self.trg_offset= 0.0
+    elif abs(self.trg_pos-pos)>self.th_p and abs(vel)<self.th_v and abs(pwm)<self.max_pwm:
+      self.trg_offset= self.trg_offset + self.ostep*sign(self.trg_pos-pos)
+    #print pos,vel,pwm,'--',self.trg_pos,self.trg_offset
+
+    #print 'dxl_holding:Loop:',int(self.trg_pos+self.trg_offset)
+    self.controller(int(self.trg_pos+self.trg_offset))
+    return True
+
@@ -11,7 +11,7 @@ import time
 import threading
 import copy
 from ..core.util import TRate, CPrint
-from ..core.traj import TCubicHermiteSpline
+from ..core.traj import TCubicHermiteSplineN
 
 class TMikata(object):
   def __init__(self, dev='/dev/ttyUSB0'):
@@ -21,6 +21,7 @@ class TMikata(object):
     self.dxl_ids= [1,2,3,4,5]
     self.joint_names= ['joint_1', 'joint_2', 'joint_3', 'joint_4', 'gripper_joint_5']
     self.dxl= {}  #{joint_name:TDynamixel1}
+    self.dxl_sync= None  #TDynamixelSync of all joints (sync read/write).
     self.op_mode= 'POSITION'
     #self.goal_pwm= [10, 20, 15, 10, 12]
     self.goal_pwm= [70, 50, 40, 40, 30]
@@ -30,9 +31,10 @@ class TMikata(object):
     self.port_locker= threading.RLock()
     self.state_locker= threading.RLock()
     self.state= {'stamp':0.0, 'name':self.JointNames(), 'position':[], 'velocity':[], 'effort':[]}
+    self.state_buffer= None  #TStateRingBuffer written by StateObserver.
     self.hz_state_obs= 50  #State observation rate (Hz).
     self.hz_traj_ctrl= 200  #Trajectory control rate (Hz).
-    self.threads= {  #ThreadName:[IsActive,ThreadObject]
+    self.threads= {  #ThreadName:[IsActive,JobName]; jobs are executed by the bus scheduler of the port.
       'StateObserver':[False,None],
       'TrajectoryController':[False,None],}
 
@@ -53,6 +55,9 @@ class TMikata(object):
         if not dxl.Setup():
           print 'Failed to setup Dynamixel at:',jname
           return False
+      self.dxl_sync= TDynamixelSync([self.dxl[jname] for jname in self.joint_names])
+      self.jidx= {jname:i for i,jname in enumerate(self.joint_names)}
+      self.state_buffer= TStateRingBuffer(len(self.joint_names))
 
     #Conversions from/to Dynamixel value to/from PWM(percentage), current(mA),
     #  velocity(rad/s), position(rad), temperature(deg of Celsius).
@@ -91,6 +96,14 @@ class TMikata(object):
       for jname in self._joint_names(joint_names):
         self.dxl[jname].Reboot()
 
+  #Pick values of address from the result of self.dxl_sync.ReadState and convert them.
+  #Values are None if data is None (failure).
+  def sync_values(self, data, address, conv, joint_names):
+    if data is None:  return [None]*len(joint_names)
+    values= data[address]
+    return [conv[jname](values[self.jidx[jname]]) if values[self.jidx[jname]] is not None else None
+            for jname in joint_names]
+
   #Get current PWM.
   #  joint_names: Names of observing joints.
   #  as_dict: If True, the result is returned as a dictionary {joint_name:value}.
@@ -98,8 +111,8 @@ class TMikata(object):
   def PWM(self,joint_names=None,as_dict=False):
     joint_names= self._joint_names(joint_names)
     with self.port_locker:
-      values= [self.dxl[jname].PWM() for jname in joint_names]
-    values= [self.conv_pwm[jname](value) for value in values]
+      data= self.dxl_sync.ReadState()
+    values= self.sync_values(data, 'PRESENT_PWM', self.conv_pwm, joint_names)
     if as_dict:  return {jname:value for (jname,value) in zip(joint_names,values)}
     else:        return values
 
@@ -110,8 +123,8 @@ class TMikata(object):
   def Current(self,joint_names=None,as_dict=False):
     joint_names= self._joint_names(joint_names)
     with self.port_locker:
-      values= [self.dxl[jname].Current() for jname in joint_names]
-    values= [self.conv_curr[jname](value) for value in values]
+      data= self.dxl_sync.ReadState()
+    values= self.sync_values(data, 'PRESENT_CURRENT', self.conv_curr, joint_names)
     if as_dict:  return {jname:value for (jname,value) in zip(joint_names,values)}
     else:        return values
 
@@ -122,8 +135,8 @@ class TMikata(object):
   def Velocity(self,joint_names=None,as_dict=False):
     joint_names= self._joint_names(joint_names)
     with self.port_locker:
-      values= [self.dxl[jname].Velocity() for jname in joint_names]
-    values= [self.conv_vel[jname](value) for value in values]
+      data= self.dxl_sync.ReadState()
+    values= self.sync_values(data, 'PRESENT_VELOCITY', self.conv_vel, joint_names)
     if as_dict:  return {jname:value for (jname,value) in zip(joint_names,values)}
     else:        return values
 
@@ -134,8 +147,8 @@ class TMikata(object):
   def Position(self,joint_names=None,as_dict=False):
     joint_names= self._joint_names(joint_names)
     with self.port_locker:
-      values= [self.dxl[jname].Position() for jname in joint_names]
-    values= [self.conv_pos[jname](value) for value in values]
+      data= self.dxl_sync.ReadState()
+    values= self.sync_values(data, 'PRESENT_POSITION', self.conv_pos, joint_names)
     if as_dict:  return {jname:value for (jname,value) in zip(joint_names,values)}
     else:        return values
 
@@ -155,9 +168,10 @@ class TMikata(object):
   #  target: Target positions {joint_name:position(rad)}
   #  blocking: True: this function waits the target position is reached.  False: this function returns immediately.
   def MoveTo(self, target, blocking=True, threshold=0.03):
+    jnames= target.keys()
     with self.port_locker:
-      for jname,pos in target.iteritems():
-        self.dxl[jname].MoveTo(self.invconv_pos[jname](pos),blocking=False)
+      self.dxl_sync.MoveTo([self.invconv_pos[jname](target[jname]) for jname in jnames],
+                           [self.dxl[jname] for jname in jnames])
 
     while blocking:
       pos= self.Position(target.keys())
@@ -169,9 +183,11 @@ class TMikata(object):
   #  target: Target positions and currents {joint_name:(position(rad),current(mA))}
   #  blocking: True: this function waits the target position is reached.  False: this function returns immediately.
   def MoveToC(self, target, blocking=True, threshold=0.03):
+    jnames= target.keys()
     with self.port_locker:
-      for jname,(pos,curr) in target.iteritems():
-        self.dxl[jname].MoveToC(self.invconv_pos[jname](pos),self.invconv_curr[jname](curr),blocking=False)
+      self.dxl_sync.MoveToC([self.invconv_pos[jname](target[jname][0]) for jname in jnames],
+                            [self.invconv_curr[jname](target[jname][1]) for jname in jnames],
+                            [self.dxl[jname] for jname in jnames])
 
     while blocking:
       pos= self.Position(target.keys())
@@ -196,33 +212,35 @@ class TMikata(object):
   #Set PWM(percentage).
   #  pwm: Target PWMs {joint_name:pwm(percentage)}
   def SetPWM(self, pwm):
+    jnames= pwm.keys()
     with self.port_locker:
-      for jname,pwm_ in pwm.iteritems():
-        self.dxl[jname].SetPWM(self.invconv_pwm[jname](pwm_))
+      self.dxl_sync.SetPWM([self.invconv_pwm[jname](pwm[jname]) for jname in jnames],
+                           [self.dxl[jname] for jname in jnames])
 
   #Get current state saved in memory (no port access when running this function).
   #Run StartStateObs before using this.
+  #The latest sample of self.state_buffer is returned (no lock);
+  #use self.state_buffer.Window(K) to get the last K samples.
   def State(self):
-    with self.state_locker:
-      state= copy.deepcopy(self.state)
+    state= self.state_buffer.LatestDict() if self.state_buffer is not None else None
+    if state is None:
+      with self.state_locker:
+        return copy.deepcopy(self.state)
+    state['name']= self.JointNames()
     return state
 
-  #Start state observation.
+  #Start state observation (as a job of the bus scheduler of the port).
   #  callback: Callback function at the end of each observation cycle.
-  #           callback may return True or False. If False is returned, the thread stops.
+  #           callback may return True or False. If False is returned, the observation stops.
   def StartStateObs(self, callback=None):
     self.StopStateObs()
-    th_func= lambda:self.StateObserver(callback)
     self._state_observer_callback= callback  #For future use.
-    self.threads['StateObserver']= [True, threading.Thread(name='StateObserver', target=th_func)]
-    self.threads['StateObserver'][1].start()
+    StartBusJob(self.dev, self.threads, 'StateObserver', lambda:self.StateObserver(callback),
+                rate=self.hz_state_obs, priority=1)
 
   #Stop state observation.
   def StopStateObs(self):
-    if self.threads['StateObserver'][0]:
-      self.threads['StateObserver'][0]= False
-      self.threads['StateObserver'][1].join()
-    self.threads['StateObserver']= [False,None]
+    StopBusJob(self.dev, self.threads, 'StateObserver')
 
   #Set rate (Hz) of state observation.
   #Works anytime.
@@ -244,47 +262,48 @@ class TMikata(object):
   #      3. At the end of control: callback('final',None,None,None).
   def FollowTrajectory(self, joint_names, q_traj, t_traj, current=None, blocking=False, callback=None):
     self.StopTrajectory()
-    th_func= lambda:self.TrajectoryController(joint_names, q_traj, t_traj, current, callback)
-    self.threads['TrajectoryController']= [True, threading.Thread(name='TrajectoryController', target=th_func)]
-    self.threads['TrajectoryController'][1].start()
+    finished= threading.Event()
+    def on_end():
+      if callback is not None:
+        callback('final',None,None,None)
+      finished.set()
+    StartBusJob(self.dev, self.threads, 'TrajectoryController',
+                self.TrajectoryController(joint_names, q_traj, t_traj, current, callback),
+                rate=self.hz_traj_ctrl, priority=2, on_end=on_end)
     if blocking:
-      self.threads['TrajectoryController'][1].join()
+      finished.wait()
       self.StopTrajectory()
 
   #Stop following the trajectory.
   def StopTrajectory(self):
-    if self.threads['TrajectoryController'][0]:
-      self.threads['TrajectoryController'][0]= False
-      self.threads['TrajectoryController'][1].join()
-    self.threads['TrajectoryController']= [False,None]
+    StopBusJob(self.dev, self.threads, 'TrajectoryController')
 
   #Set rate (Hz) of trajectory following controller.
   def SetTrajectoryCtrlRate(self, rate):
     if self.hz_traj_ctrl!=rate:
       self.hz_traj_ctrl= rate
 
-  #State observer thread.
+  #State observer (one cycle; executed periodically by the bus scheduler).
+  #Return False to stop the observation.
   #NOTE: Don't call this function directly.  Use self.StartStateObs and self.State
   def StateObserver(self, callback):
-    rate= TRate(self.hz_state_obs)
-    while self.threads['StateObserver'][0]:
-      with self.port_locker:
-        state= {
-          'stamp':time.time(),
-          'name':self.JointNames(),
-          'position':self.Position(self.JointNames()),
-          'velocity':self.Velocity(self.JointNames()),
-          'effort':self.PWM(self.JointNames()),  #FIXME: PWM vs. Current
-          }
-      with self.state_locker:
-        self.state= state
-      if callback is not None:
-        if callback(state)==False:  break
-      #print state['position']
-      rate.sleep()
-    self.threads['StateObserver'][0]= False
+    #Observing all joints with a single sync read.
+    with self.port_locker:
+      data= self.dxl_sync.ReadState()
+    stamp= time.time()
+    position= self.sync_values(data, 'PRESENT_POSITION', self.conv_pos, self.JointNames())
+    velocity= self.sync_values(data, 'PRESENT_VELOCITY', self.conv_vel, self.JointNames())
+    effort= self.sync_values(data, 'PRESENT_PWM', self.conv_pwm, self.JointNames())  #FIXME: PWM vs. Current
+    self.state_buffer.Push(stamp, position, velocity, effort)
+    if callback is not None:
+      state= {'stamp':stamp, 'name':self.JointNames(), 'position':position, 'velocity':velocity, 'effort':effort}
+      if callback(state)==False:  return False
+    #print state['position']
+    return True
 
-  #Trajectory controller thread.
+  #Trajectory controller.
+  #Return a function executing one control cycle (executed periodically by the bus scheduler),
+  #which returns False at the end of the trajectory.
   #NOTE: Don't call this function directly.  Use self.FollowTrajectory
   def TrajectoryController(self, joint_names, q_traj, t_traj, current, callback):
     assert(len(t_traj)>0)
@@ -298,21 +317,18 @@ class TMikata(object):
       t_traj= [0.0]+t_traj
 
     #Modeling the trajectory with spline.
-    splines= [TCubicHermiteSpline() for d in xrange(dof)]
-    for d in xrange(len(splines)):
-      data_d= [[t,q[d]] for q,t in zip(q_traj,t_traj)]
-      splines[d].Initialize(data_d, tan_method=splines[d].CARDINAL, c=0.0, m=0.0)
-
-    rate= TRate(self.hz_traj_ctrl)
-    t0= time.time()
-    while all(((time.time()-t0)<t_traj[-1], self.threads['TrajectoryController'][0])):
-      t= time.time()-t0
-      #q= [splines[d].Evaluate(t) for d in xrange(dof)]
-      q_dq= [splines[d].Evaluate(t,with_tan=True) for d in range(dof)]
-      q= [q for q,_ in q_dq]
-      dq= [dq for _,dq in q_dq]
+    spline= TCubicHermiteSplineN()
+    spline.Initialize(zip(t_traj,q_traj), tan_method=spline.CARDINAL, c=0.0, m=0.0)
+
+    t0= [None]  #Start time (set at the first cycle).
+    def control():
+      if t0[0] is None:  t0[0]= time.time()
+      t= time.time()-t0[0]
+      if t>=t_traj[-1]:  return False
+      q,dq= spline.Evaluate(t,with_tan=True)
+      q,dq= q.tolist(),dq.tolist()
       if callback is not None:
-        if callback('loop_begin',t,q,dq)==False:  break
+        if callback('loop_begin',t,q,dq)==False:  return False
       #print t, q
       if current is None:
         with self.port_locker:
@@ -322,9 +338,6 @@ class TMikata(object):
           self.MoveToC({jname:(qj,ej) for jname,qj,ej in zip(joint_names,q,current)}, blocking=False)
       if callback is not None:
         callback('loop_end',None,None,None)
-      rate.sleep()
-
-    self.threads['TrajectoryController'][0]= False
-    if callback is not None:
-      callback('final',None,None,None)
+      return True
+    return control
 
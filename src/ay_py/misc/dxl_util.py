@@ -29,6 +29,13 @@
 #\version 0.9
 #\date    Sep.19, 2022
 #         Added RH-P12-RN(A).
+#\version 0.10
+#\date    Oct.16, 2026
+#         Added TDynamixelSync (sync read/write of multiple Dynamixels on a port).
+#         Added block reads of contiguous registers and the state snapshot to TDynamixel1.
+#         Added TStateRingBuffer (lock-free state buffer for state observers).
+#         Added TDxlBusScheduler (shared bus scheduler thread per port).
+#         TDxlBusScheduler uses the monotonic clock.
 
 #cf. DynamixelSDK/python/tests/protocol2_0/read_write.py
 #DynamixelSDK: https://github.com/ROBOTIS-GIT/DynamixelSDK
@@ -36,7 +43,11 @@
 #  https://docs.google.com/spreadsheets/d/19Zlqyls2ZCFspiZLJ6MFhfvJ9L4j-N5LDj3l2gndB-c/edit#gid=0
 
 import dynamixel_sdk as dynamixel  #Using Dynamixel SDK
-import math, time, threading
+import math, time, threading, struct
+import numpy as np
+
+#Monotonic clock (seconds) used by the bus scheduler.
+from ..core._monotonic import MonotonicTime
 
 '''Dynamixel port hander class.
 + It provides a function to automatically reopen a port.
@@ -71,6 +82,20 @@ class TDynamixelPortHandler(object):
     #Time to sleep after closing a port.
     self.time_to_sleep_after_closing_port= 0.1
 
+    #Bus schedulers {dev:TDxlBusScheduler}.
+    self.schedulers= {}
+    #Default rate (Hz) of the bus cycle of schedulers.
+    self.scheduler_rate= 500
+
+  #Return the bus scheduler of the device dev (it is created and started if not exist).
+  #  rate: Rate (Hz) of the bus cycle when creating the scheduler (default: self.scheduler_rate).
+  def Scheduler(self, dev, rate=None):
+    with self._lock:
+      if dev not in self.schedulers:
+        self.schedulers[dev]= TDxlBusScheduler(dev, rate if rate is not None else self.scheduler_rate)
+        self.schedulers[dev].Start()
+      return self.schedulers[dev]
+
   #Set a callback function on_reopened: Callback function called after the port reopen.
   def SetOnReopened(self, on_reopened):
     if on_reopened is not None and on_reopened not in self.on_reopened:
@@ -152,6 +177,9 @@ class TDynamixelPortHandler(object):
     if port_handler is not None and i>=0:
       self.opened[i]['ref']-= 1  #Decrease the reference counter.
       if self.opened[i]['ref']<=0:
+        with self._lock:
+          scheduler= self.schedulers.pop(info['dev'], None)
+        if scheduler is not None:  scheduler.Stop()
         with self.opened[i]['locker']:
           port_handler.closePort()
           print 'DxlPortHandler: Closed the port:',info['dev'],port_handler
@@ -226,9 +254,172 @@ class TDynamixelPortHandler(object):
       time.sleep(interval)
     self.thread_reopen[0]= False
 
+'''Bus scheduler of a port.
+A single thread per port runs a fixed-rate bus cycle where
+the periodic jobs (e.g. state observation, trajectory control) of all devices on the port are executed,
+instead of each device running its own threads that contend on the port locker.
+Use DxlPortHandler.Scheduler(dev) to get the scheduler of a port.
++ Periodic jobs: AddJob(name, func, rate, priority).
+  func() is called every 1/rate sec in the bus cycle; if it returns False, the job is removed.
+  Jobs due in a cycle are executed in the descending order of priority.
+  If a job is executed after its deadline (release time + period), or releases are skipped,
+  the deadline-miss counter of the job is increased.
++ The scheduler does not hold the port locker while executing a job;
+  a job locks the device (port_locker of the device) and then the port locker is taken
+  in the read/write functions, which is the same lock order as the user calls (e.g. MoveTo).
++ Write commands (e.g. MoveTo) are executed in the caller's thread.
+Example:
+  sched= DxlPortHandler.Scheduler('/dev/ttyUSB0')
+  sched.AddJob('mikata:StateObserver', observe, rate=50, priority=1)
+  sched.RemoveJob('mikata:StateObserver')
+  print sched.Stats()
+'''
+class TDxlBusScheduler(object):
+  def __init__(self, dev, rate=500):
+    self.DevName= dev
+    self.Rate= rate  #Rate of the bus cycle (Hz).
+    #Jobs {name:job}; job is a dict with the keys:
+    #  func, period, priority, next (release time), runs, misses, max_delay, on_removed.
+    self.jobs= {}
+    self.cycles= 0
+    self.cycle_overruns= 0  #Number of cycles that took longer than the cycle period.
+    self.running_job= None  #Name of the job being executed.
+    self.cond= threading.Condition(threading.Lock())
+    self.thread= [False,None]
+
+  #Add a periodic job.
+  #  name: Unique name of the job (an existing job with the same name is replaced).
+  #  func: Function called in the bus cycle; if it returns False, the job is removed.
+  #  rate: Rate (Hz) of the job (limited by the bus cycle rate).
+  #  priority: Larger value is executed first.
+  #  on_removed: Function called (in the scheduler thread or in RemoveJob) after the job is removed.
+  def AddJob(self, name, func, rate, priority=0, on_removed=None):
+    self.RemoveJob(name)
+    job= {'func':func, 'period':1.0/float(rate), 'priority':priority, 'next':MonotonicTime(),
+          'runs':0, 'misses':0, 'max_delay':0.0, 'on_removed':on_removed}
+    with self.cond:
+      self.jobs[name]= job
+      self.cond.notify()
+
+  #Remove a job.  This waits until the job finishes if it is running in the scheduler thread
+  #(except when called from the scheduler thread, e.g. from the job itself).
+  def RemoveJob(self, name):
+    with self.cond:
+      if name not in self.jobs:  return
+      if threading.current_thread() is not self.thread[1]:
+        while self.running_job==name:  self.cond.wait()
+      job= self.jobs.pop(name, None)
+    if job is not None and job['on_removed'] is not None:  job['on_removed']()
+
+  def HasJob(self, name):
+    return name in self.jobs
+
+  #Return statistics {'cycles','cycle_overruns','jobs':{name:{'rate','runs','misses','max_delay'}}}.
+  def Stats(self):
+    with self.cond:
+      jobs= {name:{'rate':1.0/job['period'], 'runs':job['runs'], 'misses':job['misses'], 'max_delay':job['max_delay']}
+             for name,job in self.jobs.iteritems()}
+    return {'cycles':self.cycles, 'cycle_overruns':self.cycle_overruns, 'jobs':jobs}
+
+  def Start(self):
+    self.Stop()
+    self.thread= [True, threading.Thread(name='DxlBusScheduler', target=self.Loop)]
+    self.thread[1].daemon= True
+    self.thread[1].start()
+
+  def Stop(self):
+    if self.thread[0]:
+      with self.cond:
+        self.thread[0]= False
+        self.cond.notify()
+      if threading.current_thread() is not self.thread[1]:
+        self.thread[1].join()
+    self.thread= [False,None]
+
+  #Bus cycle thread.
+  #NOTE: Don't call this function directly.  Use self.Start
+  def Loop(self):
+    cycle= 1.0/float(self.Rate)
+    while self.thread[0]:
+      with self.cond:
+        #Sleep while there is nothing to do.
+        while self.thread[0] and len(self.jobs)==0:
+          self.cond.wait(0.5)
+        t_cycle= MonotonicTime()  #Start of the cycle.
+      if not self.thread[0]:  break
+      self.cycles+= 1
+
+      t_now= MonotonicTime()
+      with self.cond:
+        due= sorted(((-job['priority'],job['next'],name) for name,job in self.jobs.iteritems() if job['next']<=t_now))
+      for _,_,name in due:
+        t_now= MonotonicTime()
+        #Remaining jobs are deferred to the next cycle when this cycle is overrun.
+        if t_now>t_cycle+cycle and name!=due[0][2]:  break
+        with self.cond:
+          job= self.jobs.get(name)
+          if job is None:  continue
+          self.running_job= name
+        delay= t_now-job['next']
+        job['max_delay']= max(job['max_delay'], delay)
+        if delay>job['period']:  job['misses']+= int(delay/job['period'])
+        try:
+          res= job['func']()
+        except Exception as e:
+          print 'TDxlBusScheduler: Exception in the job {name}:'.format(name=name),e
+          res= False
+        job['runs']+= 1
+        job['next']+= job['period']*max(1,int((t_now-job['next'])/job['period'])+1)
+        removed= False
+        with self.cond:
+          self.running_job= None
+          #The job is removed only if it has not been replaced by AddJob while running.
+          if res==False and self.jobs.get(name) is job:
+            del self.jobs[name]
+            removed= True
+          self.cond.notify_all()
+        if removed and job['on_removed'] is not None:  job['on_removed']()
+
+      #Keep the cycle rate.
+      t_now= MonotonicTime()
+      if t_now>t_cycle+cycle:
+        self.cycle_overruns+= 1
+      else:
+        with self.cond:
+          if self.thread[0]:  self.cond.wait(t_cycle+cycle-t_now)
+
 #Global object:
 DxlPortHandler= TDynamixelPortHandler.new()
 
+'''Start a periodic function of a device as a job of the bus scheduler of the port dev.
+  threads: Dictionary of the device {ThreadName:[IsActive,JobName]}; threads[name] is updated.
+  name: Thread name (e.g. 'StateObserver').
+  func, rate, priority: Job function, rate (Hz), and priority (cf. TDxlBusScheduler.AddJob).
+  on_end: Function called when the job ends (stopped or func returned False). '''
+def StartBusJob(dev, threads, name, func, rate, priority=0, on_end=None):
+  job_name= '{id}:{name}'.format(id=id(threads), name=name)
+  def on_removed():
+    threads[name][0]= False
+    if on_end is not None:  on_end()
+  threads[name]= [True, job_name]
+  DxlPortHandler.Scheduler(dev).AddJob(job_name, func, rate, priority, on_removed)
+
+#Stop a job started by StartBusJob.
+def StopBusJob(dev, threads, name):
+  if threads[name][0]:
+    DxlPortHandler.Scheduler(dev).RemoveJob(threads[name][1])
+  threads[name]= [False,None]
+
+#Convert an unsigned value read from a register of size bytes to a signed value.
+def DxlSigned(value, size):
+  if size==2:
+    value= value & 65535
+    if value>32767:  value= -(65536-value)
+  if size==4:
+    value= value & 4294967295
+    if value>2147483647:  value= -(4294967296-value)
+  return value
+
 
 class TDynamixel1(object):
   def __init__(self, type, dev='/dev/ttyUSB0'):
@@ -504,6 +695,14 @@ class TDynamixel1(object):
     #Dictionary to memorize the current state.
     self.state_memory= {}
 
+    #Snapshot of the values read from the device {address:value} and their time stamps {address:time}.
+    self.snapshot= {}
+    self.snapshot_stamp= {}
+    #Cache of block layouts {tuple of addresses:blocks} (cf. MakeBlocks).
+    self.block_layouts= {}
+    #Registers of the present state.
+    self.PRESENT_ADDRESSES= ('PRESENT_PWM','PRESENT_CURRENT','PRESENT_VELOCITY','PRESENT_POSITION','PRESENT_IN_VOLT','PRESENT_TEMP')
+
     # NOTE: We do not implement a thread lock for this low-level device controller.
     # Implement this functionality with the higher-level controller.
     #self.port_locker= threading.RLock()
@@ -572,22 +771,84 @@ class TDynamixel1(object):
       return None
     with port_locker:
       value,self.dxl_result,self.dxl_err= self.ReadFuncs[size](port_handler, self.Id, addr)
-    if size==2:
-      #value= value & 255
-      #if value>127:  value= -(256-value)
-      #value= value & 1023
-      #if value>511:  value= -(1024-value)
-      #value= value & 2047
-      #if value>1023:  value= -(2048-value)
-      #value= value & 4095
-      #if value>2047:  value= -(4096-value)
-      value= value & 65535
-      if value>32767:  value= -(65536-value)
-    if size==4:
-      value= value & 4294967295
-      if value>2147483647:  value= -(4294967296-value)
+    value= DxlSigned(value, size)
+    if self.dxl_result==dynamixel.COMM_SUCCESS:  self.UpdateSnapshot({address:value})
     return value
 
+  '''Make block layouts to read registers (addresses) with a few transactions.
+  Registers are sorted by the address, and neighboring registers whose gap is
+  not greater than max_gap bytes are merged into a block (the gaps are skipped in decoding).
+  Return a list of blocks: (start address, length, struct format, list of addresses).
+  Unavailable registers are ignored. '''
+  def MakeBlocks(self, addresses, max_gap=32):
+    #Struct format of each size; 1-byte registers are unsigned, others are signed (same as Read).
+    fmt_of_size= {1:'B', 2:'h', 4:'i'}
+    regs= sorted((self.ADDR[address][0],self.ADDR[address][1],address) for address in set(addresses)
+                 if self.ADDR[address][0] is not None)
+    blocks= []
+    for addr,size,address in regs:
+      if len(blocks)>0 and addr-(blocks[-1][0]+blocks[-1][1])<=max_gap and addr>=blocks[-1][0]+blocks[-1][1]:
+        start,length,fmt,names= blocks[-1]
+        gap= addr-(start+length)
+        blocks[-1]= (start, addr+size-start, fmt+('%dx'%gap if gap>0 else '')+fmt_of_size[size], names+[address])
+      else:
+        blocks.append((addr, size, '<'+fmt_of_size[size], [address]))
+    return blocks
+
+  #Read a block (an element of MakeBlocks) with a single transaction.
+  #Return {address:value}, or None if failed.
+  def read_block(self, port_handler, block):
+    start,length,fmt,names= block
+    data,self.dxl_result,self.dxl_err= self.packet_handler.readTxRx(port_handler, self.Id, start, length)
+    if self.dxl_result!=dynamixel.COMM_SUCCESS or len(data)<length:  return None
+    return dict(zip(names, struct.unpack_from(fmt, bytearray(data))))
+
+  '''Read registers (addresses) with block reads of contiguous registers.
+  The block layout is computed once for each set of addresses.
+  The snapshot is updated with the read values.
+  Return {address:value}; the values of the blocks failed to read are None.
+  addresses: List of register names (default: all registers). '''
+  def ReadBlock(self, addresses=None):
+    if addresses is None:  addresses= self.ADDR.keys()
+    key= tuple(sorted(addresses))
+    if key not in self.block_layouts:
+      self.block_layouts[key]= self.MakeBlocks(key)
+    values= {address:None for address in addresses}
+    port_handler,port_locker= self.port_handler()
+    if port_handler is None:
+      print 'Port {dev} is closed.'.format(dev=self.DevName)
+      return values
+    failure= None  #Result of the failed transaction (to be checked by CheckTxRxResult).
+    for block in self.block_layouts[key]:
+      with port_locker:
+        block_values= self.read_block(port_handler, block)
+      if block_values is not None:
+        values.update(block_values)
+        self.UpdateSnapshot(block_values)
+      elif failure is None:
+        failure= (self.dxl_result,self.dxl_err)
+    if failure is not None:  self.dxl_result,self.dxl_err= failure
+    return values
+
+  #Update the snapshot with values {address:value} read at stamp (default: current time).
+  def UpdateSnapshot(self, values, stamp=None):
+    if stamp is None:  stamp= time.time()
+    self.snapshot.update(values)
+    for address in values:  self.snapshot_stamp[address]= stamp
+
+  #Return the value of address in the snapshot if it is not older than max_age (sec), otherwise None.
+  def Snapshot(self, address, max_age):
+    if address not in self.snapshot:  return None
+    if time.time()-self.snapshot_stamp[address]>max_age:  return None
+    return self.snapshot[address]
+
+  #Read the present state (PWM, current, velocity, position, input voltage, temperature)
+  #with a single transaction (for X series).  Return {address:value}.
+  def ReadPresent(self):
+    values= self.ReadBlock(self.PRESENT_ADDRESSES)
+    self.CheckTxRxResult(quiet=True)
+    return values
+
   def Setup(self):
     DxlPortHandler.Open(dev=self.DevName, baudrate=self.Baudrate)
     if self.port_handler()[0] is None:
@@ -612,9 +873,11 @@ class TDynamixel1(object):
 
   #Memorize the current RAM state for setting them again after reopen.
   def MemorizeState(self):
+    values= self.ReadBlock()
     for address,(addr,size) in self.ADDR.iteritems():
-      if addr is None:  continue
-      self.state_memory[address]= self.Read(address)
+      #Keep the previous value if the block was not read.
+      if addr is None or values[address] is None:  continue
+      self.state_memory[address]= values[address]
 
   def RecallState(self):
     port_handler,port_locker= self.port_handler()
@@ -624,7 +887,7 @@ class TDynamixel1(object):
     with port_locker:
       recall= ('TORQUE_ENABLE','VEL_I_GAIN','VEL_P_GAIN','POS_D_GAIN','POS_I_GAIN','POS_P_GAIN',)
       for address in recall:
-        if address in self.state_memory:
+        if self.state_memory.get(address) is not None:
           print 'RecallState: {address}, {value}'.format(address=address,value=self.state_memory[address])
           self.Write(address,self.state_memory[address])
 
@@ -681,11 +944,13 @@ class TDynamixel1(object):
   #Print status
   def PrintStatus(self):
     status= []
+    values= self.ReadBlock()
     for address,(addr,size) in self.ADDR.iteritems():
       if addr is None:  continue
-      value= self.Read(address)
-      if not self.CheckTxRxResult():  value= (value,'(error)')
+      value= values[address]
+      if value is None:  value= (value,'(error)')
       status.append([addr,address,value])
+    self.CheckTxRxResult()
     status.sort()
     for addr,address,value in status:
       print '{address}({addr}): {value}'.format(address=address, addr=addr, value=value)
@@ -708,31 +973,49 @@ class TDynamixel1(object):
     self.print_shutdown(self.Read('HARDWARE_ERR_ST'), 'HARDWARE_ERR_ST')
 
   #Get current PWM
-  def PWM(self):
+  #  max_age: If not None, the value in the snapshot is returned if it is not older than max_age (sec).
+  #    The snapshot is updated by Read, ReadBlock, ReadPresent, and TDynamixelSync.Read.
+  #    The same applies to Current, Velocity, Position, and Temperature.
+  def PWM(self, max_age=None):
+    if max_age is not None:
+      value= self.Snapshot('PRESENT_PWM', max_age)
+      if value is not None:  return value
     value= self.Read('PRESENT_PWM')
     self.CheckTxRxResult()
     return value
 
   #Get current current
-  def Current(self):
+  def Current(self, max_age=None):
+    if max_age is not None:
+      value= self.Snapshot('PRESENT_CURRENT', max_age)
+      if value is not None:  return value
     value= self.Read('PRESENT_CURRENT')
     self.CheckTxRxResult(quiet=True)
     return value
 
   #Get current velocity
-  def Velocity(self):
+  def Velocity(self, max_age=None):
+    if max_age is not None:
+      value= self.Snapshot('PRESENT_VELOCITY', max_age)
+      if value is not None:  return value
     value= self.Read('PRESENT_VELOCITY')
     self.CheckTxRxResult(quiet=True)
     return value
 
   #Get current position
-  def Position(self):
+  def Position(self, max_age=None):
+    if max_age is not None:
+      value= self.Snapshot('PRESENT_POSITION', max_age)
+      if value is not None:  return value
     value= self.Read('PRESENT_POSITION')
     self.CheckTxRxResult(quiet=True)
     return value
 
   #Get current temperature
-  def Temperature(self):
+  def Temperature(self, max_age=None):
+    if max_age is not None:
+      value= self.Snapshot('PRESENT_TEMP', max_age)
+      if value is not None:  return value
     value= self.Read('PRESENT_TEMP')
     self.CheckTxRxResult(quiet=True)
     return value
@@ -758,15 +1041,28 @@ class TDynamixel1(object):
       self.dxl_result,self.dxl_err= self.packet_handler.factoryReset(port_handler, self.Id, mode)
     self.CheckTxRxResult()
 
+  #Clip a target position (Dynamixel value) into [self.MIN_POSITION, self.MAX_POSITION].
+  #  ext: If True, the position is not clipped in the multi-turn mode (EXTPOS).
+  def ClipPosition(self, target, ext=True):
+    target= int(target)
+    #FIXME: If OpMode allows multi turn, target could vary.
+    if ext and self.OpMode=='EXTPOS':  return target
+    if target < self.MIN_POSITION:  target = self.MIN_POSITION
+    elif target > self.MAX_POSITION:  target = self.MAX_POSITION
+    return target
+
+  #Clip a target current (Dynamixel value) into [-self.MAX_CURRENT, self.MAX_CURRENT].
+  def ClipCurrent(self, current):
+    current= int(current)
+    if current < -self.MAX_CURRENT:  current = -self.MAX_CURRENT
+    elif current > self.MAX_CURRENT:  current = self.MAX_CURRENT
+    return current
+
   #Move the position to a given value.
   #  target: Target position, should be in [self.MIN_POSITION, self.MAX_POSITION]
   #  blocking: True: this function waits the target position is reached.  False: this function returns immediately.
   def MoveTo(self, target, blocking=True):
-    target = int(target)
-    #FIXME: If OpMode allows multi turn, target could vary.
-    if self.OpMode!='EXTPOS':
-      if target < self.MIN_POSITION:  target = self.MIN_POSITION
-      elif target > self.MAX_POSITION:  target = self.MAX_POSITION
+    target= self.ClipPosition(target)
 
     # Write goal position
     self.Write('GOAL_POSITION', target)
@@ -791,13 +1087,8 @@ class TDynamixel1(object):
   #  current: Target current, should be in [-self.MAX_CURRENT, self.MAX_CURRENT]
   #  blocking: True: this function waits the target position is reached.  False: this function returns immediately.
   def MoveToC(self, target, current, blocking=True):
-    target= int(target)
-    current= int(current)
-    #FIXME: If OpMode allows multi turn, target could vary.
-    if target < self.MIN_POSITION:  target = self.MIN_POSITION
-    elif target > self.MAX_POSITION:  target = self.MAX_POSITION
-    if current < -self.MAX_CURRENT:  current = -self.MAX_CURRENT
-    elif current > self.MAX_CURRENT:  current = self.MAX_CURRENT
+    target= self.ClipPosition(target, ext=False)
+    current= self.ClipCurrent(current)
 
     # Write goal current and position
     self.Write('GOAL_CURRENT', current)
@@ -837,6 +1128,256 @@ class TDynamixel1(object):
     self.CheckTxRxResult()
 
 
+'''Fixed-capacity ring buffer of states (stamp, position, velocity, effort) for state observers.
++ The memory is preallocated with numpy arrays; no allocation happens in Push.
++ Lock-free: a single writer (observer thread) pushes samples,
+  and readers (any threads) get the latest sample or a window of the last K samples
+  without locks; a reader retries when the writer overwrites the samples while reading
+  (the writer publishes a sample by incrementing Count after writing it).
++ Values that could not be observed (None) are stored as nan.
+Example:
+  buf= TStateRingBuffer(dof=5, capacity=1000)
+  (observer thread) buf.Push(time.time(), position, velocity, effort)
+  stamp,position,velocity,effort= buf.Latest()
+  stamps,positions,velocities,efforts= buf.Window(100)  #Arrays of the last 100 samples (oldest first).
+  buf.Dump('/tmp/state.dat')
+'''
+class TStateRingBuffer(object):
+  def __init__(self, dof, capacity=1000):
+    self.Dof= dof
+    self.Capacity= capacity
+    self.stamp= np.zeros(capacity)
+    self.position= np.zeros((capacity,dof))
+    self.velocity= np.zeros((capacity,dof))
+    self.effort= np.zeros((capacity,dof))
+    self.Count= 0  #Number of samples pushed so far.
+
+  #Add a sample (should be called from a single writer thread).
+  #position, velocity, effort: Lists of dof values (or None when not observed).
+  def Push(self, stamp, position, velocity, effort):
+    i= self.Count % self.Capacity
+    self.stamp[i]= stamp
+    for array,value in ((self.position,position),(self.velocity,velocity),(self.effort,effort)):
+      if value is None:  array[i]= np.nan
+      else:  array[i]= [v if v is not None else np.nan for v in value]
+    self.Count+= 1  #Publish the sample.
+
+  #Number of samples available.
+  def __len__(self):
+    return min(self.Count, self.Capacity)
+
+  #Return the latest sample (stamp, position, velocity, effort) or None if no sample.
+  #position, velocity, effort are numpy arrays (copies of rows).
+  def Latest(self):
+    while True:
+      n= self.Count
+      if n==0:  return None
+      i= (n-1) % self.Capacity
+      sample= (self.stamp[i], self.position[i].copy(), self.velocity[i].copy(), self.effort[i].copy())
+      if self.Count-n < self.Capacity-1:  return sample
+
+  #Return the latest sample as a dictionary {'stamp','position','velocity','effort'} of lists
+  #(nan is converted to None), or None if no sample.
+  #  scalar: If True (for dof=1), position, velocity, effort are scalar values.
+  def LatestDict(self, scalar=False):
+    sample= self.Latest()
+    if sample is None:  return None
+    conv= lambda a: [None if np.isnan(v) else v for v in a.tolist()]
+    if scalar:  conv1= lambda a: conv(a)[0]
+    else:       conv1= conv
+    return {'stamp':float(sample[0]), 'position':conv1(sample[1]), 'velocity':conv1(sample[2]), 'effort':conv1(sample[3])}
+
+  #Return the last K samples (stamps, positions, velocities, efforts) as arrays in chronological order.
+  #K is limited by the number of available samples and Capacity-1.
+  def Window(self, K):
+    while True:
+      n= self.Count
+      K= max(0,min(K, n, self.Capacity-1))
+      idx= np.arange(n-K,n) % self.Capacity
+      window= (self.stamp[idx], self.position[idx], self.velocity[idx], self.effort[idx])
+      if self.Count-n < self.Capacity-K:  return window
+
+  #Save the last K samples (default: all available samples) into a text file for post-mortem analysis.
+  #Each line: stamp, position[0..dof-1], velocity[0..dof-1], effort[0..dof-1].
+  def Dump(self, file_name, K=None):
+    stamps,positions,velocities,efforts= self.Window(K if K is not None else self.Capacity)
+    header= 'stamp position[{dof}] velocity[{dof}] effort[{dof}]'.format(dof=self.Dof)
+    np.savetxt(file_name, np.hstack((stamps.reshape(-1,1),positions,velocities,efforts)), header=header)
+
+'''Sync read/write of multiple Dynamixels connected to the same port.
+A set of registers of all servos is read with a single packet (GroupSyncRead),
+and a register of all servos is written with a single packet (GroupSyncWrite).
+Compared to TDynamixel1.Read/Write called for each servo and register,
+the number of transactions on the bus is reduced from (#servos x #registers) to one.
++ The servos should have been set up (TDynamixel1.Setup) and should share the control table layout.
++ Protocol 2.0 is required.
++ The port is locked with the locker of DxlPortHandler during a transaction;
+  the group objects are re-created when the port is reopened.
+Example:
+  dxl= [TDynamixel1('XM430-W350',dev) for i in range(5)]
+  (setup each dxl)
+  sync= TDynamixelSync(dxl)
+  data= sync.Read()  #{'PRESENT_POSITION':[p1,...,p5], 'PRESENT_VELOCITY':[...], ...}
+  sync.MoveTo([2048]*5)
+'''
+class TDynamixelSync(object):
+  #dxls: List of TDynamixel1 objects.
+  #read_addresses: Registers read by Read; they are read as one contiguous range.
+  #  The registers that are not available with the servos are ignored.
+  def __init__(self, dxls, read_addresses=('PRESENT_PWM','PRESENT_CURRENT','PRESENT_VELOCITY','PRESENT_POSITION')):
+    self.dxls= list(dxls)
+    if len(self.dxls)==0:
+      raise Exception('TDynamixelSync: no Dynamixel is given.')
+    dxl0= self.dxls[0]
+    if any(dxl.DevName!=dxl0.DevName for dxl in self.dxls):
+      raise Exception('TDynamixelSync: Dynamixels should be on the same port.')
+    if any(dxl.PROTOCOL_VERSION!=2 for dxl in self.dxls):
+      raise Exception('TDynamixelSync: protocol 2.0 is required.')
+    self.DevName= dxl0.DevName
+    self.ADDR= dxl0.ADDR
+    self.ReadAddresses= [address for address in read_addresses
+                         if address in self.ADDR and self.ADDR[address][0] is not None]
+    if any(dxl.ADDR[address]!=self.ADDR[address] for dxl in self.dxls for address in self.ReadAddresses):
+      raise Exception('TDynamixelSync: Dynamixels should have the same control table layout.')
+    if len(self.ReadAddresses)>0:
+      self.read_start= min(self.ADDR[address][0] for address in self.ReadAddresses)
+      self.read_length= max(sum(self.ADDR[address]) for address in self.ReadAddresses)-self.read_start
+    else:
+      self.read_start,self.read_length= None,0
+
+    self.port= None  #Port handler used to create the group objects.
+    self.packet_handler= None
+    self.group_read= None
+    self.group_write= {}  #{address:GroupSyncWrite}
+    self.dxl_result= None
+    self.dxl_err= None
+
+  #Return port handler and port locker.
+  #If the port handler has been changed (e.g. reopened), the group objects are re-created.
+  def port_handler(self):
+    port_handler,port_locker= DxlPortHandler.Port(self.DevName)
+    if port_handler is not None and port_handler is not self.port:
+      self.port= port_handler
+      self.packet_handler= self.dxls[0].packet_handler
+      self.group_write= {}
+      self.group_read= None
+      if self.read_length>0:
+        self.group_read= dynamixel.GroupSyncRead(self.port, self.packet_handler, self.read_start, self.read_length)
+        for dxl in self.dxls:
+          if not self.group_read.addParam(dxl.Id):
+            print 'TDynamixelSync: Failed to add ID {id} to GroupSyncRead.'.format(id=dxl.Id)
+            #Sync read is disabled until the group objects are re-created at the next call.
+            self.group_read= None
+            self.port= None
+            break
+    return port_handler,port_locker
+
+  #Read self.ReadAddresses of all servos with a single packet.
+  #Return {address:[value of dxl for dxl in self.dxls]} (a value is None when it is not available),
+  #  {} when there is no register to read,
+  #  or None when the port is closed or the sync read is not available.
+  def Read(self):
+    if self.read_length==0:  return {}
+    port_handler,port_locker= self.port_handler()
+    if port_handler is None:
+      print 'Port {dev} is closed.'.format(dev=self.DevName)
+      return None
+    if self.group_read is None:
+      print 'TDynamixelSync: GroupSyncRead is not available.'
+      return None
+    with port_locker:
+      self.dxl_result= self.group_read.txRxPacket()
+      self.dxl_err= 0
+      data= {}
+      for address in self.ReadAddresses:
+        addr,size= self.ADDR[address]
+        data[address]= [DxlSigned(self.group_read.getData(dxl.Id, addr, size), size)
+                          if self.group_read.isAvailable(dxl.Id, addr, size) else None
+                        for dxl in self.dxls]
+    if self.dxl_result==dynamixel.COMM_SUCCESS:
+      stamp= time.time()
+      for i,dxl in enumerate(self.dxls):
+        dxl.UpdateSnapshot({address:data[address][i] for address in self.ReadAddresses if data[address][i] is not None}, stamp)
+    return data
+
+  #Write values to a register (address) of servos with a single packet.
+  #  values: List of values (Dynamixel values) for dxls.
+  #  dxls: Subset of self.dxls to write (default: self.dxls).
+  #Return True if the packet is transmitted (check the result with CheckTxRxResult).
+  def Write(self, address, values, dxls=None):
+    if dxls is None:  dxls= self.dxls
+    port_handler,port_locker= self.port_handler()
+    if port_handler is None:
+      print 'Port {dev} is closed.'.format(dev=self.DevName)
+      return False
+    addr,size= self.ADDR[address]
+    if addr is None:
+      print '{address} is not available with this Dynamixel.'.format(address=address)
+      return False
+    with port_locker:
+      if address not in self.group_write:
+        self.group_write[address]= dynamixel.GroupSyncWrite(self.port, self.packet_handler, addr, size)
+      group_write= self.group_write[address]
+      group_write.clearParam()
+      for dxl,value in zip(dxls,values):
+        value= int(value)
+        if not group_write.addParam(dxl.Id, [(value>>(8*i))&0xFF for i in range(size)]):
+          print 'TDynamixelSync: Failed to add ID {id} to GroupSyncWrite of {address}.'.format(id=dxl.Id,address=address)
+          group_write.clearParam()
+          return False
+      self.dxl_result= group_write.txPacket()
+      self.dxl_err= 0
+      group_write.clearParam()
+    for dxl,value in zip(dxls,values):
+      dxl.state_memory[address]= value
+    return True
+
+  #Check the result of the last transaction (same as TDynamixel1.CheckTxRxResult).
+  def CheckTxRxResult(self, quiet=False, reopen=True):
+    normal= self.dxl_result==dynamixel.COMM_SUCCESS and self.dxl_err==0
+    if not normal:
+      print 'dxl_result=',self.dxl_result, 'dxl_err=',self.dxl_err
+      if self.dxl_result != dynamixel.COMM_SUCCESS and self.packet_handler is not None:
+        print self.packet_handler.getTxRxResult(self.dxl_result)
+      DxlPortHandler.MarkError(dev=self.DevName)
+      if reopen:  DxlPortHandler.StartReopen()
+    return normal
+
+  #Read the present states and check the result.
+  #Return {address:[values]} or None if failed.
+  def ReadState(self):
+    data= self.Read()
+    if data is None:  return None
+    if len(data)>0 and not self.CheckTxRxResult(quiet=True):  return None
+    return data
+
+  #Move the positions of servos to given values (non-blocking).
+  #  targets: Target positions (Dynamixel values) of dxls.
+  #  dxls: Subset of self.dxls (default: self.dxls).
+  def MoveTo(self, targets, dxls=None):
+    if dxls is None:  dxls= self.dxls
+    if self.Write('GOAL_POSITION', [dxl.ClipPosition(target) for dxl,target in zip(dxls,targets)], dxls):
+      self.CheckTxRxResult()
+
+  #Move the positions of servos to given values with given currents (non-blocking).
+  #  targets: Target positions (Dynamixel values) of dxls.
+  #  currents: Target currents (Dynamixel values) of dxls.
+  #  dxls: Subset of self.dxls (default: self.dxls).
+  def MoveToC(self, targets, currents, dxls=None):
+    if dxls is None:  dxls= self.dxls
+    #The result is checked after each write (the position is not written if the current write failed).
+    if not self.Write('GOAL_CURRENT', [dxl.ClipCurrent(current) for dxl,current in zip(dxls,currents)], dxls):  return
+    if not self.CheckTxRxResult():  return
+    if self.Write('GOAL_POSITION', [dxl.ClipPosition(target, ext=False) for dxl,target in zip(dxls,targets)], dxls):
+      self.CheckTxRxResult()
+
+  #Set PWMs (Dynamixel values) of servos.
+  def SetPWM(self, pwms, dxls=None):
+    if dxls is None:  dxls= self.dxls
+    if self.Write('GOAL_PWM', [max(-dxl.MAX_PWM,min(dxl.MAX_PWM,pwm)) for dxl,pwm in zip(dxls,pwms)], dxls):
+      self.CheckTxRxResult()
+
+
 if __name__=='__main__':
   import os
   import sys, tty, termios
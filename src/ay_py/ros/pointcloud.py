@@ -6,55 +6,104 @@ import sensor_msgs.msg
 from sensor_msgs import point_cloud2
 import numpy as np
 
+#Point type of the point clouds made in this module (x,y,z: float32, rgba: uint32; little endian).
+POINT_XYZRGBA_DTYPE= np.dtype([('x','<f4'),('y','<f4'),('z','<f4'),('rgba','<u4')])
+POINT_XYZRGBA_FIELDS= [
+  #name,offset,datatype,count
+  sensor_msgs.msg.PointField('x',0,sensor_msgs.msg.PointField.FLOAT32,1),
+  sensor_msgs.msg.PointField('y',4,sensor_msgs.msg.PointField.FLOAT32,1),
+  sensor_msgs.msg.PointField('z',8,sensor_msgs.msg.PointField.FLOAT32,1),
+  sensor_msgs.msg.PointField('rgba',12,sensor_msgs.msg.PointField.UINT32,1)]
+
+#Cache of ray grids: {(Fx,Fy,Cx,Cy,shape,xstep,ystep):(rx,ry)}.
+_RAY_GRIDS= {}
+_RAY_GRIDS_MAX= 8
+
+'''
+Return the ray grid (rx,ry) of the sampled pixels where rx=(x-Cx)/Fx, ry=(y-Cy)/Fy (float32 arrays);
+a 3D point of a pixel is (rx*z, ry*z, z) with the depth z.
+The grid is computed once for each proj_mat/image shape/steps and reused.
+proj_mat: Camera projection matrix.
+shape: Shape of the depth image (rows,cols).
+'''
+def RayGrid(proj_mat, shape, xstep=2, ystep=2):
+  Fx,Fy,Cx,Cy= float(proj_mat[0,0]),float(proj_mat[1,1]),float(proj_mat[0,2]),float(proj_mat[1,2])
+  key= (Fx,Fy,Cx,Cy,tuple(shape[:2]),xstep,ystep)
+  grid= _RAY_GRIDS.get(key)
+  if grid is None:
+    if len(_RAY_GRIDS)>=_RAY_GRIDS_MAX:  _RAY_GRIDS.clear()
+    rx= ((np.arange(0,shape[1],xstep)-Cx)/Fx).astype(np.float32)
+    ry= ((np.arange(0,shape[0],ystep)-Cy)/Fy).astype(np.float32)
+    rx,ry= np.meshgrid(rx,ry)
+    grid= (rx,ry)
+    _RAY_GRIDS[key]= grid
+  return grid
+
+'''
+Make a point cloud message from a structured array of POINT_XYZRGBA_DTYPE.
+The array memory is assigned to the message data directly (no per-point packing).
+header: Header for the pointcloud message.
+'''
+def XYZRGBAToPointCloud(points, header, is_dense=False):
+  points= np.ascontiguousarray(points, dtype=POINT_XYZRGBA_DTYPE).reshape(-1)
+  pc_msg= sensor_msgs.msg.PointCloud2()
+  pc_msg.header= header
+  pc_msg.height= 1
+  pc_msg.width= len(points)
+  pc_msg.fields= POINT_XYZRGBA_FIELDS
+  pc_msg.is_bigendian= False
+  pc_msg.point_step= POINT_XYZRGBA_DTYPE.itemsize
+  pc_msg.row_step= pc_msg.point_step*pc_msg.width
+  pc_msg.is_dense= is_dense
+  pc_msg.data= points.tobytes()
+  return pc_msg
+
+'''
+Make a structured array of POINT_XYZRGBA_DTYPE from a depth image (sampled with xstep,ystep)
+and colors of the sampled pixels (uint32 array of the same shape as the sampled depth, or a scalar).
+depth_scale: Scale to convert the depth values to meters (1.0e-3 for a depth image in mm).
+filter_invalid: If True, pixels of invalid depth (zero or non-finite) are removed.
+'''
+def DepthImgToXYZRGBA(img_depth, col, proj_mat, xstep=2, ystep=2, depth_scale=1.0e-3, filter_invalid=False):
+  rx,ry= RayGrid(proj_mat, img_depth.shape, xstep, ystep)
+  z= img_depth[::ystep,::xstep].astype(np.float32)
+  if depth_scale!=1.0:  z*= depth_scale
+  points= np.empty(z.shape, dtype=POINT_XYZRGBA_DTYPE)
+  np.multiply(rx, z, out=points['x'])
+  np.multiply(ry, z, out=points['y'])
+  points['z']= z
+  points['rgba']= col
+  if filter_invalid:
+    points= points[np.isfinite(z) & (z>0.0)]
+  return points.reshape(-1)
+
 '''
 Convert img_depth and img_rgb to point cloud, and return the message.
 img_depth and img_rgb should be aligned.
 proj_mat: Camera projection matrix.
 header: Header for the pointcloud message.
+depth_scale: Scale to convert the depth values to meters (1.0e-3 for a depth image in mm).
+filter_invalid: If True, pixels of invalid depth (zero or non-finite) are removed.
 '''
-def DepthRGBImgsToPointCloud(img_depth, img_rgb, proj_mat, header, xstep=2, ystep=2):
-  #points= [(np.array(InvProjectFromImage([x,y],proj_mat))*(img_depth[y,x]*1.0e-3)).tolist()+[struct.unpack('I',struct.pack('BBBB',*(img_rgb[y,x].tolist()+[255])))[0]] for y,x in itertools.product(xrange(0,img_depth.shape[0],ystep),xrange(0,img_depth.shape[1],xstep))]
-  Fx,Fy,Cx,Cy= proj_mat[0,0],proj_mat[1,1],proj_mat[0,2],proj_mat[1,2]
-  col= np.squeeze(np.concatenate((img_rgb[::ystep,::xstep].astype(np.uint8), np.full(img_rgb[::ystep,::xstep].shape[:-1]+(1,), 255, dtype=np.uint8)), axis=-1).view(np.uint32))
-  func= lambda x,y,z,col: [(x-Cx)/Fx*z, (y-Cy)/Fy*z, z, col]
-  indices= np.indices(img_depth.shape)[:,::ystep,::xstep]
-  merged= np.dstack(func(indices[1], indices[0], img_depth[::ystep,::xstep].astype(np.float64)*1.0e-3, col))
-  points= merged.reshape((-1, 4)).tolist()
-
-  fields= [
-    #name,offset,datatype,count
-    sensor_msgs.msg.PointField('x',0,sensor_msgs.msg.PointField.FLOAT32,1),
-    sensor_msgs.msg.PointField('y',4,sensor_msgs.msg.PointField.FLOAT32,1),
-    sensor_msgs.msg.PointField('z',8,sensor_msgs.msg.PointField.FLOAT32,1),
-    sensor_msgs.msg.PointField('rgba',12,sensor_msgs.msg.PointField.UINT32,1)]
-  pc_msg= point_cloud2.create_cloud(header, fields, points)
-  return pc_msg
+def DepthRGBImgsToPointCloud(img_depth, img_rgb, proj_mat, header, xstep=2, ystep=2, depth_scale=1.0e-3, filter_invalid=False):
+  #Color as uint32 of the bytes (c0,c1,c2,255) in little endian.
+  rgb= img_rgb[::ystep,::xstep].astype(np.uint32)
+  col= rgb[:,:,0] | (rgb[:,:,1]<<8) | (rgb[:,:,2]<<16) | np.uint32(255<<24)
+  points= DepthImgToXYZRGBA(img_depth, col, proj_mat, xstep, ystep, depth_scale, filter_invalid)
+  return XYZRGBAToPointCloud(points, header, is_dense=filter_invalid)
 
 '''
 Convert img_depth to point cloud, and return the message.
+Points are colored by the depth (green channel=(5*depth)%256).
 proj_mat: Camera projection matrix.
 header: Header for the pointcloud message.
+depth_scale: Scale to convert the depth values to meters (1.0e-3 for a depth image in mm).
+filter_invalid: If True, pixels of invalid depth (zero or non-finite) are removed.
 '''
-def DepthImgToPointCloud(img_depth, proj_mat, header, xstep=2, ystep=2):
-  #dmin= np.min(img_depth)
-  #points= [(np.array(InvProjectFromImage([x,y],proj_mat))*(img_depth[y,x]*1.0e-3)).tolist()+[struct.unpack('I',struct.pack('BBBB',*(d2c(x,y,img_depth[y,x]))))[0]] for y,x in itertools.product(xrange(0,img_depth.shape[0],ystep),xrange(0,img_depth.shape[1],xstep))]
-  xs= lambda a,v: np.full(a.shape, v, dtype=np.uint8)
-  #d2c= lambda x,y,z: [0,int(max(0,min(255,255+10*(dmin-z)))),0,255]
-  #d2c= lambda x,y,z: [x%256,z%256,y%256,255]
-  d2c= lambda x,y,z: [xs(z,0),((5*z)%256).astype(np.uint8),xs(z,0),xs(z,255)]
-  Fx,Fy,Cx,Cy= proj_mat[0,0],proj_mat[1,1],proj_mat[0,2],proj_mat[1,2]
-  indices= np.indices(img_depth.shape)[:,::ystep,::xstep]
-  col= np.squeeze(np.dstack(d2c(indices[1], indices[0], img_depth[::ystep,::xstep])).view(np.uint32))
-  func= lambda x,y,z,col: [(x-Cx)/Fx*z, (y-Cy)/Fy*z, z, col]
-  merged= np.dstack(func(indices[1], indices[0], img_depth[::ystep,::xstep].astype(np.float64)*1.0e-3, col))
-  points= merged.reshape((-1, 4)).tolist()
-
-  fields= [
-    #name,offset,datatype,count
-    sensor_msgs.msg.PointField('x',0,sensor_msgs.msg.PointField.FLOAT32,1),
-    sensor_msgs.msg.PointField('y',4,sensor_msgs.msg.PointField.FLOAT32,1),
-    sensor_msgs.msg.PointField('z',8,sensor_msgs.msg.PointField.FLOAT32,1),
-    sensor_msgs.msg.PointField('rgba',12,sensor_msgs.msg.PointField.UINT32,1)]
-  pc_msg= point_cloud2.create_cloud(header, fields, points)
-  return pc_msg
-
+def DepthImgToPointCloud(img_depth, proj_mat, header, xstep=2, ystep=2, depth_scale=1.0e-3, filter_invalid=False):
+  #Color as uint32 of the bytes (0,(5*z)%256,0,255) in little endian.
+  z= img_depth[::ystep,::xstep]
+  if not np.issubdtype(z.dtype, np.integer):  z= np.nan_to_num(z)
+  col= ((z.astype(np.uint32)*5)%256<<8) | np.uint32(255<<24)
+  points= DepthImgToXYZRGBA(img_depth, col, proj_mat, xstep, ystep, depth_scale, filter_invalid)
+  return XYZRGBAToPointCloud(points, header, is_dense=filter_invalid)
@@ -21,28 +21,20 @@ def ROSInterpolateTraj(q_traj, t_traj, dt=1.0e-3):
   assert(len(q_traj)==len(t_traj))
 
   #Modeling the trajectory with spline.
-  DoF= len(q_traj[0])
-  splines= [TCubicHermiteSpline() for d in range(DoF)]
-  for d in range(DoF):
-    data_d= [[t,q[d]] for q,t in zip(q_traj,t_traj)]
-    splines[d].Initialize(data_d, tan_method=splines[d].CARDINAL, c=0.0, m=0.0)
+  spline= TCubicHermiteSplineN()
+  spline.Initialize(zip(t_traj,q_traj), tan_method=spline.CARDINAL, c=0.0, m=0.0)
 
+  #Evaluate all the points at once.
+  t_points= np.arange(0.0,t_traj[-1],dt)
+  Q,V,A= spline.Evaluate(t_points,with_dd=True)
   traj_points= []
-  t= 0.0
-  while t<t_traj[-1]:
-    q,v,a= [],[],[]
-    for spline in splines:
-      q_d,v_d,a_d= spline.Evaluate(t,with_dd=True)
-      q.append(q_d)
-      v.append(v_d)
-      a.append(a_d)
+  for t,q,v,a in zip(t_points,Q.tolist(),V.tolist(),A.tolist()):
     point= trajectory_msgs.msg.JointTrajectoryPoint()
     point.positions= q
     point.velocities= v
     point.accelerations= a
     point.time_from_start= rospy.Duration(t)
     traj_points.append(point)
-    t+= dt
   #JTP= trajectory_msgs.msg.JointTrajectoryPoint
   #traj_points= np.array([JTP(*(np.array([[spline.Evaluate(t,with_dd=True)] for spline in splines]).T.tolist()+[[],rospy.Duration(t)]))
                          #for t in np.arange(0.0,t_traj[-1],dt)])
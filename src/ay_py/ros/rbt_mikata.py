@@ -97,7 +97,7 @@ class TMikataGripper(TDxlGripper):
     self.dxlg.holding.observer= holding_observer
     self.dxlg.holding.controller= holding_controller
     self.dxlg.holding.SetTarget(goal_pos, self.dxlg.holding_max_pwm_rate*max_pwm)
-    self.dxlg.holding.Start()
+    self.dxlg.holding.Start(self.mikata.dev)
 
   def StopHolding(self):
     if self.dxlg.holding is not None:
@@ -121,6 +121,13 @@ class TMultiArmRobot(TROSUtil):
   def JointVelLimits(self, arm=None):
     pass
 
+  '''Return limits of joint angular acceleration (None if not specified).
+    If specified, MoveToXI uses QTrajTimeParam instead of LimitQTrajVel.
+    NOTE: No robot class specifies them yet.
+    arm: arm id, or None (==currarm). '''
+  def JointAccLimits(self, arm=None):
+    return None
+
   '''End effector of an arm.'''
   def EndEff(self, arm=None):
     pass
@@ -228,7 +235,9 @@ class TMultiArmRobot(TROSUtil):
     x_ext: a local pose on the self.EndLink(arm) frame.
       If not None, the final joint angles q satisfies self.FK(q,x_ext,arm)==x_trg.
     limit_vel: If True, joint angular velocities are limited to JointVelLimits.
-    acc_phase: Number of points in the acceleration and deceleration phases (>=1). '''
+      If JointAccLimits is also available, the time-optimal t_traj under the velocity and acceleration limits
+      is used (dt is the minimum duration).
+    acc_phase: Number of points in the acceleration and deceleration phases (>=1; used when JointAccLimits is None). '''
   def MoveToXI(self, x_trg, dt=4.0, x_ext=None, inum=30, arm=None, blocking=False, limit_vel=True, acc_phase=9):
     if arm is None:  arm= self.Arm
 
@@ -240,7 +249,11 @@ class TMultiArmRobot(TROSUtil):
     q_curr= self.Q(arm)
     q_traj= self.XTrajToQTraj(x_traj, x_ext=x_ext, start_angles=q_curr, arm=arm)
     if limit_vel:
-      LimitQTrajVel(q_start=q_curr, q_traj=q_traj, t_traj=t_traj, qvel_limits=self.JointVelLimits(arm), acc_phase=acc_phase)
+      qacc_limits= self.JointAccLimits(arm)
+      if qacc_limits is None:
+        LimitQTrajVel(q_start=q_curr, q_traj=q_traj, t_traj=t_traj, qvel_limits=self.JointVelLimits(arm), acc_phase=acc_phase)
+      else:
+        t_traj= QTrajTimeParam(q_start=q_curr, q_traj=q_traj, qvel_limits=self.JointVelLimits(arm), qacc_limits=qacc_limits, t_traj=t_traj).tolist()
     self.FollowQTraj(q_traj, t_traj, arm=arm, blocking=blocking)
 
   '''Stop motion such as FollowQTraj.